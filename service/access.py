@@ -0,0 +1,155 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import User, Station
+from . import versions
+
+
+# STATION ACCESS RESOLVER
+
+ACCESS_CACHE_TIMEOUT = 300  # seconds
+ACCESS_VERSION = 'station-access'
+# Longest time a process keeps using its access cache entries after another process changed stations
+ACCESS_CACHE_CHECK_INTERVAL = getattr(settings, 'ACCESS_CACHE_CHECK_INTERVAL', 5)
+
+
+class AccessVersion:
+    """
+    This process's copy of the shared 'station-access' version (CacheVersion).
+
+    It is part of every access cache key, so bumping it in one process
+    retires the entries of every process, whatever cache backend they use.
+    The stored value is re-read at most every ACCESS_CACHE_CHECK_INTERVAL
+    seconds (one primary key lookup).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= ACCESS_CACHE_CHECK_INTERVAL:
+                self._version = versions.current_version(ACCESS_VERSION)
+                self._checked_at = time.monotonic()
+            return self._version
+
+    def reset(self):
+        with self._lock:
+            self._version = None
+
+
+access_version = AccessVersion()
+
+
+def access_cache_key(user_id, user_role):
+    """Admins all see the same stations, so they share one cache entry."""
+    version = access_version.get()
+    if user_role == 'admin':
+        return f'station-access:{version}:admin'
+    return f'station-access:{version}:{user_role}:{user_id}'
+
+
+def invalidate_station_access(user_ids=(), admin=False):
+    """
+    Drops the cached station IDs of the given users (and of admins) in this
+    process and bumps the shared version, which retires every process's
+    entries once they next check it.
+    """
+    keys = [access_cache_key(user_id, role) for user_id in user_ids if user_id for role in ('owner', 'manager')]
+    if admin:
+        keys.append(access_cache_key(None, 'admin'))
+    if keys:
+        cache.delete_many(keys)
+    versions.bump_version(ACCESS_VERSION)
+    access_version.reset()
+    # Another thread may have cached the uncommitted (old) stations meanwhile
+    transaction.on_commit(access_version.reset)
+
+
+class StationAccess:
+    """
+    The logged-in user and the stations they are authorized for.
+
+    One instance is attached to every request as ``request.access`` by
+    StationAccessMiddleware. The user is loaded at most once per request and
+    the authorized station IDs come from a cross-request cache, so list views
+    can filter on a precomputed ID set instead of re-resolving the user.
+    """
+
+    def __init__(self, user_id, user_role):
+        self.user_id = user_id
+        self.role = (user_role or '').lower()
+
+    @classmethod
+    def from_session(cls, session):
+        return cls(session.get('user_id'), session.get('role'))
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user_id)
+
+    @property
+    def all_stations(self):
+        """True when the user can see every station (no filtering needed)."""
+        return self.is_authenticated and self.role == 'admin'
+
+    @cached_property
+    def user(self):
+        if not self.user_id:
+            return None
+        return User.objects.filter(user_id=self.user_id).first()
+
+    @cached_property
+    def station_ids(self):
+        """frozenset of the primary keys of the stations the user can see."""
+        if not self.user_id or self.role not in ('admin', 'owner', 'manager'):
+            return frozenset()
+
+        key = access_cache_key(self.user_id, self.role)
+        station_ids = cache.get(key)
+        if station_ids is None:
+            station_ids = frozenset(self._station_queryset().values_list('pk', flat=True))
+            cache.set(key, station_ids, ACCESS_CACHE_TIMEOUT)
+        return station_ids
+
+    @property
+    def station_scope(self):
+        """None for unrestricted users, otherwise the authorized station IDs."""
+        return None if self.all_stations else self.station_ids
+
+    @property
+    def stations(self):
+        """QuerySet of the authorized stations."""
+        if self.all_stations:
+            return Station.objects.all()
+        return Station.objects.filter(pk__in=self.station_ids)
+
+    def filter(self, queryset, field='station'):
+        """Restricts ``queryset`` to rows whose ``field`` is an authorized station."""
+        if self.all_stations:
+            return queryset
+        return queryset.filter(**{f'{field}__in': self.station_ids})
+
+    def can_access_station(self, station_id):
+        if self.all_stations:
+            return True
+        try:
+            return int(station_id) in self.station_ids
+        except (TypeError, ValueError):
+            return False
+
+    def _station_queryset(self):
+        if self.role == 'admin':
+            return Station.objects.all()
+        elif self.role == 'owner':
+            return Station.objects.filter(company_id__owner_id=self.user_id)
+        elif self.role == 'manager':
+            return Station.objects.filter(manager_id=self.user_id)
+        return Station.objects.none()
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Company, Station, Pump, SystemSetting, Inventory, Transaction, Alert
+from .pagination import EstimatedCountPaginator
+from .models import User, Company, Station, Pump, SystemSetting, PriceOverride, Inventory, Transaction, Alert
 
 
 # User Admin
@@ -32,7 +33,9 @@ admin.site.register(Station, StationAdmin)
 # Pump Admin
 
 class PumpAdmin(admin.ModelAdmin):
-    list_display = ('pump_id', 'station_id', 'pump_number', 'fuel_type', 'status', 'flow_rate')
+    list_display = ('pump_id', 'station', 'pump_number', 'fuel_type', 'status', 'flow_rate')
+    list_select_related = ('station',)
+    list_filter = ('status', 'fuel_type', 'station')
 
 admin.site.register(Pump, PumpAdmin)
 
@@ -47,10 +50,21 @@ admin.site.register(SystemSetting, SystemSettingAdmin)
 
 
 
+# PriceOverride Admin
+
+class PriceOverrideAdmin(admin.ModelAdmin):
+    list_display = ('override_id', 'company', 'station', 'fuel_type', 'price_per_liter', 'updated_at')
+
+admin.site.register(PriceOverride, PriceOverrideAdmin)
+
+
+
 # Inventory Admin
 
 class InventoryAdmin(admin.ModelAdmin):
-    list_display = ('inventory_id', 'station_id', 'fuel_type', 'quantity', 'capacity', 'min_threshold', 'unit_price', 'updated_at')
+    list_display = ('inventory_id', 'station', 'fuel_type', 'quantity', 'capacity', 'min_threshold', 'unit_price', 'updated_at')
+    list_select_related = ('station',)
+    list_filter = ('fuel_type', 'station')
 
 admin.site.register(Inventory, InventoryAdmin)
 
@@ -60,6 +74,15 @@ admin.site.register(Inventory, InventoryAdmin)
 
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('transaction_id', 'station_id', 'user_id', 'pump_id', 'fuel_type', 'quantity', 'total_price', 'payment_method', 'car_plate', 'transaction_time')
+    # Pump.__str__ reads pump.station, so the pump's station is joined too
+    list_select_related = ('station_id', 'user_id', 'pump_id__station')
+    # Each filter is backed by an index (txn_payment_time_idx, txn_station_time_idx)
+    list_filter = ('payment_method', 'station_id')
+    date_hierarchy = 'transaction_time'
+    ordering = ('-transaction_time',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('station_id', 'user_id', 'pump_id')
 
 admin.site.register(Transaction, TransactionAdmin)
 
@@ -69,5 +92,14 @@ admin.site.register(Transaction, TransactionAdmin)
 
 class AlertAdmin(admin.ModelAdmin):
     list_display = ('alert_id', 'station', 'type', 'description', 'pump_id', 'inventory_id', 'status', 'created_at')
+    # Pump.__str__ and Inventory.__str__ read their station, so it is joined too
+    list_select_related = ('station', 'pump_id__station', 'inventory_id__station')
+    # Backed by alert_status_created_idx and alert_station_status_idx
+    list_filter = ('status', 'type', 'station')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('station', 'pump_id', 'inventory_id')
 
 admin.site.register(Alert, AlertAdmin)
@@ -0,0 +1,77 @@
+"""
+Concurrent reads for async views.
+
+Django's async ORM methods (aget, acount, aaggregate, ...) all run on the
+request's single thread-sensitive executor, so gathering them still runs
+the queries one after another on one connection. The helpers here run
+each independent read on its own worker thread and database connection,
+so ``asyncio.gather`` really overlaps them. Routing and request metrics
+follow the reads into those threads (they live in context variables).
+"""
+
+import asyncio
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Page, Paginator
+from django.db import close_old_connections
+
+
+def _on_own_connection(call):
+    def run():
+        close_old_connections()
+        try:
+            return call()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_reads(*calls):
+    """Runs the blocking read ``calls`` concurrently; returns their results in order."""
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection(call), thread_sensitive=False)() for call in calls
+    ))
+
+
+async def preload(obj, *names):
+    """Computes the cached_property attributes ``names`` of ``obj`` concurrently (each caches itself)."""
+    await gather_reads(*(partial(getattr, obj, name) for name in names if name not in obj.__dict__))
+
+
+async def resolve_access(request):
+    """Loads ``request.access`` (session, user, station IDs) off the event loop."""
+    def load():
+        access = request.access
+        access.user, access.station_ids
+        return access
+    return await sync_to_async(load)()
+
+
+def _page_number(value):
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+async def paginate(queryset, per_page, page_number, *calls):
+    """
+    Page ``page_number`` of ``queryset`` (like Paginator.get_page), its rows
+    and the total count read concurrently with the extra ``calls``.
+
+    Returns (paginator, page, [results of calls]).
+    """
+    number = _page_number(page_number)
+
+    def rows(number):
+        return lambda: list(queryset[(number - 1) * per_page:number * per_page])
+
+    object_list, count, *results = await gather_reads(rows(number), queryset.count, *calls)
+    paginator = Paginator(queryset, per_page)
+    paginator.__dict__['count'] = count
+    if number > paginator.num_pages:
+        # Past the end (rows went away since the link was made): the last page
+        number = paginator.num_pages
+        object_list, = await gather_reads(rows(number))
+    return paginator, Page(object_list, number, paginator), results
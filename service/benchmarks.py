@@ -0,0 +1,289 @@
+"""
+Synthetic fleets and view benchmarks.
+
+``manage.py seed_fleet`` fills the database with companies, stations,
+pumps, tanks, sales and alerts at a chosen scale; ``manage.py benchmark``
+then times the key pages with the test client and writes p50/p95 latency
+and query counts per view as JSON. Run both against a scratch database
+(e.g. SQLITE_PATH=/tmp/bench.sqlite3) once per scale, and compare the
+JSON of two runs with ``benchmark --compare``.
+"""
+
+import random
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .models import Alert, Company, Inventory, Pump, Station, SystemSetting, Transaction, User
+from . import pricing, rollups
+
+
+# SYNTHETIC FLEET
+
+# companies, stations per company, pumps per station, transactions, alerts
+SCALES = {
+    'small': dict(companies=2, stations=5, pumps=4, transactions=20_000, alerts=1_000),
+    'medium': dict(companies=10, stations=10, pumps=6, transactions=500_000, alerts=20_000),
+    'large': dict(companies=50, stations=20, pumps=8, transactions=5_000_000, alerts=200_000),
+}
+
+SEED_BATCH = 5000  # rows per bulk_create
+SEED_PASSWORD = 'fleet'
+
+FUEL_PRICES = {'petrol': Decimal('1500'), 'diesel': Decimal('1400')}
+PAYMENT_WEIGHTS = {'cash': 45, 'momo': 40, 'card': 15}
+ALERT_STATUS_WEIGHTS = {'resolved': 80, 'pending': 15, 'ignored': 5}
+ALERT_DESCRIPTIONS = {
+    'inventory': 'Tank below minimum threshold',
+    'maintenance': 'Pump flow rate out of range',
+    'security': 'Unexpected dispenser access',
+    'system': 'Controller lost connection',
+}
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _plate(rng):
+    letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    return f'RA{rng.choice(letters)}{rng.randrange(1000):03d}{rng.choice(letters)}'
+
+
+def _batches(total, size):
+    while total > 0:
+        yield min(size, total)
+        total -= size
+
+
+def seed_fleet(companies, stations, pumps, transactions, alerts, days=90, prefix='fleet', seed=0,
+               batch_size=SEED_BATCH, progress=None):
+    """
+    Creates a synthetic fleet with bulk_create only: an admin, ``companies``
+    companies with an owner each, ``stations`` stations per company with a
+    manager each, ``pumps`` pumps and a petrol and a diesel tank per station,
+    then ``transactions`` sales spread over the last ``days`` days and
+    ``alerts`` alerts. The same ``seed`` gives the same fleet.
+
+    Signals do not run for bulk inserts, so the sales rollup is rebuilt and
+    the cache cleared at the end. ``progress(model_name, done, total)`` is
+    called after every batch. Returns {model_name: rows created}.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    report = progress or (lambda *args: None)
+    created = {}
+
+    with transaction.atomic():
+        for fuel_type, price in FUEL_PRICES.items():
+            if not SystemSetting.objects.filter(fuel_type__iexact=fuel_type).exists():
+                SystemSetting.objects.create(fuel_type=fuel_type.capitalize(), price_per_liter=price)
+
+        User.objects.create(
+            username=f'{prefix}-admin', full_name='Fleet Admin', password=SEED_PASSWORD,
+            email=f'{prefix}-admin@example.com', role='admin',
+        )
+        owners = User.objects.bulk_create([
+            User(username=f'{prefix}-owner-{c}', full_name=f'Owner {c}', password=SEED_PASSWORD,
+                 email=f'{prefix}-owner-{c}@example.com', role='owner')
+            for c in range(companies)
+        ])
+        company_rows = Company.objects.bulk_create([
+            Company(name=f'{prefix.capitalize()} Company {c}', owner=owner) for c, owner in enumerate(owners)
+        ])
+        managers = User.objects.bulk_create([
+            User(username=f'{prefix}-manager-{c}-{s}', full_name=f'Manager {c}-{s}', password=SEED_PASSWORD,
+                 email=f'{prefix}-manager-{c}-{s}@example.com', role='manager')
+            for c in range(companies) for s in range(stations)
+        ])
+        station_rows = Station.objects.bulk_create([
+            Station(company_id=company, manager_id=managers[c * stations + s], name=f'Station {c}-{s}',
+                    location=rng.choice(['Kigali', 'Musanze', 'Huye', 'Rubavu', 'Rwamagana']))
+            for c, company in enumerate(company_rows) for s in range(stations)
+        ])
+        pump_rows = Pump.objects.bulk_create([
+            Pump(station=station, pump_number=n + 1, fuel_type='petrol' if n % 2 == 0 else 'diesel',
+                 status='offline' if rng.random() < 0.05 else 'active', flow_rate=round(rng.uniform(30, 45), 1))
+            for station in station_rows for n in range(pumps)
+        ])
+        tanks = Inventory.objects.bulk_create([
+            Inventory(station=station, fuel_type=fuel_type, capacity=20000, min_threshold=2000,
+                      quantity=round(rng.uniform(1000, 20000)), unit_price=price)
+            for station in station_rows for fuel_type, price in FUEL_PRICES.items()
+        ])
+    created.update(users=1 + len(owners) + len(managers), companies=len(company_rows), stations=len(station_rows),
+                   pumps=len(pump_rows), inventory=len(tanks))
+
+    pumps_by_station = {}
+    for pump in pump_rows:
+        pumps_by_station.setdefault(pump.station_id, []).append(pump)
+    tanks_by_station = {}
+    for tank in tanks:
+        tanks_by_station.setdefault(tank.station_id, []).append(tank)
+    span = days * 86400
+
+    done = 0
+    for size in _batches(transactions, batch_size):
+        rows = []
+        for _ in range(size):
+            station = rng.choice(station_rows)
+            pump = rng.choice(pumps_by_station[station.pk])
+            litres = round(rng.uniform(5, 60), 2)
+            rows.append(Transaction(
+                station_id=station, user_id=station.manager_id, pump_id=pump, fuel_type=pump.fuel_type,
+                quantity=litres, total_price=(FUEL_PRICES[pump.fuel_type] * Decimal(str(litres))).quantize(Decimal('0.01')),
+                payment_method=_weighted(rng, PAYMENT_WEIGHTS), car_plate=_plate(rng),
+                transaction_time=now - timedelta(seconds=rng.randrange(span)),
+            ))
+        with transaction.atomic():
+            Transaction.objects.bulk_create(rows)
+        done += size
+        report('transactions', done, transactions)
+    created['transactions'] = done
+
+    done = 0
+    pending_tanks = set()  # a tank has at most one pending inventory alert (one_pending_alert_per_tank)
+    for size in _batches(alerts, batch_size):
+        rows = []
+        for _ in range(size):
+            station = rng.choice(station_rows)
+            alert_type = rng.choice(list(ALERT_DESCRIPTIONS))
+            status = _weighted(rng, ALERT_STATUS_WEIGHTS)
+            tank = rng.choice(tanks_by_station[station.pk]) if alert_type == 'inventory' else None
+            if tank is not None and status == 'pending':
+                if tank.pk in pending_tanks:
+                    status = 'resolved'
+                pending_tanks.add(tank.pk)
+            rows.append(Alert(
+                station=station, type=alert_type, description=ALERT_DESCRIPTIONS[alert_type],
+                pump_id=rng.choice(pumps_by_station[station.pk]) if alert_type == 'maintenance' else None,
+                inventory_id=tank, status=status,
+            ))
+        with transaction.atomic():
+            Alert.objects.bulk_create(rows)  # created_at is auto_now_add: all alerts are new
+        done += size
+        report('alerts', done, alerts)
+    created['alerts'] = done
+
+    today = timezone.localdate()
+    created['rollups'] = rollups.rebuild(today - timedelta(days=days + 1), today)
+    cache.clear()
+    pricing.price_cache.invalidate()
+    return created
+
+
+# VIEW BENCHMARKS
+
+# (name, path) of the pages timed for every role
+BENCHMARK_VIEWS = [
+    ('dashboard', '/dashboard/'),
+    ('pump_monitoring', '/pumps/dashboard/'),
+    ('transaction_list', '/transactions/'),
+    ('transaction_list_page_50', '/transactions/?page=50'),
+    ('transaction_list_cursor', '/transactions/?paging=cursor'),
+    ('transaction_search', '/transactions/?search=RAB'),
+    ('alert_list', '/alerts/'),
+    ('alert_list_all', '/alerts/?status=all'),
+    ('inventory_list', '/inventory/'),
+    ('inventory_summary', '/inventory/summary/'),
+    ('pump_uptime', '/pumps/uptime/'),
+]
+
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries";dur=([\d.]+)')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def benchmark_users(prefix='fleet'):
+    """One seeded user per role: {'admin': User, 'owner': User, 'manager': User}."""
+    users = {}
+    for role in ('admin', 'owner', 'manager'):
+        user = User.objects.filter(role=role, username__startswith=f'{prefix}-').order_by('pk').first()
+        if user is not None:
+            users[role] = user
+    return users
+
+
+def time_view(client, path, repeat, cold=False):
+    """
+    Requests ``path`` ``repeat`` times (after one unmeasured warm-up) and
+    returns latency percentiles plus the query count and database time of
+    each request, read from the Server-Timing header so reads made on other
+    connections (async views, the reporting replica) count too.
+    """
+    client.get(path)
+    latencies, queries, db_times, statuses = [], [], [], set()
+    for _ in range(repeat):
+        if cold:
+            # Fragments, station access and prices are rebuilt; the session survives in the table
+            cache.clear()
+            pricing.price_cache.invalidate()
+        started = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses.add(response.status_code)
+        match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+        if match:
+            queries.append(int(match.group(1)))
+            db_times.append(float(match.group(2)))
+
+    latencies.sort()
+    return {
+        'status': sorted(statuses),
+        'p50_ms': round(_percentile(latencies, 0.5), 2),
+        'p95_ms': round(_percentile(latencies, 0.95), 2),
+        'max_ms': round(latencies[-1], 2),
+        'queries': max(queries) if queries else None,
+        'db_ms_p50': round(_percentile(sorted(db_times), 0.5), 2) if db_times else None,
+    }
+
+
+def run_benchmark(users, views=BENCHMARK_VIEWS, repeat=20, cold=False):
+    """
+    Times ``views`` for each of ``users`` ({role: User}); returns a JSON-ready
+    dict with the data scale and {role: {view name: timings}}.
+    """
+    results = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for role, user in users.items():
+            client = Client()
+            client.post('/', {'email': user.email, 'password': user.password})
+            results[role] = {name: time_view(client, path, repeat, cold) for name, path in views}
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        'repeat': repeat,
+        'cold_cache': cold,
+        'scale': {
+            model._meta.model_name: model.objects.count()
+            for model in (Company, Station, Pump, Inventory, Transaction, Alert)
+        },
+        'views': results,
+    }
+
+
+def compare(baseline, current):
+    """Rows of (role, view, metric, before, after, ratio) for the p50/p95 latency and query counts of two runs."""
+    rows = []
+    for role, views in current['views'].items():
+        for name, timings in views.items():
+            before = baseline.get('views', {}).get(role, {}).get(name)
+            if before is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'queries'):
+                old, new = before.get(metric), timings.get(metric)
+                if old is None or new is None:
+                    continue
+                rows.append((role, name, metric, old, new, round(new / old, 2) if old else None))
+    return rows
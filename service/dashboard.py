@@ -0,0 +1,150 @@
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Pump, Transaction, Alert
+from . import events, rollups
+from .fragments import FragmentKeys
+
+
+# DASHBOARD SUMMARY
+
+def stale_blocks(summary, fragment_keys):
+    """
+    Names of the ``summary`` blocks that the fragments not in the cache will
+    read, in FRAGMENT_BLOCKS order (async views preload just these).
+    """
+    stale = fragment_keys.stale(summary.FRAGMENT_BLOCKS)
+    return list(dict.fromkeys(block for name in stale for block in summary.FRAGMENT_BLOCKS[name]))
+
+
+class DashboardSummary:
+    """
+    Dashboard data for the stations of a StationAccess.
+
+    Each block is loaded on first access in a fixed number of queries (pumps,
+    today's rollup totals per fuel type, recent transactions and pending
+    alerts), independent of how many stations or pumps the user can see.
+    The template reads them through ``summary``; a block whose cached
+    fragment is still valid is never loaded at all.
+    """
+
+    RECENT_TRANSACTIONS = 5
+
+    # Blocks each cached fragment of dashboard.html is rendered from
+    FRAGMENT_BLOCKS = {
+        'dashboard_stats': ('pumps', 'fuel_totals'),
+        'dashboard_pumps': ('pumps',),
+        'dashboard_transactions': ('recent_transactions',),
+        'dashboard_alerts': ('alerts',),
+    }
+
+    def __init__(self, access):
+        self.access = access
+        self.stations = access.stations
+
+    # 1. Pumps (status counts are derived from the same rows)
+    @cached_property
+    def pumps(self):
+        return list(self.access.filter(Pump.objects.all()).order_by('station_id', 'pump_number'))
+
+    @cached_property
+    def pump_status_counts(self):
+        counts = {}
+        for pump in self.pumps:
+            counts[pump.status] = counts.get(pump.status, 0) + 1
+        return counts
+
+    # 2. Today's revenue and litres per fuel type (read from the daily rollup)
+    @cached_property
+    def fuel_totals(self):
+        return rollups.totals_by_fuel(self.access.station_scope, timezone.localdate())
+
+    # 3. Recent transactions
+    @cached_property
+    def recent_transactions(self):
+        return list(
+            self.access.filter(Transaction.objects.all(), 'station_id').order_by('-transaction_time')[:self.RECENT_TRANSACTIONS]
+        )
+
+    # 4. Pending alerts
+    @cached_property
+    def alerts(self):
+        return list(self.access.filter(Alert.objects.filter(status='pending')).order_by('-created_at'))
+
+    @property
+    def total_pumps_count(self):
+        return len(self.pumps)
+
+    @property
+    def active_pumps_count(self):
+        return self.pump_status_counts.get('active', 0)
+
+    @property
+    def offline_pumps_count(self):
+        return self.pump_status_counts.get('offline', 0)
+
+    @property
+    def today_revenue(self):
+        return sum((row['revenue'] or 0 for row in self.fuel_totals.values()), 0)
+
+    def dispensed(self, fuel_type):
+        """Litres of ``fuel_type`` dispensed today (case-insensitive)."""
+        row = self.fuel_totals.get(fuel_type.lower())
+        return (row['litres'] or 0) if row else 0
+
+    @property
+    def petrol_dispensed(self):
+        return self.dispensed('petrol')
+
+    @property
+    def diesel_dispensed(self):
+        return self.dispensed('diesel')
+
+    def as_context(self, fragment_keys=None):
+        """Returns the template context for ``dashboard.html``."""
+        return {
+            'stations': self.stations,
+            'summary': self,
+            'fragment_keys': fragment_keys or FragmentKeys(self.access),
+        }
+
+
+class PumpMonitoringSummary:
+    """Pumps and status counts for ``pumps/monitoring_dashboard.html``, loaded on first access."""
+
+    FRAGMENT_BLOCKS = {
+        'monitoring_status': ('pumps',),
+        'monitoring_pumps': ('pumps', 'last_event_id'),
+    }
+
+    def __init__(self, access):
+        self.access = access
+
+    @cached_property
+    def pumps(self):
+        return list(self.access.filter(Pump.objects.all()).select_related('station').order_by('pump_number'))
+
+    @cached_property
+    def status_counts(self):
+        counts = {}
+        for pump in self.pumps:
+            counts[pump.status] = counts.get(pump.status, 0) + 1
+        return counts
+
+    @property
+    def active_count(self):
+        return self.status_counts.get('active', 0)
+
+    @property
+    def offline_count(self):
+        return self.status_counts.get('offline', 0)
+
+    @property
+    def maintenance_count(self):
+        # 'maintenance' is not one of Pump.STATUS_CHOICES yet, so it stays at 0
+        return self.status_counts.get('maintenance', 0)
+
+    @cached_property
+    def last_event_id(self):
+        """Live updates resume after this event (see pump_status_stream)."""
+        return events.latest_event_id()
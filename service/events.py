@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Pump, PumpStatusEvent
+
+
+# PUMP STATUS EVENTS
+
+POLL_INTERVAL = 1.0  # seconds between checks of the event log, per process
+HEARTBEAT_INTERVAL = 15.0  # keeps proxies from closing idle streams
+STREAM_MAX_AGE = 600  # streams are recycled; the browser reconnects with Last-Event-ID
+QUEUE_SIZE = 256
+REPLAY_LIMIT = 500
+
+STATUS_LABELS = dict(Pump.STATUS_CHOICES)
+
+
+def record_status_change(pump, previous_status=None):
+    """
+    Appends a PumpStatusEvent when ``pump.status`` differs from ``previous_status``.
+
+    Pump saves call this through a signal; a controller feed that changes
+    statuses with ``QuerySet.update()`` must call it itself.
+    """
+    if pump.status == previous_status:
+        return None
+    return PumpStatusEvent.objects.create(
+        pump_id=pump.pk,
+        station_id=pump.station_id,
+        status=pump.status,
+        previous_status=previous_status,
+        flow_rate=pump.flow_rate,
+    )
+
+
+def latest_event_id():
+    return PumpStatusEvent.objects.order_by('-event_id').values_list('event_id', flat=True).first() or 0
+
+
+def events_after(event_id, stations=None, limit=REPLAY_LIMIT):
+    """Payloads of the events after ``event_id``, oldest first; ``stations`` None means all."""
+    queryset = PumpStatusEvent.objects.filter(event_id__gt=event_id)
+    if stations is not None:
+        queryset = queryset.filter(station_id__in=stations)
+    rows = queryset.order_by('event_id').values(
+        'event_id', 'pump_id', 'station_id', 'status', 'previous_status', 'flow_rate', 'created_at',
+    )[:limit]
+    return [_payload(row) for row in rows]
+
+
+def _payload(row):
+    row['status_display'] = STATUS_LABELS.get(row['status'], row['status'])
+    row['created_at'] = row['created_at'].isoformat()
+    return row
+
+
+def format_event(payload):
+    return f"id: {payload['event_id']}\nevent: pump-status\ndata: {json.dumps(payload)}\n\n"
+
+
+class _Subscriber:
+
+    def __init__(self, stations):
+        self.stations = stations
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, payload):
+        return self.stations is None or payload['station_id'] in self.stations
+
+
+class PumpEventBroker:
+    """
+    Fans pump status events out to every open stream of this process.
+
+    A single poller task reads new rows of the event log (one indexed query
+    per POLL_INTERVAL) while at least one stream is open, however many
+    monitoring screens are connected; the streams themselves never query.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = None
+        self._task = None
+
+    async def subscribe(self, stations):
+        subscriber = _Subscriber(stations)
+        self.subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self.last_id = await sync_to_async(latest_event_id)()
+            self._task = asyncio.create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def _poll(self):
+        while self.subscribers:
+            await asyncio.sleep(POLL_INTERVAL)
+            payloads = await sync_to_async(events_after)(self.last_id)
+            for payload in payloads:
+                self.last_id = payload['event_id']
+                self.publish(payload)
+
+    def publish(self, payload):
+        for subscriber in list(self.subscribers):
+            if not subscriber.wants(payload):
+                continue
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # A stalled client: end its stream, it will replay from Last-Event-ID
+                self.unsubscribe(subscriber)
+                subscriber.queue = None
+
+    async def stream(self, stations, after=None):
+        """
+        Yields SSE messages for the pump status events ``stations`` may see.
+
+        Events after ``after`` are replayed from the log first, so a reconnecting
+        client misses nothing; duplicates between replay and live events are
+        skipped by event ID.
+        """
+        subscriber = await self.subscribe(stations)
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + STREAM_MAX_AGE
+        sent = after or 0
+        try:
+            if after is not None:
+                for payload in await sync_to_async(events_after)(after, stations):
+                    sent = payload['event_id']
+                    yield format_event(payload)
+
+            while loop.time() < closes_at and subscriber.queue is not None:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                if payload['event_id'] <= sent:
+                    continue
+                sent = payload['event_id']
+                yield format_event(payload)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+broker = PumpEventBroker()
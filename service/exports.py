@@ -0,0 +1,74 @@
+import csv
+import json
+import zlib
+
+
+# TRANSACTION EXPORT
+
+EXPORT_COLUMNS = [
+    ('transaction_id', 'transaction_id'),
+    ('transaction_time', 'transaction_time'),
+    ('station_id', 'station_id'),
+    ('station', 'station_id__name'),
+    ('pump_number', 'pump_id__pump_number'),
+    ('fuel_type', 'fuel_type'),
+    ('quantity', 'quantity'),
+    ('total_price', 'total_price'),
+    ('payment_method', 'payment_method'),
+    ('car_plate', 'car_plate'),
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that hands back what was just written."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, since_id=None):
+    """
+    Yields tuples of EXPORT_COLUMNS for ``queryset`` in transaction_id order.
+
+    Rows are read with values_list + iterator, so memory stays flat however
+    many transactions are exported. ``since_id`` resumes after the last
+    transaction_id a client already pulled.
+    """
+    if since_id is not None:
+        queryset = queryset.filter(transaction_id__gt=since_id)
+    fields = [lookup for _, lookup in EXPORT_COLUMNS]
+    return queryset.order_by('transaction_id').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        record = dict(zip(names, row))
+        record['transaction_time'] = record['transaction_time'].isoformat()
+        record['total_price'] = str(record['total_price'])
+        yield json.dumps(record) + '\n'
+
+
+def gzip_stream(lines, flush_bytes=64 * 1024):
+    """Gzip-compresses an iterable of text lines incrementally."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    pending = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending += len(data)
+        chunk = compressor.compress(data)
+        if pending >= flush_bytes:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if chunk:
+            yield chunk
+    yield compressor.flush()
@@ -28,7 +28,7 @@ class PumpForm(forms.ModelForm):
 class InventoryForm(forms.ModelForm):
     class Meta:
         model = Inventory
-        fields = ['station_id', 'fuel_type', 'quantity', 'capacity', 'min_threshold', 'unit_price']
+        fields = ['station', 'fuel_type', 'quantity', 'capacity', 'min_threshold', 'unit_price']
 
 
 class InventoryUpdateForm(forms.ModelForm):
@@ -61,4 +61,23 @@ class TransactionForm(forms.ModelForm):
 class SystemSettingForm(forms.ModelForm):
     class Meta:
         model = SystemSetting
-        fields = ['fuel_type', 'price_per_liter']
\ No newline at end of file
+        fields = ['fuel_type', 'price_per_liter']
+
+class TransactionBatchRowForm(forms.Form):
+    """One sale in a batch upload from a pump controller (validated without queries)."""
+    client_ref = forms.CharField(max_length=64)
+    station_id = forms.IntegerField(min_value=1)
+    pump_id = forms.IntegerField(min_value=1)
+    fuel_type = forms.CharField(max_length=50)
+    quantity = forms.FloatField(min_value=0.001)
+    payment_method = forms.ChoiceField(choices=Transaction.PAYMENT_METHODS)
+    car_plate = forms.CharField(max_length=20, required=False)
+    transaction_time = forms.DateTimeField(required=False)
+
+class PumpSampleRowForm(forms.Form):
+    """One telemetry sample in a batch upload from a pump controller (validated without queries)."""
+    pump_id = forms.IntegerField(min_value=1)
+    recorded_at = forms.DateTimeField(required=False)
+    status = forms.ChoiceField(choices=Pump.STATUS_CHOICES, required=False)
+    flow_rate = forms.FloatField(min_value=0, required=False)
+    dispensed = forms.FloatField(min_value=0, required=False)
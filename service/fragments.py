@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# TEMPLATE FRAGMENT CACHE
+
+FRAGMENT_CACHE_TIMEOUT = 60  # seconds; bounds staleness for caches not shared between processes
+
+# Data each cached fragment is rendered from; a change to any of them invalidates it
+FRAGMENT_SOURCES = {
+    'dashboard_stats': ('pumps', 'transactions'),
+    'dashboard_pumps': ('pumps',),
+    'dashboard_transactions': ('transactions',),
+    'dashboard_alerts': ('alerts',),
+    'monitoring_status': ('pumps',),
+    'monitoring_pumps': ('pumps',),
+}
+
+ALL_STATIONS = 'all'
+
+
+def source_version_key(source, station_id):
+    return f'fragment-version:{source}:{station_id}'
+
+
+def invalidate_fragments(source, station_ids):
+    """
+    Marks ``source`` ('pumps', 'transactions' or 'alerts') as changed at
+    ``station_ids``: every fragment rendered from it for a station set that
+    includes one of them gets a new key. Admin fragments use the 'all' version.
+
+    The versions change when the current transaction commits: bumped
+    earlier, a request could re-render a fragment from the data as it was
+    before the commit and cache it under the new key.
+    """
+    token = uuid.uuid4().hex
+    keys = [source_version_key(source, station_id) for station_id in set(station_ids) if station_id is not None]
+    keys.append(source_version_key(source, ALL_STATIONS))
+    transaction.on_commit(lambda: cache.set_many({key: token for key in keys}, None))
+
+
+class FragmentStats:
+    """In-process hit/miss counters per fragment name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, name, hit):
+        with self._lock:
+            self._counts[(name, 'hits' if hit else 'misses')] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._counts)
+        names = sorted({name for name, _ in counts})
+        return {name: {'hits': counts.get((name, 'hits'), 0), 'misses': counts.get((name, 'misses'), 0)} for name in names}
+
+
+fragment_stats = FragmentStats()
+
+
+class FragmentKeys:
+    """
+    Cache keys of the fragments one request may render.
+
+    A key combines the fragment name, the user's role, the station set and
+    the current versions of the fragment's sources at those stations. All
+    versions are fetched with one cache.get_many, on first use.
+    """
+
+    def __init__(self, access, variant=''):
+        self.role = access.role
+        self.stations = access.station_scope  # None for every station
+        self.variant = variant
+        self._versions = None
+
+    def _station_keys(self):
+        if self.stations is None:
+            return [ALL_STATIONS]
+        return sorted(self.stations)
+
+    def versions(self):
+        if self._versions is None:
+            sources = sorted({source for names in FRAGMENT_SOURCES.values() for source in names})
+            keys = [source_version_key(source, station) for source in sources for station in self._station_keys()]
+            self._versions = cache.get_many(keys)
+        return self._versions
+
+    def key(self, name):
+        versions = self.versions()
+        digest = hashlib.md5(usedforsecurity=False)
+        for source in FRAGMENT_SOURCES[name]:
+            for station in self._station_keys():
+                digest.update(f'{station}={versions.get(source_version_key(source, station), "0")};'.encode())
+        digest.update(self.variant.encode())
+        return f'fragment:{name}:{self.role}:{digest.hexdigest()}'
+
+    def stale(self, names):
+        """The fragments among ``names`` that are not cached under their current key (one cache.get_many)."""
+        keys = {name: self.key(name) for name in names}
+        cached = cache.get_many(list(keys.values()))
+        return [name for name, key in keys.items() if key not in cached]
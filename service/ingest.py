@@ -0,0 +1,135 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .forms import TransactionBatchRowForm
+from .fragments import invalidate_fragments
+from .models import Pump, Transaction
+from . import inventory, pricing, rollups
+
+
+# BATCH TRANSACTION INGESTION
+
+MAX_BATCH_SIZE = 1000
+CENTS = Decimal('0.01')
+
+
+def _form_errors(form):
+    return {field: [str(error) for error in errors] for field, errors in form.errors.items()}
+
+
+def ingest_batch(rows, access, user_id):
+    """
+    Validates and stores a batch of sales uploaded by a pump controller.
+
+    Pumps come from one query for the whole batch and prices from the cached
+    per-station lookup table; valid rows are written with a single bulk_create inside one
+    atomic block. Rows whose ``client_ref`` was already stored are reported
+    as duplicates, so a controller can safely resend a batch. Invalid rows
+    are reported individually and never abort the rest of the batch.
+
+    Returns one result dict per input row, in order.
+    """
+    results = [None] * len(rows)
+    candidates = []  # (index, cleaned_data)
+
+    # 1. Field validation (no queries)
+    for index, row in enumerate(rows):
+        form = TransactionBatchRowForm(row if isinstance(row, dict) else {})
+        if form.is_valid():
+            candidates.append((index, form.cleaned_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': _form_errors(form)}
+
+    # 2. References and access (one query); prices come from the in-process lookup table
+    pumps = Pump.objects.in_bulk({data['pump_id'] for _, data in candidates})
+
+    valid = []
+    seen_refs = set()
+    for index, data in candidates:
+        errors = {}
+        pump = pumps.get(data['pump_id'])
+        if not access.can_access_station(data['station_id']):
+            errors['station_id'] = ['Unknown station or no access.']
+        elif pump is None or pump.station_id != data['station_id']:
+            errors['pump_id'] = ['Pump does not belong to this station.']
+        price = pricing.price_for(data['fuel_type'], station_id=data['station_id'])
+        if price is None:
+            errors['fuel_type'] = ['No price configured for this fuel type.']
+        if data['client_ref'] in seen_refs:
+            errors['client_ref'] = ['Repeated within the batch.']
+
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+            continue
+        seen_refs.add(data['client_ref'])
+        valid.append((index, data, price))
+
+    # 3. Idempotent insert
+    _store(valid, results, user_id)
+    return results
+
+
+def _store(valid, results, user_id, attempts=2):
+    for attempt in range(attempts):
+        refs = [data['client_ref'] for _, data, _ in valid]
+        existing = dict(Transaction.objects.filter(client_ref__in=refs).values_list('client_ref', 'transaction_id'))
+
+        pending = []
+        for index, data, price in valid:
+            if data['client_ref'] in existing:
+                results[index] = {'index': index, 'status': 'duplicate', 'transaction_id': existing[data['client_ref']]}
+                continue
+            sale = Transaction(
+                client_ref=data['client_ref'],
+                station_id_id=data['station_id'],
+                pump_id_id=data['pump_id'],
+                user_id_id=user_id,
+                fuel_type=data['fuel_type'],
+                quantity=data['quantity'],
+                total_price=(price * Decimal(str(data['quantity']))).quantize(CENTS),
+                payment_method=data['payment_method'],
+                car_plate=data['car_plate'] or None,
+                transaction_time=data['transaction_time'] or timezone.now(),
+            )
+            pending.append((index, sale))
+
+        try:
+            _write([sale for _, sale in pending])
+        except IntegrityError:
+            # A concurrent upload stored some of the same client_refs; re-check them
+            if attempt + 1 < attempts:
+                continue
+            # Some row breaks another constraint: find it by storing the rows one by one
+            _store_each(pending, results)
+            return
+
+        for index, sale in pending:
+            results[index] = {'index': index, 'status': 'created', 'transaction_id': sale.transaction_id}
+        return
+
+
+def _write(sales):
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(sales)
+        # bulk_create skips save signals, so totals, tank levels and cached
+        # fragments are updated here (one UPDATE per rollup row and per tank)
+        rollups.apply_sales(created)
+        inventory.consume_fuel(created)
+        invalidate_fragments('transactions', {sale.station_id_id for sale in created})
+
+
+def _store_each(pending, results):
+    """Stores ``pending`` sales one per transaction; a row the database rejects becomes that row's error."""
+    for index, sale in pending:
+        try:
+            _write([sale])
+        except IntegrityError as exc:
+            existing = Transaction.objects.filter(client_ref=sale.client_ref).values_list('transaction_id', flat=True).first()
+            if existing is not None:
+                results[index] = {'index': index, 'status': 'duplicate', 'transaction_id': existing}
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'__all__': [f'Rejected by the database: {exc}']}}
+            continue
+        results[index] = {'index': index, 'status': 'created', 'transaction_id': sale.transaction_id}
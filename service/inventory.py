@@ -0,0 +1,183 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Lower, NullIf
+from django.utils import timezone
+
+from .fragments import invalidate_fragments
+from .models import Alert, Inventory
+
+
+# TANK LEVELS
+
+def tank_key(sale):
+    return sale.station_id_id, (sale.fuel_type or '').lower()
+
+
+def consume_fuel(sales, sign=1):
+    """
+    Decrements (sign=1) or restores (sign=-1) tank levels for Transactions.
+
+    Sales are grouped per tank (station, fuel type) and each tank gets one
+    ``quantity = quantity - x`` UPDATE, so concurrent sales on the same tank
+    never lose updates and a batch issues one statement per tank, not per
+    sale. Call inside the transaction that stores the sales.
+    """
+    litres = defaultdict(float)
+    for sale in sales:
+        litres[tank_key(sale)] += sign * float(sale.quantity or 0)
+
+    for (station_id, fuel_type), amount in litres.items():
+        if amount:
+            Inventory.objects.filter(station_id=station_id, fuel_type__iexact=fuel_type).update(
+                quantity=F('quantity') - amount
+            )
+
+    if sign > 0:
+        # Levels only went down, so only new threshold crossings are possible
+        raise_low_inventory_alerts(tanks_matching(litres))
+    else:
+        evaluate_thresholds(tanks_matching(litres))
+
+
+def tanks_matching(keys):
+    """Inventory queryset for (station_id, fuel_type) keys."""
+    if not keys:
+        return Inventory.objects.none()
+    return Inventory.objects.filter(
+        reduce(or_, (Q(station_id=station_id, fuel_type__iexact=fuel_type) for station_id, fuel_type in keys))
+    )
+
+
+# LOW INVENTORY ALERTS
+
+def raise_low_inventory_alerts(tanks=None):
+    """
+    Creates one pending 'inventory' Alert per tank that crossed below its
+    min_threshold, and marks the crossing with ``low_since``.
+
+    The scan is a single set-based query; a tank that is still low after
+    its alert was handled is not alerted again until it has been refilled
+    above the threshold. The ``one_pending_alert_per_tank`` constraint keeps
+    concurrent evaluators from creating duplicates. Returns the number of
+    tanks that crossed.
+    """
+    tanks = Inventory.objects.all() if tanks is None else tanks
+    crossed = list(
+        tanks.filter(quantity__lt=F('min_threshold'), low_since__isnull=True)
+        .values('inventory_id', 'station_id', 'station__name', 'fuel_type', 'quantity', 'min_threshold')
+    )
+    if not crossed:
+        return 0
+
+    Alert.objects.bulk_create(
+        [
+            Alert(
+                station_id=tank['station_id'],
+                inventory_id_id=tank['inventory_id'],
+                type='inventory',
+                status='pending',
+                description=(
+                    f"{tank['station__name']}: {tank['fuel_type']} tank is low "
+                    f"({tank['quantity']:.0f} L left, minimum {tank['min_threshold']:.0f} L)"
+                ),
+            )
+            for tank in crossed
+        ],
+        ignore_conflicts=True,
+    )
+    Inventory.objects.filter(
+        pk__in=[tank['inventory_id'] for tank in crossed], low_since__isnull=True
+    ).update(low_since=timezone.now())
+    # bulk_create skips the Alert save signal
+    invalidate_fragments('alerts', {tank['station_id'] for tank in crossed})
+    return len(crossed)
+
+
+def clear_refilled_tanks(tanks=None):
+    """Resets ``low_since`` on tanks back at or above their threshold (one UPDATE)."""
+    tanks = Inventory.objects.all() if tanks is None else tanks
+    return tanks.filter(quantity__gte=F('min_threshold'), low_since__isnull=False).update(low_since=None)
+
+
+def evaluate_thresholds(tanks=None):
+    """Re-arms refilled tanks and alerts on new crossings. Returns (alerted, cleared)."""
+    cleared = clear_refilled_tanks(tanks)
+    alerted = raise_low_inventory_alerts(tanks)
+    return alerted, cleared
+
+
+# FILL LEVELS
+
+FILL_GOOD = 75  # percent and above
+FILL_MEDIUM = 50
+
+
+def fill_percentage(quantity='quantity', capacity='capacity'):
+    """quantity / capacity as a percentage, 0 when there is no capacity (SQL expression)."""
+    return Case(
+        When(**{f'{capacity}__gt': 0}, then=F(quantity) * 100.0 / F(capacity)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def fill_bucket(percentage='percentage'):
+    return Case(
+        When(**{f'{percentage}__gte': FILL_GOOD}, then=Value('Good')),
+        When(**{f'{percentage}__gte': FILL_MEDIUM}, then=Value('Medium')),
+        default=Value('Low'),
+    )
+
+
+def with_fill_levels(queryset):
+    """
+    Annotates tanks with ``percentage``, ``fill_status`` (Good/Medium/Low) and
+    ``below_threshold``, all computed by the database in the list query.
+    """
+    return queryset.annotate(percentage=fill_percentage()).annotate(
+        fill_status=fill_bucket(),
+        below_threshold=ExpressionWrapper(Q(quantity__lt=F('min_threshold')), output_field=BooleanField()),
+    )
+
+
+def fleet_levels(tanks):
+    """
+    Tank levels of ``tanks`` grouped by company and fuel type, in one query.
+
+    Returns dicts with the company, fuel type, tank count, total litres and
+    capacity, overall fill percentage and the number of tanks in each
+    fill bucket and below their minimum threshold.
+    """
+    rows = (
+        tanks.annotate(fuel=Lower('fuel_type'))
+        .values('station__company_id', 'station__company_id__name', 'fuel')
+        .annotate(
+            tanks=Count('pk'),
+            litres=Sum('quantity'),
+            total_capacity=Sum('capacity'),
+            good=Count('pk', filter=Q(capacity__gt=0, quantity__gte=F('capacity') * FILL_GOOD / 100.0)),
+            low=Count('pk', filter=~Q(capacity__gt=0, quantity__gte=F('capacity') * FILL_MEDIUM / 100.0)),
+            below_threshold=Count('pk', filter=Q(quantity__lt=F('min_threshold'))),
+            fill=Sum('quantity') * 100.0 / NullIf(Sum('capacity'), 0.0),
+        )
+        .order_by('station__company_id__name', 'fuel')
+    )
+    return [
+        {
+            'company_id': row['station__company_id'],
+            'company': row['station__company_id__name'],
+            'fuel_type': row['fuel'],
+            'tanks': row['tanks'],
+            'quantity': row['litres'],
+            'capacity': row['total_capacity'],
+            'percentage': round(row['fill'] or 0.0, 1),
+            'good': row['good'],
+            'medium': row['tanks'] - row['good'] - row['low'],
+            'low': row['low'],
+            'below_threshold': row['below_threshold'],
+        }
+        for row in rows
+    ]
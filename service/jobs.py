@@ -0,0 +1,279 @@
+"""
+Database-backed background jobs.
+
+Views enqueue slow work (price propagation, month-end rebuilds, alert
+sweeps, uptime summaries) as Job rows; ``manage.py run_workers`` claims
+and runs them in a thread or process pool. No broker is needed: the job
+table is the queue, so a job enqueued inside a transaction only becomes
+visible to workers once that transaction commits.
+"""
+
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+# TASK REGISTRY
+
+TASKS = {}
+
+RETRY_BACKOFF_SECONDS = 10  # doubled after every failed attempt
+HEARTBEAT_INTERVAL = 15  # seconds between a worker's heartbeats for its running jobs
+STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL * 4)  # a running job without a heartbeat for this long belongs to a dead worker
+STALE_CHECK_INTERVAL = 60  # seconds between stale-job sweeps of a worker
+
+
+def task(name=None, max_attempts=3):
+    """Registers a function as a job task under ``name`` (default: module.function)."""
+    def register(func):
+        task_name = name or f'{func.__module__.rsplit(".", 1)[-1]}.{func.__name__}'
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        TASKS[task_name] = func
+        return func
+    return register
+
+
+def enqueue(name, kwargs=None, created_by=None):
+    """
+    Queues a run of task ``name`` with the JSON-serializable dict ``kwargs``;
+    returns the Job. Raises KeyError for an unknown task and TypeError when
+    ``kwargs`` do not fit the task's signature.
+    """
+    if name not in TASKS:
+        raise KeyError(f'Unknown task {name!r}')
+    kwargs = kwargs or {}
+    inspect.signature(TASKS[name]).bind(**kwargs)
+    return Job.objects.create(
+        name=name,
+        kwargs=json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder)),
+        max_attempts=TASKS[name].max_attempts,
+        created_by_id=created_by,
+    )
+
+
+# CLAIMING AND RUNNING
+
+def claim(worker_id, limit):
+    """
+    Marks up to ``limit`` due jobs as running for ``worker_id`` and returns
+    their IDs. The conditional UPDATE only succeeds for rows still queued,
+    so two workers never run the same attempt.
+    """
+    now = timezone.now()
+    due = list(
+        Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'job_id').values_list('pk', flat=True)[:limit]
+    )
+    if not due:
+        return []
+    Job.objects.filter(pk__in=due, status='queued').update(
+        status='running', locked_by=worker_id, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(pk__in=due, status='running', locked_by=worker_id, started_at=now).values_list('pk', flat=True))
+
+
+def execute(job_id, close_connections=True):
+    """Runs one claimed job and records the outcome; safe to call in a pool thread or process."""
+    try:
+        job = Job.objects.get(pk=job_id)
+        started = time.perf_counter()
+        try:
+            result = TASKS[job.name](**job.kwargs)
+            result = json.loads(json.dumps(result, cls=DjangoJSONEncoder))
+        except Exception:
+            _record_failure(job, traceback.format_exc(), (time.perf_counter() - started) * 1000)
+            return False
+
+        finished = timezone.now()
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            status='succeeded', result=result, error=None, finished_at=finished,
+            duration_ms=(time.perf_counter() - started) * 1000, wait_ms=_wait_ms(job),
+        )
+        return True
+    finally:
+        # Pool threads and processes each hold their own connection
+        if close_connections:
+            connections.close_all()
+
+
+def _wait_ms(job):
+    # The first attempt's wait only; retries keep it
+    if job.attempts == 1 and job.started_at:
+        return (job.started_at - job.created_at).total_seconds() * 1000
+    return job.wait_ms
+
+
+def _record_failure(job, error, duration_ms):
+    changes = dict(error=error, finished_at=timezone.now(), duration_ms=duration_ms, wait_ms=_wait_ms(job))
+    if job.attempts < job.max_attempts:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        changes.update(status='queued', locked_by=None, run_after=timezone.now() + timedelta(seconds=delay))
+    else:
+        changes.update(status='failed')
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(**changes)
+
+
+def heartbeat(worker_id, now=None):
+    """Marks the jobs ``worker_id`` is running as alive; returns how many."""
+    return Job.objects.filter(status='running', locked_by=worker_id).update(heartbeat_at=now or timezone.now())
+
+
+def requeue_stale(now=None):
+    """
+    Puts jobs of dead workers (no heartbeat for STALE_AFTER) back in the
+    queue, or fails them. A long job of a live worker keeps beating and is
+    left alone however long it runs.
+    """
+    now = now or timezone.now()
+    cutoff = now - STALE_AFTER
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='running',
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(status='failed', error='Worker lost', finished_at=now)
+    requeued = stale.update(status='queued', locked_by=None, run_after=now)
+    return requeued, failed
+
+
+def _setup_process():
+    import django
+    django.setup()
+
+
+class Worker:
+    """
+    Polls the job table and runs due jobs on ``concurrency`` pool workers.
+
+    ``executor`` is 'thread' (default; tasks are I/O bound on the database),
+    'process' (CPU-heavy tasks, one Django setup per process) or 'inline'
+    (one job at a time in the calling thread).
+    """
+
+    def __init__(self, concurrency=4, executor='thread', poll_interval=1.0, worker_id=None):
+        self.concurrency = 1 if executor == 'inline' else concurrency
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _beat(self, done):
+        # Own thread, so a busy pool or an inline job cannot delay the heartbeat
+        try:
+            while not done.wait(HEARTBEAT_INTERVAL):
+                heartbeat(self.worker_id)
+        finally:
+            connections.close_all()
+
+    def run(self, once=False, max_jobs=None):
+        """
+        Runs jobs until stop() is called, ``max_jobs`` have finished or, with
+        ``once``, the queue has no due job left. Returns the number run.
+        """
+        done = threading.Event()
+        beater = threading.Thread(target=self._beat, args=(done,), name='job-heartbeat', daemon=True)
+        beater.start()
+        try:
+            if self.executor == 'inline':
+                return self._run_inline(once, max_jobs)
+            return self._run_pool(once, max_jobs)
+        finally:
+            done.set()
+            beater.join()
+
+    def _pool(self):
+        if self.executor == 'process':
+            # Children must not share the parent's database connections
+            connections.close_all()
+            return ProcessPoolExecutor(self.concurrency, initializer=_setup_process)
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def _run_pool(self, once, max_jobs):
+        finished, running, last_sweep = 0, set(), None
+        with self._pool() as pool:
+            while not self.stopping.is_set():
+                if last_sweep is None or time.monotonic() - last_sweep > STALE_CHECK_INTERVAL:
+                    requeue_stale()
+                    last_sweep = time.monotonic()
+
+                free = self.concurrency - len(running)
+                if max_jobs is not None:
+                    free = min(free, max_jobs - finished - len(running))
+                claimed = claim(self.worker_id, free) if free > 0 else []
+                running.update(pool.submit(execute, job_id) for job_id in claimed)
+
+                if not running:
+                    if once or (max_jobs is not None and finished >= max_jobs):
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                finished += len(done)
+            # Let claimed jobs finish on shutdown
+            finished += len(wait(running).done)
+        return finished
+
+    def _run_inline(self, once, max_jobs):
+        finished = 0
+        while not self.stopping.is_set() and (max_jobs is None or finished < max_jobs):
+            claimed = claim(self.worker_id, 1)
+            if not claimed:
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+                continue
+            execute(claimed[0], close_connections=False)
+            finished += 1
+        return finished
+
+
+# METRICS
+
+def job_payload(job):
+    return {
+        'job_id': job.job_id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'wait_ms': job.wait_ms,
+        'duration_ms': job.duration_ms,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else None,
+    }
+
+
+def job_stats(since=None):
+    """Per-task counts by status and timings (one grouped query)."""
+    jobs = Job.objects.all()
+    if since is not None:
+        jobs = jobs.filter(created_at__gte=since)
+    rows = jobs.values('name').annotate(
+        total=Count('pk'),
+        queued=Count('pk', filter=Q(status='queued')),
+        running=Count('pk', filter=Q(status='running')),
+        succeeded=Count('pk', filter=Q(status='succeeded')),
+        failed=Count('pk', filter=Q(status='failed')),
+        avg_wait_ms=Avg('wait_ms'),
+        avg_duration_ms=Avg('duration_ms', filter=Q(status='succeeded')),
+        max_duration_ms=Max('duration_ms', filter=Q(status='succeeded')),
+    ).order_by('name')
+    return {row.pop('name'): row for row in rows}
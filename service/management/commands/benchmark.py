@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the key views with the test client for an admin, an owner and a manager of a "
+        "seeded fleet (see seed_fleet) and writes p50/p95 latency and query counts per view as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='fleet', help="seed_fleet --prefix of the users to log in as.")
+        parser.add_argument('--role', action='append', choices=['admin', 'owner', 'manager'],
+                            help="Only these roles (repeatable; default all three).")
+        parser.add_argument('--view', action='append', dest='views', metavar='NAME',
+                            help=f"Only these views (repeatable): {', '.join(name for name, _ in benchmarks.BENCHMARK_VIEWS)}.")
+        parser.add_argument('--repeat', type=int, default=20, help="Measured requests per view (default 20).")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--output', help="Write the JSON here instead of to stdout.")
+        parser.add_argument('--compare', metavar='BASELINE', help="JSON of an earlier run to compare against.")
+
+    def handle(self, *args, **options):
+        users = benchmarks.benchmark_users(options['prefix'])
+        if options['role']:
+            users = {role: user for role, user in users.items() if role in options['role']}
+        if not users:
+            raise CommandError(f"No users with prefix {options['prefix']!r}; run seed_fleet first.")
+
+        views = benchmarks.BENCHMARK_VIEWS
+        if options['views']:
+            unknown = set(options['views']) - {name for name, _ in views}
+            if unknown:
+                raise CommandError(f"Unknown views: {', '.join(sorted(unknown))}")
+            views = [(name, path) for name, path in views if name in options['views']]
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        result = benchmarks.run_benchmark(users, views, repeat=options['repeat'], cold=options['cold'])
+        payload = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(payload + '\n')
+            self.stderr.write(f"Wrote {options['output']}.")
+        else:
+            self.stdout.write(payload)
+
+        if baseline is not None:
+            for role, name, metric, before, after, ratio in benchmarks.compare(baseline, result):
+                change = f"{ratio:.2f}x" if ratio is not None else "n/a"
+                self.stderr.write(f"{role:8} {name:28} {metric:8} {before:>10} -> {after:>10}  {change}")
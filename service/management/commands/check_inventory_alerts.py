@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from service import inventory
+
+
+class Command(BaseCommand):
+    help = "Re-scans every tank and raises pending alerts for those below their minimum threshold."
+
+    def handle(self, *args, **options):
+        alerted, cleared = inventory.evaluate_thresholds()
+        self.stdout.write(self.style.SUCCESS(f"{alerted} tanks alerted, {cleared} refilled tanks re-armed."))
@@ -0,0 +1,146 @@
+import http.cookiejar
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_PATHS = ['/dashboard/', '/pumps/dashboard/', '/transactions/', '/alerts/']
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Client:
+    """One simulated user: its own cookies (session, CSRF) and a logged-in session."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def get(self, path):
+        with self.opener.open(self.base_url + path, timeout=self.timeout) as response:
+            response.read()
+            return response.status
+
+    def login(self, email, password):
+        self.get('/')
+        token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        data = urllib.parse.urlencode({'email': email, 'password': password, 'csrfmiddlewaretoken': token}).encode()
+        request = urllib.request.Request(self.base_url + '/', data=data, headers={'Referer': self.base_url + '/'})
+        with self.opener.open(request, timeout=self.timeout) as response:
+            response.read()
+        if not any(cookie.name == 'sessionid' for cookie in self.cookies):
+            raise CommandError(f'Could not log in to {self.base_url} as {email}.')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests running servers and compares their throughput, e.g. the sync "
+        "views under WSGI against the async views under ASGI:\n"
+        "  gunicorn station.wsgi -b :8000 --threads 8\n"
+        "  ASYNC_VIEWS=1 uvicorn station.asgi:application --port 8001\n"
+        "  manage.py loadtest --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 "
+        "--email admin@example.com --password ..."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help="Server to test; repeat to compare several.")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f"Page to request, in turn; repeatable (default {' '.join(DEFAULT_PATHS)}).")
+        parser.add_argument('--email', required=True, help="Login of the simulated users.")
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--concurrency', type=int, default=16, help="Simulated users (default 16).")
+        parser.add_argument('--duration', type=float, default=20.0, help="Seconds per target (default 20).")
+        parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds first (default 2).")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Request timeout in seconds.")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url or not re.match(r'https?://', url):
+                raise CommandError(f'--target must be NAME=http://host:port, not {target!r}.')
+            targets.append((name, url))
+        paths = options['paths'] or DEFAULT_PATHS
+
+        results = []
+        for name, url in targets:
+            self.stdout.write(f"{name}: {options['concurrency']} users on {url} for {options['duration']:g}s ...")
+            result = self.run_target(url, paths, options)
+            results.append((name, result))
+            self.report(name, result)
+
+        if len(results) > 1:
+            baseline_name, baseline = results[0]
+            for name, result in results[1:]:
+                if baseline['throughput']:
+                    self.stdout.write(f"{name} vs {baseline_name}: {result['throughput'] / baseline['throughput']:.2f}x throughput")
+
+    def run_target(self, url, paths, options):
+        clients = [Client(url, options['timeout']) for _ in range(options['concurrency'])]
+        for client in clients:
+            client.login(options['email'], options['password'])
+
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+        measuring = threading.Event()
+        stop = threading.Event()
+
+        def user(client, offset):
+            turn = offset
+            while not stop.is_set():
+                path = paths[turn % len(paths)]
+                turn += 1
+                started = time.perf_counter()
+                try:
+                    ok = client.get(path) == 200
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                elapsed = time.perf_counter() - started
+                if measuring.is_set():
+                    with lock:
+                        if ok:
+                            latencies.append(elapsed)
+                        else:
+                            errors[0] += 1
+
+        threads = [threading.Thread(target=user, args=(client, i), daemon=True) for i, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['warmup'])
+        measuring.set()
+        started = time.perf_counter()
+        time.sleep(options['duration'])
+        measuring.clear()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        ordered = sorted(latencies)
+        return {
+            'requests': len(ordered),
+            'errors': errors[0],
+            'throughput': len(ordered) / elapsed,
+            'p50_ms': _percentile(ordered, 0.5) * 1000 if ordered else None,
+            'p95_ms': _percentile(ordered, 0.95) * 1000 if ordered else None,
+            'p99_ms': _percentile(ordered, 0.99) * 1000 if ordered else None,
+        }
+
+    def report(self, name, result):
+        if not result['requests']:
+            self.stdout.write(self.style.ERROR(f"  {name}: no successful request ({result['errors']} errors)"))
+            return
+        self.stdout.write(
+            f"  {result['requests']} requests, {result['errors']} errors, {result['throughput']:.1f} req/s, "
+            f"latency p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms"
+        )
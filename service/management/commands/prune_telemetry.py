@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from service import telemetry
+
+
+class Command(BaseCommand):
+    help = "Deletes pump telemetry samples and buckets older than their retention period (see telemetry.RETENTION)."
+
+    def handle(self, *args, **options):
+        deleted = telemetry.prune()
+        summary = ", ".join(f"{count} {name}" for name, count in deleted.items())
+        self.stdout.write(self.style.SUCCESS(f"Deleted {summary}."))
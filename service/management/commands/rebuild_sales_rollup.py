@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from service import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailySalesRollup table from transactions for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD). Defaults to --start.")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate()
+            end = date.fromisoformat(options['end']) if options['end'] else start
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
+
+        if end < start:
+            raise CommandError("--end must not be before --start")
+
+        written = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows for {start} to {end}."))
@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from service import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (see service/jobs.py) until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Jobs run at the same time (default 4).")
+        parser.add_argument('--executor', choices=['thread', 'process', 'inline'], default='thread',
+                            help="Pool the jobs run in (default thread).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between queue polls when idle.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due.")
+        parser.add_argument('--max-jobs', type=int, help="Exit after this many jobs.")
+
+    def handle(self, *args, **options):
+        worker = jobs.Worker(
+            concurrency=options['concurrency'],
+            executor=options['executor'],
+            poll_interval=options['poll_interval'],
+        )
+        # Finish the running jobs, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(f"Worker {worker.worker_id}: {worker.concurrency} {options['executor']} workers, "
+                          f"tasks: {', '.join(sorted(jobs.TASKS))}")
+        finished = worker.run(once=options['once'], max_jobs=options['max_jobs'])
+        self.stdout.write(self.style.SUCCESS(f"Ran {finished} jobs."))
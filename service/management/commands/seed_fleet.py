@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from service import benchmarks
+from service.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a synthetic fleet (companies, stations, pumps, tanks, "
+        "transactions, alerts) for benchmarks. Use a scratch database, e.g. SQLITE_PATH=/tmp/bench.sqlite3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(benchmarks.SCALES), default='small',
+                            help="Preset sizes (default small); the options below override them.")
+        parser.add_argument('--companies', type=int, help="Companies, one owner each.")
+        parser.add_argument('--stations', type=int, help="Stations per company, one manager each.")
+        parser.add_argument('--pumps', type=int, help="Pumps per station.")
+        parser.add_argument('--transactions', type=int, help="Sales in total.")
+        parser.add_argument('--alerts', type=int, help="Alerts in total.")
+        parser.add_argument('--days', type=int, default=90, help="Sales are spread over this many past days (default 90).")
+        parser.add_argument('--prefix', default='fleet', help="Prefix of the seeded usernames and company names.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same fleet.")
+        parser.add_argument('--batch-size', type=int, default=benchmarks.SEED_BATCH, help="Rows per bulk_create.")
+
+    def handle(self, *args, **options):
+        sizes = dict(benchmarks.SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if min(sizes.values()) < 0 or min(sizes['companies'], sizes['stations'], sizes['pumps']) < 1:
+            raise CommandError("--companies, --stations and --pumps must be at least 1; counts must not be negative.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"A fleet with prefix {options['prefix']!r} already exists; use another --prefix or database.")
+
+        self.reported = {}
+        self.stdout.write("Seeding " + ", ".join(f"{value} {name}" for name, value in sizes.items()) + " ...")
+        created = benchmarks.seed_fleet(
+            days=options['days'], prefix=options['prefix'], seed=options['seed'],
+            batch_size=options['batch_size'], progress=self.progress, **sizes,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Created " + ", ".join(f"{count} {name}" for name, count in created.items()) + ". "
+            f"Log in as {options['prefix']}-admin@example.com (or -owner-0, -manager-0-0) with password "
+            f"{benchmarks.SEED_PASSWORD!r}."
+        ))
+
+    def progress(self, name, done, total):
+        # About every tenth of the way
+        tenth = done * 10 // total
+        if tenth != self.reported.get(name):
+            self.reported[name] = tenth
+            self.stdout.write(f"  {name}: {done}/{total}")
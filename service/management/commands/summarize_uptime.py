@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from service import uptime
+
+
+class Command(BaseCommand):
+    help = "Stores per-pump uptime for a month in PumpUptimeMonth. Defaults to last month and the current month so far."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Month to summarize (YYYY-MM).")
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                months = [date.fromisoformat(options['month'] + '-01')]
+            except ValueError as exc:
+                raise CommandError(f"Invalid month: {exc}")
+        else:
+            this_month = timezone.localdate().replace(day=1)
+            months = [(this_month - timedelta(days=1)).replace(day=1), this_month]
+
+        for month in months:
+            written = uptime.summarize_month(month)
+            self.stdout.write(self.style.SUCCESS(f"Summarized {written} pumps for {month:%Y-%m}."))
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+
+# REQUEST METRICS
+
+# Samples kept per URL name; older ones roll off
+METRICS_WINDOW = getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Query count and time spent in the database, templates and the whole view for one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # async views run their queries on several threads
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.db_time += elapsed
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value of the Server-Timing header (durations in milliseconds)."""
+        return ', '.join([
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.1f}',
+            f'tpl;desc="Templates";dur={self.template_time * 1000:.1f}',
+            f'view;desc="View";dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def timed_execute(execute, sql, params, many, context):
+    """Execute wrapper of every connection; reports to the current request's timings, if any."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def _add_query_timer(sender, connection, **kwargs):
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+def install_query_timer():
+    """
+    Counts the queries of the current request on every connection, present
+    and future. Unlike a per-request connection.execute_wrapper, this also
+    covers the worker-thread connections async views read from (see
+    service/aio.py); current_timings follows the request into those threads.
+    """
+    connection_created.connect(_add_query_timer, dispatch_uid='service.metrics.query_timer')
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(None, connection)
+
+
+def install_template_timer():
+    """
+    Adds render time of Django templates to the current request's timings.
+
+    Wraps the backend Template.render, which runs once per render() or
+    TemplateResponse (includes are counted inside their parent).
+    """
+    if getattr(DjangoTemplate.render, 'timed', False):
+        return
+    render = DjangoTemplate.render
+
+    def timed_render(self, context=None, request=None):
+        timings = current_timings.get()
+        if timings is None:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timings.template_time += time.perf_counter() - started
+
+    timed_render.timed = True
+    DjangoTemplate.render = timed_render
+
+
+class ViewMetrics:
+    """Rolling window of request timings per URL name (in-process, thread safe)."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, url_name, timings):
+        sample = (timings.total_time, timings.db_time, timings.template_time, timings.queries)
+        with self._lock:
+            self._samples[url_name].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """{url_name: stats} with latency percentiles, a latency histogram and query counts."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        return {name: _summarize(values) for name, values in sorted(samples.items())}
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summarize(samples):
+    totals = sorted(sample[0] * 1000 for sample in samples)
+    queries = sorted(sample[3] for sample in samples)
+    histogram = {f'le_{bound}ms': 0 for bound in LATENCY_BUCKETS_MS}
+    histogram['inf'] = 0
+    for value in totals:
+        bucket = next((f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS if value <= bound), 'inf')
+        histogram[bucket] += 1
+    return {
+        'count': len(samples),
+        'latency_ms': {
+            'p50': round(_percentile(totals, 0.5), 1),
+            'p95': round(_percentile(totals, 0.95), 1),
+            'max': round(totals[-1], 1),
+        },
+        'db_ms_avg': round(sum(sample[1] for sample in samples) * 1000 / len(samples), 1),
+        'template_ms_avg': round(sum(sample[2] for sample in samples) * 1000 / len(samples), 1),
+        'queries': {'p50': _percentile(queries, 0.5), 'max': queries[-1]},
+        'histogram': histogram,
+    }
+
+
+view_metrics = ViewMetrics()
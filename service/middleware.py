@@ -0,0 +1,118 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from . import routers
+from .access import StationAccess
+from .metrics import RequestTimings, current_timings, install_query_timer, install_template_timer, view_metrics
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively under WSGI and ASGI.
+
+    Under ASGI the chain then stays async down to the async views (see
+    service/aio.py) instead of passing every request through a thread.
+    Subclasses implement both ``handle`` and ``ahandle``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class RequestMetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Measures every request: query count, DB time, template time and total time.
+
+    The numbers are sent back as a ``Server-Timing`` header (visible in the
+    browser's network panel) and recorded per URL name in ``view_metrics``.
+    Install it first in MIDDLEWARE so the session and auth queries count too.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        install_query_timer()
+        install_template_timer()
+
+    def handle(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def ahandle(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        response['Server-Timing'] = timings.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            view_metrics.record(match.view_name, timings)
+        return response
+
+
+class ReadYourWritesMiddleware(SyncAndAsyncMiddleware):
+    """
+    Keeps reporting reads on the primary for a client that just wrote.
+
+    A request that wrote to the database gets a short-lived cookie; while it
+    is present, reporting reads skip the replica (see service/routers.py).
+    """
+
+    def handle(self, request):
+        state = routers.RequestRouting(pinned=routers.PRIMARY_PIN_COOKIE in request.COOKIES)
+        with routers.request_routing(state):
+            response = self.get_response(request)
+        return self.finish(response, state)
+
+    async def ahandle(self, request):
+        state = routers.RequestRouting(pinned=routers.PRIMARY_PIN_COOKIE in request.COOKIES)
+        with routers.request_routing(state):
+            response = await self.get_response(request)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                routers.PRIMARY_PIN_COOKIE, '1', max_age=routers.PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class StationAccessMiddleware(SyncAndAsyncMiddleware):
+    """
+    Attaches a per-request StationAccess resolver as ``request.access``.
+
+    It is lazy: the session is only read when a view first uses it, so
+    async views resolve it off the event loop (see aio.resolve_access).
+    """
+
+    def attach(self, request):
+        request.access = SimpleLazyObject(lambda: StationAccess.from_session(request.session))
+
+    def handle(self, request):
+        self.attach(request)
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        self.attach(request)
+        return await self.get_response(request)
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0005_rename_station_id_inventory_station_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('rollup_id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('fuel_type', models.CharField(max_length=50)),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('momo', 'Mobile Money'), ('card', 'Card')], max_length=10)),
+                ('litres', models.FloatField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='service.station')),
+            ],
+            options={
+                'unique_together': {('station', 'date', 'fuel_type', 'payment_method')},
+            },
+        ),
+    ]
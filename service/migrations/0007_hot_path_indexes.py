@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0006_dailysalesrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                fields=["station", "status", "-created_at"],
+                name="alert_station_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                fields=["status", "-created_at"], name="alert_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(fields=["-created_at"], name="alert_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dailysalesrollup",
+            index=models.Index(fields=["date"], name="rollup_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="inventory",
+            index=models.Index(
+                fields=["fuel_type", "station"], name="inv_fuel_station_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pump",
+            index=models.Index(
+                fields=["station", "status"], name="pump_station_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["station_id", "-transaction_time"], name="txn_station_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["-transaction_time"], name="txn_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["payment_method", "-transaction_time"],
+                name="txn_payment_time_idx",
+            ),
+        ),
+    ]
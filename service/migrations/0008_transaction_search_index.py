@@ -0,0 +1,75 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE service_transaction_search USING fts5(
+        plate, fuel_type, payment_method, tokenize = 'trigram'
+    )
+    """,
+    """
+    INSERT INTO service_transaction_search (rowid, plate, fuel_type, payment_method)
+    SELECT transaction_id, replace(upper(coalesce(car_plate, '')), ' ', ''), fuel_type, payment_method
+    FROM service_transaction
+    """,
+    """
+    CREATE TRIGGER service_transaction_search_ai AFTER INSERT ON service_transaction BEGIN
+        INSERT INTO service_transaction_search (rowid, plate, fuel_type, payment_method)
+        VALUES (new.transaction_id, replace(upper(coalesce(new.car_plate, '')), ' ', ''), new.fuel_type, new.payment_method);
+    END
+    """,
+    """
+    CREATE TRIGGER service_transaction_search_ad AFTER DELETE ON service_transaction BEGIN
+        DELETE FROM service_transaction_search WHERE rowid = old.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER service_transaction_search_au AFTER UPDATE ON service_transaction BEGIN
+        DELETE FROM service_transaction_search WHERE rowid = old.transaction_id;
+        INSERT INTO service_transaction_search (rowid, plate, fuel_type, payment_method)
+        VALUES (new.transaction_id, replace(upper(coalesce(new.car_plate, '')), ' ', ''), new.fuel_type, new.payment_method);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS service_transaction_search_au",
+    "DROP TRIGGER IF EXISTS service_transaction_search_ad",
+    "DROP TRIGGER IF EXISTS service_transaction_search_ai",
+    "DROP TABLE IF EXISTS service_transaction_search",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    'CREATE INDEX IF NOT EXISTS txn_plate_trgm_idx ON service_transaction USING gin (UPPER("car_plate") gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS txn_plate_trgm_idx",
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor == "sqlite" and connection.Database.sqlite_version_info < (3, 34, 0):
+            # The FTS5 trigram tokenizer needs SQLite 3.34+; search falls back to LIKE
+            return
+        for sql in statements_by_vendor.get(connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0007_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:25
+
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+
+search_index = import_module("service.migrations.0008_transaction_search_index")
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # Adding client_ref rebuilds service_transaction on SQLite, which drops its triggers
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite" or connection.Database.sqlite_version_info < (3, 34, 0):
+        return
+    for sql in search_index.SQLITE_FORWARD:
+        if "CREATE TRIGGER" in sql:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0008_transaction_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="client_ref",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="transaction_time",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:29
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def ignore_duplicate_pending_alerts(apps, schema_editor):
+    # Keep the newest pending inventory alert of each tank so the constraint can be added
+    Alert = apps.get_model("service", "Alert")
+    pending = Alert.objects.using(schema_editor.connection.alias).filter(
+        type="inventory", status="pending", inventory_id__isnull=False
+    )
+    duplicated = (
+        pending.values("inventory_id")
+        .annotate(count=Count("pk"), newest=Max("pk"))
+        .filter(count__gt=1)
+    )
+    for row in duplicated:
+        pending.filter(inventory_id=row["inventory_id"]).exclude(pk=row["newest"]).update(
+            status="ignored"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0009_transaction_client_ref"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inventory",
+            name="low_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(ignore_duplicate_pending_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="alert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pending"), ("type", "inventory")),
+                fields=("inventory_id",),
+                name="one_pending_alert_per_tank",
+            ),
+        ),
+    ]
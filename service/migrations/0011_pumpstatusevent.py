@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0010_low_inventory_alerts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PumpStatusEvent",
+            fields=[
+                ("event_id", models.AutoField(primary_key=True, serialize=False)),
+                ("status", models.CharField(max_length=20)),
+                (
+                    "previous_status",
+                    models.CharField(blank=True, max_length=20, null=True),
+                ),
+                ("flow_rate", models.FloatField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "pump",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_events",
+                        to="service.pump",
+                    ),
+                ),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pump_status_events",
+                        to="service.station",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["station", "event_id"], name="pump_event_station_idx"
+                    )
+                ],
+            },
+        ),
+    ]
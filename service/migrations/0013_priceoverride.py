@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0012_cacheversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceOverride",
+            fields=[
+                ("override_id", models.AutoField(primary_key=True, serialize=False)),
+                ("fuel_type", models.CharField(max_length=50)),
+                (
+                    "price_per_liter",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_overrides",
+                        to="service.company",
+                    ),
+                ),
+                (
+                    "station",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_overrides",
+                        to="service.station",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("company__isnull", False), ("station__isnull", True)
+                            ),
+                            models.Q(
+                                ("company__isnull", True), ("station__isnull", False)
+                            ),
+                            _connector="OR",
+                        ),
+                        name="price_override_company_xor_station",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("company", "fuel_type"),
+                        name="one_price_per_company_fuel",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("station", "fuel_type"),
+                        name="one_price_per_station_fuel",
+                    ),
+                ],
+            },
+        ),
+    ]
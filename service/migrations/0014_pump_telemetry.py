@@ -0,0 +1,107 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0013_priceoverride"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PumpSample",
+            fields=[
+                ("sample_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("recorded_at", models.DateTimeField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("active", "Active"), ("offline", "Offline")],
+                        max_length=20,
+                    ),
+                ),
+                ("flow_rate", models.FloatField(blank=True, null=True)),
+                ("dispensed", models.FloatField(default=0)),
+                (
+                    "pump",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="samples",
+                        to="service.pump",
+                    ),
+                ),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pump_samples",
+                        to="service.station",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["pump", "recorded_at"], name="pump_sample_pump_time_idx"
+                    ),
+                    models.Index(fields=["recorded_at"], name="pump_sample_time_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PumpTelemetryBucket",
+            fields=[
+                ("bucket_id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[
+                            ("minute", "1 minute"),
+                            ("hour", "1 hour"),
+                            ("day", "1 day"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("samples", models.IntegerField(default=0)),
+                ("active_samples", models.IntegerField(default=0)),
+                ("flow_total", models.FloatField(default=0)),
+                ("flow_samples", models.IntegerField(default=0)),
+                ("flow_max", models.FloatField(default=0)),
+                ("dispensed", models.FloatField(default=0)),
+                (
+                    "pump",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="telemetry_buckets",
+                        to="service.pump",
+                    ),
+                ),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pump_telemetry_buckets",
+                        to="service.station",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["resolution", "bucket_start"],
+                        name="telemetry_resolution_idx",
+                    ),
+                    models.Index(
+                        fields=["station", "resolution", "bucket_start"],
+                        name="telemetry_station_idx",
+                    ),
+                ],
+                "unique_together": {("pump", "resolution", "bucket_start")},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0014_pump_telemetry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PumpUptimeMonth",
+            fields=[
+                ("uptime_id", models.AutoField(primary_key=True, serialize=False)),
+                ("month", models.DateField()),
+                ("up_seconds", models.FloatField(default=0)),
+                ("observed_seconds", models.FloatField(default=0)),
+                ("transitions", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pumpstatusevent",
+            index=models.Index(fields=["created_at"], name="pump_event_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pumpstatusevent",
+            index=models.Index(
+                fields=["pump", "created_at"], name="pump_event_pump_time_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="pumpuptimemonth",
+            name="pump",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="uptime_months",
+                to="service.pump",
+            ),
+        ),
+        migrations.AddField(
+            model_name="pumpuptimemonth",
+            name="station",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pump_uptime_months",
+                to="service.station",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pumpuptimemonth",
+            index=models.Index(
+                fields=["month", "station"], name="uptime_month_station_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="pumpuptimemonth",
+            unique_together={("pump", "month")},
+        ),
+    ]
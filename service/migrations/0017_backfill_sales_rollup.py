@@ -0,0 +1,48 @@
+from django.db import DEFAULT_DB_ALIAS, migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import Lower, TruncDate
+
+
+def backfill_sales_rollup(apps, schema_editor):
+    # Totals cards and the dashboard read DailySalesRollup; fill it from the sales
+    # recorded before it existed. Same grouping as rollups.rebuild(), written
+    # against the historical models so later model changes cannot break it.
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    Transaction = apps.get_model("service", "Transaction")
+    DailySalesRollup = apps.get_model("service", "DailySalesRollup")
+
+    rows = (
+        Transaction.objects.values(
+            "station_id", "payment_method", day=TruncDate("transaction_time"), fuel=Lower("fuel_type")
+        )
+        .annotate(litres=Sum("quantity"), revenue=Sum("total_price"), count=Count("pk"))
+        .order_by()
+    )
+    DailySalesRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                station_id=row["station_id"],
+                date=row["day"],
+                fuel_type=row["fuel"],
+                payment_method=row["payment_method"],
+                litres=row["litres"] or 0,
+                revenue=row["revenue"] or 0,
+                count=row["count"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service", "0016_job"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollup, migrations.RunPython.noop),
+    ]
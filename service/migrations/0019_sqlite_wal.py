@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # WAL is a property of the database file: switching it on here, once, keeps
+    # connections from rewriting the file header every time they open it
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        if cursor.fetchone()[0] != "wal":
+            cursor.execute("PRAGMA journal_mode=WAL")
+
+
+class Migration(migrations.Migration):
+
+    # The journal mode cannot change inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("service", "0018_job_heartbeat"),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 
@@ -82,6 +83,10 @@ class Pump(models.Model):
     
     class Meta:
         unique_together = ('station', 'pump_number')
+        indexes = [
+            # pump_monitoring / dashboard status counts per station
+            models.Index(fields=['station', 'status'], name='pump_station_status_idx'),
+        ]
 
     def __str__(self):
         return f"Pump {self.pump_number} - {self.station.name}"
@@ -94,25 +99,30 @@ class SystemSetting(models.Model):
     price_per_liter = models.DecimalField(max_digits=10, decimal_places=2)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def update_prices(self, user_role, company_id=None):
-        """Updates prices in SystemSetting and relevant Inventory models."""
-        
-        # 1. Update the SystemSetting (Global/Company Price)
-        self.save() 
-        
-        # 2. Update Inventory prices (Synchronize)
-        
-        # Admin: Updates Inventory for ALL stations/companies with this fuel_type
+    def update_prices(self, user_role, company_id=None, station_id=None, background=False):
+        """
+        Updates the global price (admin) or a company/station price override (owner).
+        With ``background``, the admin's fleet-wide tank repricing is queued as a job.
+        """
+        from . import jobs, pricing
+
+        # Admin: the SystemSetting is the global price; Inventory of every
+        # station without an override follows it. Sales are priced from the
+        # settings, so the tanks' unit_price may follow a moment later.
         if user_role == 'admin':
-            Inventory.objects.filter(fuel_type=self.fuel_type).update(unit_price=self.price_per_liter)
-            
-        # Owner: Updates Inventory only for stations under their company(ies)
+            self.save()
+            if background:
+                jobs.enqueue('tasks.sync_global_inventory', {'fuel_type': self.fuel_type})
+            else:
+                pricing.sync_global_inventory(self.fuel_type, self.price_per_liter)
+
+        # Owner: only their company's (or one station's) override row changes;
+        # the global SystemSetting is left untouched
+        elif user_role == 'owner' and station_id:
+            pricing.set_station_price(station_id, self.fuel_type, self.price_per_liter)
         elif user_role == 'owner' and company_id:
-            Inventory.objects.filter(
-                fuel_type=self.fuel_type, 
-                station_id__company_id=company_id
-            ).update(unit_price=self.price_per_liter)
-            
+            pricing.set_company_price(company_id, self.fuel_type, self.price_per_liter)
+
         # Manager/Other: No price setting privilege
 
     def __str__(self):
@@ -120,6 +130,35 @@ class SystemSetting(models.Model):
 
 
 
+# Price Overrides (per company or per station, on top of SystemSetting)
+
+class PriceOverride(models.Model):
+    override_id = models.AutoField(primary_key=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True, related_name='price_overrides')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, null=True, blank=True, related_name='price_overrides')
+    fuel_type = models.CharField(max_length=50)  # stored lower case
+    price_per_liter = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(company__isnull=False, station__isnull=True)
+                    | models.Q(company__isnull=True, station__isnull=False)
+                ),
+                name='price_override_company_xor_station',
+            ),
+            models.UniqueConstraint(fields=['company', 'fuel_type'], name='one_price_per_company_fuel'),
+            models.UniqueConstraint(fields=['station', 'fuel_type'], name='one_price_per_station_fuel'),
+        ]
+
+    def __str__(self):
+        scope = f"station {self.station_id}" if self.station_id else f"company {self.company_id}"
+        return f"{self.fuel_type} @ {scope}: {self.price_per_liter}"
+
+
+
 # Inventory (Weak Entity)
 # Inventory (Weak Entity)
 class Inventory(models.Model):
@@ -138,10 +177,16 @@ class Inventory(models.Model):
     min_threshold = models.FloatField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the level drops below min_threshold, cleared once it is back above
+    low_since = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         # CORRECTED: Updated to use 'station' field name
         unique_together = ('station', 'fuel_type')
+        indexes = [
+            # SystemSetting.update_prices filters by fuel type across stations
+            models.Index(fields=['fuel_type', 'station'], name='inv_fuel_station_idx'),
+        ]
 
     def __str__(self):
         # FIXED: This now correctly uses 'self.station' which exists
@@ -166,7 +211,19 @@ class Transaction(models.Model):
     ]
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHODS)
     car_plate = models.CharField(max_length=20, blank=True, null=True)
-    transaction_time = models.DateTimeField(auto_now_add=True)
+    # Defaults to now, but batch uploads keep the time the controller recorded the sale
+    transaction_time = models.DateTimeField(default=timezone.now)
+    # Client-supplied dedup key for batch uploads from pump controllers
+    client_ref = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # TransactionListView / dashboard: station filter, newest first
+            models.Index(fields=['station_id', '-transaction_time'], name='txn_station_time_idx'),
+            # Admin lists (no station filter) and the duration filter
+            models.Index(fields=['-transaction_time'], name='txn_time_idx'),
+            models.Index(fields=['payment_method', '-transaction_time'], name='txn_payment_time_idx'),
+        ]
 
     def __str__(self):
         return f"Transaction {self.transaction_id}"
@@ -196,5 +253,194 @@ class Alert(models.Model):
     ]
     status = models.CharField(max_length=20, choices=status_choices, default='pending')
 
+    class Meta:
+        indexes = [
+            # AlertListView / dashboard: station + status filter, newest first
+            models.Index(fields=['station', 'status', '-created_at'], name='alert_station_status_idx'),
+            # Admin lists (no station filter)
+            models.Index(fields=['status', '-created_at'], name='alert_status_created_idx'),
+            models.Index(fields=['-created_at'], name='alert_created_idx'),
+        ]
+        constraints = [
+            # The low-inventory evaluator relies on this to never duplicate a pending alert
+            models.UniqueConstraint(
+                fields=['inventory_id'],
+                condition=models.Q(type='inventory', status='pending'),
+                name='one_pending_alert_per_tank',
+            ),
+        ]
+
     def __str__(self):
         return f"Alert {self.alert_id} - {self.type}"
+
+
+
+# Daily Sales Rollup (materialized totals per station/day/fuel/payment method)
+
+class DailySalesRollup(models.Model):
+    rollup_id = models.AutoField(primary_key=True)
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='sales_rollups')
+    date = models.DateField()
+    fuel_type = models.CharField(max_length=50)
+    payment_method = models.CharField(max_length=10, choices=Transaction.PAYMENT_METHODS)
+    litres = models.FloatField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('station', 'date', 'fuel_type', 'payment_method')
+        indexes = [
+            # Admin totals (no station filter)
+            models.Index(fields=['date'], name='rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.station_id} {self.date} {self.fuel_type}/{self.payment_method}"
+
+
+
+# Pump Status Events (append-only log of pump status changes)
+
+class PumpStatusEvent(models.Model):
+    event_id = models.AutoField(primary_key=True)
+    pump = models.ForeignKey(Pump, on_delete=models.CASCADE, related_name='status_events')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='pump_status_events')
+    status = models.CharField(max_length=20)
+    previous_status = models.CharField(max_length=20, blank=True, null=True)
+    flow_rate = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Replays after a reconnect: events of the user's stations after an ID
+            models.Index(fields=['station', 'event_id'], name='pump_event_station_idx'),
+            # Uptime: transitions in a window, and each pump's status before it
+            models.Index(fields=['created_at'], name='pump_event_time_idx'),
+            models.Index(fields=['pump', 'created_at'], name='pump_event_pump_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pump {self.pump_id}: {self.previous_status} -> {self.status}"
+
+
+# Pump Telemetry (raw samples plus per-minute/hour/day buckets, see service/telemetry.py)
+
+class PumpSample(models.Model):
+    sample_id = models.BigAutoField(primary_key=True)
+    pump = models.ForeignKey(Pump, on_delete=models.CASCADE, related_name='samples')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='pump_samples')
+    recorded_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Pump.STATUS_CHOICES)
+    flow_rate = models.FloatField(null=True, blank=True)  # litres per minute
+    dispensed = models.FloatField(default=0)  # litres since the controller's previous sample
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pump', 'recorded_at'], name='pump_sample_pump_time_idx'),
+            # Retention deletes the oldest samples first
+            models.Index(fields=['recorded_at'], name='pump_sample_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pump {self.pump_id} @ {self.recorded_at}: {self.status}"
+
+
+class PumpTelemetryBucket(models.Model):
+    RESOLUTION_CHOICES = [
+        ('minute', '1 minute'),
+        ('hour', '1 hour'),
+        ('day', '1 day'),
+    ]
+
+    bucket_id = models.BigAutoField(primary_key=True)
+    pump = models.ForeignKey(Pump, on_delete=models.CASCADE, related_name='telemetry_buckets')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='pump_telemetry_buckets')
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    samples = models.IntegerField(default=0)
+    active_samples = models.IntegerField(default=0)
+    flow_total = models.FloatField(default=0)  # sum of the reported flow rates
+    flow_samples = models.IntegerField(default=0)  # samples that reported a flow rate
+    flow_max = models.FloatField(default=0)
+    dispensed = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('pump', 'resolution', 'bucket_start')
+        indexes = [
+            # History of every pump the user can see; retention by resolution
+            models.Index(fields=['resolution', 'bucket_start'], name='telemetry_resolution_idx'),
+            models.Index(fields=['station', 'resolution', 'bucket_start'], name='telemetry_station_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pump {self.pump_id} {self.resolution} {self.bucket_start}"
+
+# Pump Uptime (monthly summary of the status transition log, see service/uptime.py)
+
+class PumpUptimeMonth(models.Model):
+    uptime_id = models.AutoField(primary_key=True)
+    pump = models.ForeignKey(Pump, on_delete=models.CASCADE, related_name='uptime_months')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='pump_uptime_months')
+    month = models.DateField()  # first day of the month
+    up_seconds = models.FloatField(default=0)
+    observed_seconds = models.FloatField(default=0)  # the part of the month the pump existed
+    transitions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('pump', 'month')
+        indexes = [
+            models.Index(fields=['month', 'station'], name='uptime_month_station_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pump {self.pump_id} {self.month:%Y-%m}"
+
+# Background Jobs (DB-backed queue, see service/jobs.py)
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)  # registered task name
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # retries are delayed (backoff)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, null=True, blank=True)  # worker that claimed the current attempt
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed by the worker while the attempt runs
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wait_ms = models.FloatField(null=True, blank=True)  # queued -> first start
+    duration_ms = models.FloatField(null=True, blank=True)  # last attempt
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due job
+            models.Index(fields=['status', 'run_after', 'job_id'], name='job_claim_idx'),
+            models.Index(fields=['name', 'status'], name='job_name_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.job_id} {self.name} ({self.status})"
+
+
+# Cache Versions (cross-process invalidation counters)
+
+class CacheVersion(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
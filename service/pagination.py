@@ -0,0 +1,236 @@
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+# KEYSET (CURSOR) PAGINATION
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """One page of a CursorPaginator, newest rows first."""
+
+    def __init__(self, object_list, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        # Templates test {% if cursor_page %} for "keyset paging is on", empty page or not
+        return True
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over (time_field, pk_field), newest first.
+
+    Each page is fetched with a ``WHERE (time, pk) < (last time, last pk)``
+    seek instead of ``OFFSET``, and no ``COUNT(*)`` is run, so page 1000 costs
+    the same as page 1. Tokens are signed and opaque to clients.
+    """
+
+    salt = 'service.pagination.cursor'
+
+    def __init__(self, queryset, time_field, pk_field, per_page):
+        self.queryset = queryset
+        self.time_field = time_field
+        self.pk_field = pk_field
+        self.per_page = per_page
+
+    def encode(self, direction, obj):
+        value = getattr(obj, self.time_field)
+        return signing.dumps([direction, value.isoformat(), getattr(obj, self.pk_field)], salt=self.salt, compress=True)
+
+    def decode(self, token):
+        try:
+            direction, value, pk = signing.loads(token, salt=self.salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor(token)
+        value = parse_datetime(value) if isinstance(value, str) else None
+        if direction not in ('next', 'prev') or value is None:
+            raise InvalidCursor(token)
+        return direction, value, pk
+
+    def last_page(self):
+        """The oldest rows."""
+        rows = list(self.queryset.order_by(self.time_field, self.pk_field)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not rows:
+            return CursorPage([])
+        return CursorPage(rows, previous_token=self.encode('prev', rows[0]) if more else None)
+
+    def page(self, token=None):
+        time_field, pk_field = self.time_field, self.pk_field
+        queryset = self.queryset
+
+        direction = None
+        if token:
+            direction, value, pk = self.decode(token)
+            # A range on the time field plus an exclusion for the tie, rather
+            # than (time < v OR (time = v AND pk < p)): the OR makes SQLite
+            # merge two index scans and sort everything past the cursor
+            if direction == 'next':
+                # Older rows than the last one shown
+                queryset = queryset.filter(**{f'{time_field}__lte': value}).exclude(
+                    **{time_field: value, f'{pk_field}__gte': pk}
+                )
+            else:
+                # Newer rows than the first one shown
+                queryset = queryset.filter(**{f'{time_field}__gte': value}).exclude(
+                    **{time_field: value, f'{pk_field}__lte': pk}
+                )
+
+        if direction == 'prev':
+            rows = list(queryset.order_by(time_field, pk_field)[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_newer, has_older = more, True
+        else:
+            rows = list(queryset.order_by(f'-{time_field}', f'-{pk_field}')[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_newer, has_older = direction == 'next', more
+
+        if not rows:
+            if direction is None:
+                return CursorPage([])
+            # Past either end (rows went away since the link was made): the
+            # nearest page, like Paginator.get_page, rather than a dead end
+            return self.page() if direction == 'prev' else self.last_page()
+        return CursorPage(
+            rows,
+            next_token=self.encode('next', rows[-1]) if has_older else None,
+            previous_token=self.encode('prev', rows[0]) if has_newer else None,
+        )
+
+
+def use_cursor_pagination(request):
+    return request.GET.get('paging') == 'cursor' or bool(request.GET.get('cursor'))
+
+
+def cursor_page(request, queryset, cursor_ordering, per_page):
+    """
+    The CursorPage selected by ``request`` (?cursor=, an invalid token gives
+    the first page), with ready-made ``first_query``, ``next_query`` and
+    ``previous_query`` strings for the template.
+    """
+    time_field, pk_field = cursor_ordering
+    paginator = CursorPaginator(queryset, time_field, pk_field, per_page)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.page()
+
+    params = request.GET.copy()
+    params['paging'] = 'cursor'
+    params.pop('page', None)
+    params.pop('cursor', None)
+    page.first_query = params.urlencode()
+    if page.has_next():
+        params['cursor'] = page.next_token
+        page.next_query = params.urlencode()
+    if page.has_previous():
+        params['cursor'] = page.previous_token
+        page.previous_query = params.urlencode()
+    return page
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination for a ListView.
+
+    ``?paging=cursor`` (or any ``cursor`` token) switches the view from the
+    default Paginator to a CursorPaginator ordered by ``cursor_ordering``.
+    The template receives ``cursor_page`` (see cursor_page). ``paginator``
+    is None, so no exact total is counted; the totals cards keep their
+    cheap counts.
+    """
+
+    cursor_ordering = None  # (time_field, pk_field)
+
+    def use_cursor_pagination(self):
+        return use_cursor_pagination(self.request)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        page = self.cursor_page = cursor_page(self.request, queryset, self.cursor_ordering, page_size)
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_page'] = getattr(self, 'cursor_page', None)
+        return context
+
+
+# ESTIMATED COUNTS
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimated_row_count(queryset):
+    """
+    Approximate row count of the table behind an unfiltered ``queryset``.
+
+    PostgreSQL reads the planner statistics (pg_class.reltuples), MySQL the
+    table status; SQLite has no statistics, so the largest primary key is
+    used (an index lookup; overestimates by the rows deleted). Returns None
+    when no estimate is available.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    return model._default_manager.using(queryset.db).aggregate(estimate=Max('pk'))['estimate'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that does not COUNT(*) a large unfiltered table.
+
+    Filtered querysets (changelist filters, date drill-down, search) are
+    still counted exactly; they are narrowed by an index.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
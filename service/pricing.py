@@ -0,0 +1,200 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Inventory, PriceOverride, Station, SystemSetting
+from . import versions
+
+
+# FUEL PRICES
+#
+# The effective price of a fuel at a station is, in order: the station's
+# PriceOverride, its company's PriceOverride, then the global SystemSetting.
+
+PRICE_VERSION = 'prices'
+COMPANY_VERSION_PREFIX = 'prices:company:'
+# Longest time a process keeps serving prices before re-checking the stored versions
+PRICE_CACHE_CHECK_INTERVAL = getattr(settings, 'PRICE_CACHE_CHECK_INTERVAL', 5)
+
+
+def company_version(company_id):
+    return f'{COMPANY_VERSION_PREFIX}{company_id}'
+
+
+def normalize_fuel(fuel_type):
+    return (fuel_type or '').lower()
+
+
+class CompanyPrices:
+    """Precomputed effective prices of one company and each of its stations."""
+
+    def __init__(self, company_id, global_prices):
+        station_ids = list(Station.objects.filter(company_id=company_id).values_list('pk', flat=True))
+        overrides = PriceOverride.objects.filter(company_id=company_id) | PriceOverride.objects.filter(station_id__in=station_ids)
+
+        self.company = dict(global_prices)
+        station_overrides = {station_id: {} for station_id in station_ids}
+        for override in overrides:
+            price = Decimal(override.price_per_liter)
+            if override.station_id:
+                station_overrides[override.station_id][override.fuel_type] = price
+            else:
+                self.company[override.fuel_type] = price
+
+        self.stations = {station_id: {**self.company, **own} for station_id, own in station_overrides.items()}
+        # Fuels each station prices itself (these stations ignore company changes)
+        self.own_fuels = {station_id: set(own) for station_id, own in station_overrides.items()}
+
+    def prices_for_station(self, station_id):
+        return self.stations.get(station_id, self.company)
+
+
+class PriceCache:
+    """
+    Per-process lookup table of effective fuel prices.
+
+    The global part (SystemSetting) is tagged with the 'prices' version and
+    each company's part with its own 'prices:company:<id>' version, all stored
+    in CacheVersion. At most every PRICE_CACHE_CHECK_INTERVAL seconds the
+    stored versions are compared (one query) and only what changed is
+    dropped: an owner changing their company's price leaves every other
+    company's cached prices alone. Changes made in this process invalidate
+    the copy immediately through signals.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._versions = None
+        self._global = None  # (SystemSetting rows, {fuel: price})
+        self._companies = {}  # company_id -> CompanyPrices
+        self._station_company = {}  # station_id -> company_id
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        if self._versions is not None and time.monotonic() - self._checked_at < PRICE_CACHE_CHECK_INTERVAL:
+            return
+        with self._lock:
+            stored = versions.versions_with_prefix(PRICE_VERSION)
+            if self._versions is None or stored.get(PRICE_VERSION) != self._versions.get(PRICE_VERSION):
+                self._drop_all()
+            else:
+                for name in set(stored) | set(self._versions):
+                    if name.startswith(COMPANY_VERSION_PREFIX) and stored.get(name) != self._versions.get(name):
+                        self._drop_company(int(name[len(COMPANY_VERSION_PREFIX):]))
+            self._versions = stored
+            self._checked_at = time.monotonic()
+
+    def _drop_all(self):
+        self._global = None
+        self._companies.clear()
+        self._station_company.clear()
+
+    def _drop_company(self, company_id):
+        self._companies.pop(company_id, None)
+        for station_id in [s for s, c in self._station_company.items() if c == company_id]:
+            del self._station_company[station_id]
+
+    def global_snapshot(self):
+        self._refresh()
+        with self._lock:
+            if self._global is None:
+                rows = list(SystemSetting.objects.order_by('fuel_type'))
+                self._global = (rows, {normalize_fuel(row.fuel_type): Decimal(row.price_per_liter) for row in rows})
+            return self._global
+
+    def company_prices(self, company_id):
+        global_prices = self.global_snapshot()[1]
+        with self._lock:
+            if company_id not in self._companies:
+                self._companies[company_id] = CompanyPrices(company_id, global_prices)
+            return self._companies[company_id]
+
+    def station_prices(self, station_id):
+        self._refresh()
+        with self._lock:
+            company_id = self._station_company.get(station_id)
+            if company_id is None:
+                company_id = Station.objects.filter(pk=station_id).values_list('company_id', flat=True).first()
+                if company_id is None:
+                    return self.global_snapshot()[1]
+                self._station_company[station_id] = company_id
+            return self.company_prices(company_id).prices_for_station(station_id)
+
+    def invalidate(self, company_id=None):
+        with self._lock:
+            if company_id is None:
+                self._versions = None
+                self._drop_all()
+            else:
+                self._drop_company(company_id)
+
+
+price_cache = PriceCache()
+
+
+def invalidate_prices(company_id=None):
+    """
+    Bumps the shared version of the global prices (``company_id`` None) or of
+    one company's overrides, and drops this process's copy of it.
+    """
+    versions.bump_version(PRICE_VERSION if company_id is None else company_version(company_id))
+    price_cache.invalidate(company_id)
+    # Another thread may have reloaded the uncommitted (old) rows meanwhile
+    transaction.on_commit(lambda: price_cache.invalidate(company_id))
+
+
+def price_map(station_id=None):
+    """The cached {fuel_type (lower case): price_per_liter} map, effective at ``station_id``."""
+    if station_id is None:
+        return price_cache.global_snapshot()[1]
+    return price_cache.station_prices(station_id)
+
+
+def fuel_settings():
+    """The cached SystemSetting rows, ordered by fuel_type (treat as read-only)."""
+    return price_cache.global_snapshot()[0]
+
+
+def price_for(fuel_type, prices=None, station_id=None):
+    """Price per liter of ``fuel_type`` (at ``station_id``) or None when it has no price."""
+    prices = price_map(station_id) if prices is None else prices
+    return prices.get(normalize_fuel(fuel_type))
+
+
+# PRICE CHANGES
+
+def set_company_price(company_id, fuel_type, price):
+    """
+    Stores a company-wide override and reprices the company's tanks.
+
+    Stations with their own override for the fuel keep their price. The
+    tanks are repriced with one UPDATE on station IDs taken from the lookup
+    table, instead of joining Inventory to Station and Company.
+    """
+    fuel = normalize_fuel(fuel_type)
+    PriceOverride.objects.update_or_create(company_id=company_id, fuel_type=fuel, defaults={'price_per_liter': price})
+    table = price_cache.company_prices(int(company_id))
+    station_ids = [station_id for station_id, own in table.own_fuels.items() if fuel not in own]
+    return Inventory.objects.filter(station_id__in=station_ids, fuel_type__iexact=fuel).update(unit_price=price)
+
+
+def set_station_price(station_id, fuel_type, price):
+    """Stores a station override and reprices that station's tank."""
+    fuel = normalize_fuel(fuel_type)
+    PriceOverride.objects.update_or_create(station_id=station_id, fuel_type=fuel, defaults={'price_per_liter': price})
+    return Inventory.objects.filter(station_id=station_id, fuel_type__iexact=fuel).update(unit_price=price)
+
+
+def sync_global_inventory(fuel_type, price):
+    """Reprices, in one UPDATE, the tanks of every station with no override for the fuel."""
+    fuel = normalize_fuel(fuel_type)
+    overridden = PriceOverride.objects.filter(fuel_type=fuel)
+    return (
+        Inventory.objects.filter(fuel_type__iexact=fuel)
+        .exclude(station_id__in=overridden.filter(station__isnull=False).values('station_id'))
+        .exclude(station_id__in=Station.objects.filter(company_id__in=overridden.filter(company__isnull=False).values('company_id')).values('pk'))
+        .update(unit_price=price)
+    )
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Lower, TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, Transaction
+
+
+# DAILY SALES ROLLUP
+
+def day_bounds(first_day, last_day=None):
+    """Returns the aware (start, end) datetimes covering first_day..last_day.
+
+    The range is half-open, so it can be used as
+    ``transaction_time__gte=start, transaction_time__lt=end`` (index friendly,
+    unlike ``transaction_time__date``).
+    """
+    last_day = last_day or first_day
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def rollup_key(sale):
+    """Rollup key (station_id, date, fuel_type, payment_method) of a Transaction."""
+    sale_time = sale.transaction_time or timezone.now()
+    return (
+        sale.station_id_id,
+        timezone.localdate(sale_time),
+        (sale.fuel_type or '').lower(),
+        sale.payment_method,
+    )
+
+
+def apply_sales(sales, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) Transactions from the rollup table.
+
+    Sales are grouped by rollup key first, so a batch touches each rollup
+    row once no matter how many transactions it contains.
+    """
+    deltas = defaultdict(lambda: [0.0, Decimal('0'), 0])
+    for sale in sales:
+        delta = deltas[rollup_key(sale)]
+        delta[0] += sign * float(sale.quantity or 0)
+        delta[1] += sign * Decimal(sale.total_price or 0)
+        delta[2] += sign
+
+    for key, (litres, revenue, count) in deltas.items():
+        _apply_delta(key, litres, revenue, count)
+
+
+def _apply_delta(key, litres, revenue, count):
+    station_id, date, fuel_type, payment_method = key
+    lookup = dict(station_id=station_id, date=date, fuel_type=fuel_type, payment_method=payment_method)
+
+    with transaction.atomic():
+        updated = DailySalesRollup.objects.filter(**lookup).update(
+            litres=F('litres') + litres,
+            revenue=F('revenue') + revenue,
+            count=F('count') + count,
+        )
+        if updated:
+            return
+        try:
+            # Savepoint: another writer may create the same row concurrently
+            with transaction.atomic():
+                DailySalesRollup.objects.create(litres=litres, revenue=revenue, count=count, **lookup)
+        except IntegrityError:
+            DailySalesRollup.objects.filter(**lookup).update(
+                litres=F('litres') + litres,
+                revenue=F('revenue') + revenue,
+                count=F('count') + count,
+            )
+
+
+@transaction.atomic
+def rebuild(first_day, last_day=None):
+    """Recomputes the rollup rows for first_day..last_day from Transaction.
+
+    Returns the number of rollup rows written.
+    """
+    last_day = last_day or first_day
+    start, end = day_bounds(first_day, last_day)
+
+    DailySalesRollup.objects.filter(date__gte=first_day, date__lte=last_day).delete()
+
+    rows = (
+        Transaction.objects.filter(transaction_time__gte=start, transaction_time__lt=end)
+        .values('station_id', 'payment_method', day=TruncDate('transaction_time'), fuel=Lower('fuel_type'))
+        .annotate(litres=Sum('quantity'), revenue=Sum('total_price'), count=Count('pk'))
+        .order_by()
+    )
+    rollups = [
+        DailySalesRollup(
+            station_id=row['station_id'],
+            date=row['day'],
+            fuel_type=row['fuel'],
+            payment_method=row['payment_method'],
+            litres=row['litres'] or 0,
+            revenue=row['revenue'] or 0,
+            count=row['count'],
+        )
+        for row in rows
+    ]
+    DailySalesRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def _for_stations(queryset, stations):
+    """``stations`` is a QuerySet or iterable of IDs; None means all stations."""
+    if stations is None:
+        return queryset
+    return queryset.filter(station__in=stations)
+
+
+def totals_by_fuel(stations, first_day, last_day=None):
+    """
+    Returns {fuel_type: {'litres', 'revenue', 'count'}} for the given stations
+    and days, read from the rollup table in one grouped query.
+    """
+    last_day = last_day or first_day
+    rows = (
+        _for_stations(DailySalesRollup.objects.filter(date__gte=first_day, date__lte=last_day), stations)
+        .values('fuel_type')
+        .annotate(litres=Sum('litres'), revenue=Sum('revenue'), count=Sum('count'))
+        .order_by()
+    )
+    return {row['fuel_type']: row for row in rows}
+
+
+def transaction_count(stations):
+    """All-time number of transactions for the given stations."""
+    return _for_stations(DailySalesRollup.objects.all(), stations).aggregate(total=Sum('count'))['total'] or 0
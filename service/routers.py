@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# READ-REPLICA ROUTING
+
+PRIMARY_PIN_SECONDS = 5  # how long a client reads from the primary after it wrote; covers replica lag
+PRIMARY_PIN_COOKIE = 'read_primary'
+
+# Invalidation counters must be read where they are bumped
+PRIMARY_ONLY_MODELS = {'cacheversion'}
+
+_reporting = ContextVar('reporting_reads', default=False)
+_pinned = ContextVar('primary_pinned', default=False)
+_request = ContextVar('routing_request', default=None)
+
+
+class RequestRouting:
+    """Per-request routing state, set up by ReadYourWritesMiddleware."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned  # the client wrote within PRIMARY_PIN_SECONDS
+        self.wrote = False
+
+
+@contextmanager
+def request_routing(state):
+    token = _request.set(state)
+    try:
+        yield state
+    finally:
+        _request.reset(token)
+
+
+def _primary_pinned():
+    state = _request.get()
+    return _pinned.get() or (state is not None and (state.pinned or state.wrote))
+
+
+def reporting_alias():
+    """The REPORTING_DATABASE alias, or the primary when it is not configured."""
+    alias = getattr(settings, 'REPORTING_DATABASE', DEFAULT_DB_ALIAS)
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def reporting_db():
+    """
+    Alias reporting reads should use right now: the replica, unless this
+    request/client just wrote or a transaction is open on the primary (its
+    uncommitted writes are only visible there).
+    """
+    if _primary_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return reporting_alias()
+
+
+@contextmanager
+def reporting_reads():
+    """Reads of service models inside the block go to the reporting database."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def reporting_view(view):
+    """Runs a function view (sync or async), template rendering included, under reporting_reads()."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with reporting_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reporting_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReportingReadsMixin:
+    """
+    Class-based view counterpart of reporting_view. The TemplateResponse is
+    rendered inside the block, since its querysets are only evaluated then.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with reporting_reads():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        return response
+
+
+@contextmanager
+def pin_primary(pinned=True):
+    """All reads inside the block use the primary (read-your-writes)."""
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _replica_readable(model):
+    return model._meta.app_label == 'service' and model._meta.model_name not in PRIMARY_ONLY_MODELS
+
+
+class ReportingRouter:
+    """
+    Sends reads of service models to REPORTING_DATABASE inside
+    reporting_reads(); every other read and all writes use the primary.
+
+    A write pins the rest of the request to the primary, and
+    ReadYourWritesMiddleware keeps the client there for PRIMARY_PIN_SECONDS,
+    so a sale is listed on the next page even if the replica lags.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _reporting.get() or not _replica_readable(model):
+            return None
+        return reporting_db()
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        # Only writes the replica could lag on pin: a session saved on every
+        # request (sessions are never read from the replica) must not
+        if state is not None and _replica_readable(model):
+            state.wrote = True
+        # Also for instances that were read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same rows
+        aliases = {DEFAULT_DB_ALIAS, reporting_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# TRANSACTION SEARCH
+
+# Trigram search cannot match terms shorter than one trigram
+MIN_INDEXED_TERM = 3
+
+
+FTS_TABLE = 'service_transaction_search'
+
+# (alias, database name) -> whether FTS_TABLE exists there; looked up once per process
+_fts_tables = {}
+
+
+def fts_available(conn=connection):
+    """
+    True when the FTS5 trigram table exists. It needs SQLite 3.34+ when
+    migration 0008 ran: a database migrated under an older SQLite has no
+    table even after SQLite is upgraded, so the table itself is checked.
+    """
+    if conn.vendor != 'sqlite' or conn.Database.sqlite_version_info < (3, 34, 0):
+        return False
+    key = (conn.alias, str(conn.settings_dict['NAME']))
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in conn.introspection.table_names()
+    return _fts_tables[key]
+
+
+def normalize_term(term):
+    """Plates are indexed upper-cased without spaces ('rab 123 a' -> 'RAB123A')."""
+    return ''.join(term.split()).upper()
+
+
+def fts_matches(term):
+    """Subquery of transaction IDs whose plate, fuel type or payment method contain ``term``."""
+    phrase = '"%s"' % term.replace('"', '""')
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (phrase,),
+    )
+
+
+def search_transactions(queryset, query):
+    """
+    Filters a Transaction queryset by the list page's free-text search.
+
+    Numeric queries are exact transaction ID lookups (plus plate matches once
+    long enough). Other queries are prefix/substring matches on car plate,
+    fuel type and payment method served by the FTS5 trigram index on SQLite,
+    or by a pg_trgm index on ``UPPER(car_plate)`` on PostgreSQL.
+    """
+    term = normalize_term(query)
+    if not term:
+        return queryset
+
+    # isdigit() alone accepts Unicode digits ('²') that int() rejects
+    numeric = term.isascii() and term.isdigit()
+    condition = Q(transaction_id=int(term)) if numeric else Q(pk__in=[])
+
+    if fts_available() and len(term) >= MIN_INDEXED_TERM:
+        condition |= Q(pk__in=fts_matches(term))
+    elif not numeric or len(term) >= MIN_INDEXED_TERM:
+        condition |= (
+            Q(car_plate__icontains=query.strip()) |
+            Q(fuel_type__icontains=term) |
+            Q(payment_method__icontains=term)
+        )
+
+    return queryset.filter(condition)
@@ -0,0 +1,84 @@
+"""
+Session engine: cached reads with write-through to the database.
+
+Set SESSION_ENGINE = 'service.sessions' (the default, see settings). A
+request reads its session from the cache and only falls back to the
+session table on a miss; saves write the table and the cache. Expired
+sessions are deleted in small batches, a few at a time as new sessions are
+created, instead of one full-table sweep.
+"""
+
+import random
+
+from asgiref.sync import sync_to_async
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+
+SESSION_CACHE_TIMEOUT = 300  # seconds; bounds staleness (e.g. after a logout elsewhere) for caches not shared between processes
+
+SESSION_PRUNE_BATCH = 500  # expired sessions deleted per statement
+SESSION_PRUNE_EVERY = 100  # on average one new session in this many prunes one batch
+
+
+class BoundedCache:
+    """Cache proxy that caps every timeout at ``timeout`` seconds."""
+
+    def __init__(self, cache, timeout):
+        self._cache = cache
+        self.timeout = timeout
+
+    def _cap(self, timeout):
+        return self.timeout if timeout is None else min(timeout, self.timeout)
+
+    def set(self, key, value, timeout=None):
+        return self._cache.set(key, value, self._cap(timeout))
+
+    async def aset(self, key, value, timeout=None):
+        return await self._cache.aset(key, value, self._cap(timeout))
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+
+class SessionStore(CachedDBStore):
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = BoundedCache(self._cache, SESSION_CACHE_TIMEOUT)
+
+    def create(self):
+        super().create()
+        if random.randrange(SESSION_PRUNE_EVERY) == 0:
+            self.clear_expired(max_batches=1)
+
+    @classmethod
+    def clear_expired(cls, batch_size=SESSION_PRUNE_BATCH, max_batches=None):
+        """
+        Deletes expired sessions ``batch_size`` at a time, oldest first, and
+        returns how many were deleted. ``clearsessions`` runs every batch;
+        each one is its own short statement, so sales are never blocked
+        behind a long delete.
+        """
+        model = cls.get_model_class()
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            now = timezone.now()
+            keys = list(
+                model.objects.filter(expire_date__lt=now).order_by('expire_date').values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            # Re-checked: a session may have been renewed since it was selected
+            deleted += model.objects.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+            batches += 1
+            if len(keys) < batch_size:
+                break
+        return deleted
+
+    @classmethod
+    async def aclear_expired(cls, batch_size=SESSION_PRUNE_BATCH, max_batches=None):
+        return await sync_to_async(cls.clear_expired)(batch_size, max_batches)
@@ -0,0 +1,158 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Transaction, Station, Company, Inventory, Pump, SystemSetting, PriceOverride, Alert
+from .access import invalidate_station_access
+from .fragments import invalidate_fragments
+from . import events, inventory, pricing, rollups
+
+
+# DAILY SALES ROLLUP AND TANK LEVELS
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_sale(sender, instance, **kwargs):
+    """Keeps the stored row of an edited Transaction so its old totals can be reversed."""
+    instance._previous_sale = None
+    if instance.pk:
+        instance._previous_sale = Transaction.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Transaction)
+def apply_sale(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_sale', None)
+    if previous is not None:
+        rollups.apply_sales([previous], sign=-1)
+        inventory.consume_fuel([previous], sign=-1)
+    rollups.apply_sales([instance])
+    inventory.consume_fuel([instance])
+
+
+@receiver(post_delete, sender=Transaction)
+def reverse_sale(sender, instance, **kwargs):
+    rollups.apply_sales([instance], sign=-1)
+    inventory.consume_fuel([instance], sign=-1)
+
+
+# STATION ACCESS CACHE
+
+@receiver(pre_save, sender=Station)
+def remember_station_access(sender, instance, **kwargs):
+    instance._previous_access = None
+    if instance.pk:
+        instance._previous_access = Station.objects.filter(pk=instance.pk).values('manager_id', 'company_id').first()
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_station_access_for_station(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_access', None) or {}
+    manager_ids = {instance.manager_id_id, previous.get('manager_id')}
+    company_ids = {instance.company_id_id, previous.get('company_id')} - {None}
+    owner_ids = set(Company.objects.filter(pk__in=company_ids).values_list('owner_id', flat=True))
+    invalidate_station_access(manager_ids | owner_ids, admin=True)
+
+
+@receiver(pre_save, sender=Company)
+def remember_company_owner(sender, instance, **kwargs):
+    instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_owner_id = Company.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_station_access_for_company(sender, instance, **kwargs):
+    invalidate_station_access({instance.owner_id, getattr(instance, '_previous_owner_id', None)})
+
+
+# LOW INVENTORY ALERTS
+
+@receiver(post_save, sender=Inventory)
+def evaluate_tank_threshold(sender, instance, raw=False, **kwargs):
+    """Manual level or threshold edits (e.g. InventoryUpdateView) can cross the threshold either way."""
+    if raw:
+        return
+    inventory.evaluate_thresholds(Inventory.objects.filter(pk=instance.pk))
+
+
+# PUMP STATUS EVENTS
+
+@receiver(pre_save, sender=Pump)
+def remember_pump_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = Pump.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Pump)
+def record_pump_status(sender, instance, raw=False, **kwargs):
+    """Every status change (pump_status_update, PumpUpdateView, admin, feeds) lands in the event log."""
+    if raw:
+        return
+    events.record_status_change(instance, getattr(instance, '_previous_status', None))
+
+
+# FUEL PRICE CACHE
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def invalidate_price_cache(sender, raw=False, **kwargs):
+    """Covers the settings CRUD views, SettingsView (update_prices) and the admin."""
+    if raw:
+        return
+    pricing.invalidate_prices()
+
+
+@receiver(post_save, sender=PriceOverride)
+@receiver(post_delete, sender=PriceOverride)
+def invalidate_company_prices(sender, instance, raw=False, **kwargs):
+    """An override only invalidates the prices of its own company."""
+    if raw:
+        return
+    company_id = instance.company_id
+    if company_id is None:
+        company_id = Station.objects.filter(pk=instance.station_id).values_list('company_id', flat=True).first()
+    if company_id is not None:
+        pricing.invalidate_prices(company_id)
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_station_prices(sender, instance, created=False, **kwargs):
+    """New, deleted or moved stations change their company's lookup table."""
+    previous = getattr(instance, '_previous_access', None) or {}
+    company_ids = {instance.company_id_id, previous.get('company_id')}
+    if not created and kwargs.get('signal') is post_save and previous.get('company_id') == instance.company_id_id:
+        return
+    for company_id in company_ids - {None}:
+        pricing.invalidate_prices(company_id)
+
+
+# TEMPLATE FRAGMENT CACHE
+
+@receiver(post_save, sender=Pump)
+@receiver(post_delete, sender=Pump)
+def invalidate_pump_fragments(sender, instance, **kwargs):
+    invalidate_fragments('pumps', [instance.station_id])
+
+
+@receiver(post_save, sender=Station)
+def invalidate_station_fragments(sender, instance, created=False, **kwargs):
+    """Monitoring cards show the station name."""
+    if not created:
+        invalidate_fragments('pumps', [instance.pk])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_transaction_fragments(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_sale', None)
+    invalidate_fragments('transactions', [instance.station_id_id, previous.station_id_id if previous else None])
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_alert_fragments(sender, instance, **kwargs):
+    invalidate_fragments('alerts', [instance.station_id])
@@ -0,0 +1,41 @@
+from datetime import date
+
+from . import inventory, pricing, rollups, telemetry, uptime
+from .jobs import task
+from .models import SystemSetting
+
+
+# BACKGROUND TASKS (run by manage.py run_workers, see service/jobs.py)
+
+@task()
+def sync_global_inventory(fuel_type):
+    """Reprices the tanks that follow the global price of ``fuel_type`` (its price at run time)."""
+    setting = SystemSetting.objects.filter(fuel_type__iexact=fuel_type).first()
+    if setting is None:
+        return {'tanks': 0}
+    return {'tanks': pricing.sync_global_inventory(setting.fuel_type, setting.price_per_liter)}
+
+
+@task()
+def evaluate_thresholds():
+    alerted, cleared = inventory.evaluate_thresholds()
+    return {'alerted': alerted, 'cleared': cleared}
+
+
+@task()
+def rebuild_sales_rollup(start, end=None):
+    """Month-end totals: rebuilds the daily rollup for start..end (ISO dates)."""
+    first_day = date.fromisoformat(start)
+    last_day = date.fromisoformat(end) if end else first_day
+    return {'rows': rollups.rebuild(first_day, last_day)}
+
+
+@task()
+def summarize_uptime(month):
+    """Stores per-pump uptime for ``month`` (YYYY-MM)."""
+    return {'pumps': uptime.summarize_month(date.fromisoformat(month + '-01'))}
+
+
+@task()
+def prune_telemetry():
+    return telemetry.prune()
@@ -0,0 +1,213 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .forms import PumpSampleRowForm
+from .models import Pump, PumpSample, PumpTelemetryBucket
+
+
+# PUMP TELEMETRY
+
+MAX_SAMPLE_BATCH = 5000
+
+# Bucket sizes in seconds; buckets are aligned to UTC
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# How long raw samples and each bucket size are kept (None: forever)
+RETENTION = {
+    'raw': timedelta(days=2),
+    'minute': timedelta(days=7),
+    'hour': timedelta(days=180),
+    'day': None,
+}
+
+# History ranges offered to the monitoring page and the resolution each one reads
+HISTORY_RANGES = {
+    '1h': (timedelta(hours=1), 'minute'),
+    '6h': (timedelta(hours=6), 'minute'),
+    '24h': (timedelta(hours=24), 'hour'),
+    '7d': (timedelta(days=7), 'hour'),
+    '30d': (timedelta(days=30), 'day'),
+}
+
+PRUNE_BATCH = 5000
+
+
+def _form_errors(form):
+    return {field: [str(error) for error in errors] for field, errors in form.errors.items()}
+
+
+def bucket_start(when, resolution):
+    """Start of the ``resolution`` bucket containing ``when`` (aware, UTC)."""
+    seconds = RESOLUTIONS[resolution]
+    return datetime.fromtimestamp(int(when.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def ingest_samples(rows, access):
+    """
+    Validates and stores a batch of pump samples uploaded by a controller.
+
+    Pumps come from one query for the whole batch; valid samples are written
+    with one bulk_create and folded into the minute, hour and day buckets in
+    the same transaction. Invalid rows are reported individually and never
+    abort the rest of the batch.
+
+    Returns one result dict per input row, in order.
+    """
+    results = [None] * len(rows)
+    candidates = []  # (index, cleaned_data)
+
+    # 1. Field validation (no queries)
+    for index, row in enumerate(rows):
+        form = PumpSampleRowForm(row if isinstance(row, dict) else {})
+        if form.is_valid():
+            candidates.append((index, form.cleaned_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': _form_errors(form)}
+
+    # 2. Pumps and access (one query)
+    pumps = Pump.objects.in_bulk({data['pump_id'] for _, data in candidates})
+    now = timezone.now()
+    pending = []
+    for index, data in candidates:
+        pump = pumps.get(data['pump_id'])
+        if pump is None or not access.can_access_station(pump.station_id):
+            results[index] = {'index': index, 'status': 'error', 'errors': {'pump_id': ['Unknown pump or no access.']}}
+            continue
+        sample = PumpSample(
+            pump_id=pump.pk,
+            station_id=pump.station_id,
+            recorded_at=data['recorded_at'] or now,
+            status=data['status'] or pump.status,
+            flow_rate=data['flow_rate'],
+            dispensed=data['dispensed'] or 0,
+        )
+        pending.append((index, sample))
+
+    # 3. Append and downsample
+    with transaction.atomic():
+        PumpSample.objects.bulk_create([sample for _, sample in pending])
+        apply_samples([sample for _, sample in pending])
+
+    for index, sample in pending:
+        results[index] = {'index': index, 'status': 'created'}
+    return results
+
+
+def apply_samples(samples):
+    """
+    Adds samples to their minute, hour and day buckets.
+
+    Samples are grouped by bucket first, so a batch touches each bucket row
+    once no matter how many samples it contains.
+    """
+    deltas = defaultdict(lambda: {'samples': 0, 'active': 0, 'flow_total': 0.0, 'flow_samples': 0, 'flow_max': 0.0, 'dispensed': 0.0})
+    for sample in samples:
+        for resolution in RESOLUTIONS:
+            delta = deltas[(sample.pump_id, sample.station_id, resolution, bucket_start(sample.recorded_at, resolution))]
+            delta['samples'] += 1
+            delta['active'] += sample.status == 'active'
+            delta['dispensed'] += sample.dispensed or 0
+            if sample.flow_rate is not None:
+                delta['flow_total'] += sample.flow_rate
+                delta['flow_samples'] += 1
+                delta['flow_max'] = max(delta['flow_max'], sample.flow_rate)
+
+    for key, delta in deltas.items():
+        _apply_delta(key, delta)
+
+
+def _apply_delta(key, delta):
+    pump_id, station_id, resolution, start = key
+    lookup = dict(pump_id=pump_id, resolution=resolution, bucket_start=start)
+    changes = dict(
+        samples=F('samples') + delta['samples'],
+        active_samples=F('active_samples') + delta['active'],
+        flow_total=F('flow_total') + delta['flow_total'],
+        flow_samples=F('flow_samples') + delta['flow_samples'],
+        flow_max=Greatest(F('flow_max'), delta['flow_max']),
+        dispensed=F('dispensed') + delta['dispensed'],
+    )
+
+    with transaction.atomic():
+        if PumpTelemetryBucket.objects.filter(**lookup).update(**changes):
+            return
+        try:
+            # Savepoint: another writer may create the same bucket concurrently
+            with transaction.atomic():
+                PumpTelemetryBucket.objects.create(
+                    station_id=station_id,
+                    samples=delta['samples'],
+                    active_samples=delta['active'],
+                    flow_total=delta['flow_total'],
+                    flow_samples=delta['flow_samples'],
+                    flow_max=delta['flow_max'],
+                    dispensed=delta['dispensed'],
+                    **lookup,
+                )
+        except IntegrityError:
+            PumpTelemetryBucket.objects.filter(**lookup).update(**changes)
+
+
+def history(access, range_name, pump_id=None, now=None):
+    """
+    Per-pump history points over ``range_name`` (a HISTORY_RANGES key), read
+    from the buckets of the matching resolution in one query; raw samples
+    are never scanned.
+
+    Returns {pump_id: [{'start', 'samples', 'flow_rate', 'flow_max', 'dispensed', 'uptime'}, ...]}.
+    """
+    span, resolution = HISTORY_RANGES[range_name]
+    since = bucket_start((now or timezone.now()) - span, resolution)
+    buckets = access.filter(PumpTelemetryBucket.objects.filter(resolution=resolution, bucket_start__gte=since))
+    if pump_id is not None:
+        buckets = buckets.filter(pump_id=pump_id)
+
+    points = defaultdict(list)
+    for row in buckets.order_by('pump_id', 'bucket_start').values(
+        'pump_id', 'bucket_start', 'samples', 'active_samples', 'flow_total', 'flow_samples', 'flow_max', 'dispensed',
+    ):
+        points[row['pump_id']].append({
+            'start': row['bucket_start'].isoformat(),
+            'samples': row['samples'],
+            'flow_rate': row['flow_total'] / row['flow_samples'] if row['flow_samples'] else None,
+            'flow_max': row['flow_max'],
+            'dispensed': row['dispensed'],
+            'uptime': row['active_samples'] / row['samples'] if row['samples'] else None,
+        })
+    return dict(points)
+
+
+def _delete_before(queryset, field, cutoff, batch_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.filter(**{f'{field}__lt': cutoff}).order_by(field).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.filter(pk__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return deleted
+
+
+def prune(now=None, batch_size=PRUNE_BATCH):
+    """
+    Applies RETENTION: deletes raw samples and buckets past their age in
+    batches of ``batch_size``. Returns {'raw': n, 'minute': n, ...}.
+    """
+    now = now or timezone.now()
+    deleted = {}
+    if RETENTION['raw'] is not None:
+        deleted['raw'] = _delete_before(PumpSample.objects.all(), 'recorded_at', now - RETENTION['raw'], batch_size)
+    for resolution in RESOLUTIONS:
+        if RETENTION[resolution] is not None:
+            buckets = PumpTelemetryBucket.objects.filter(resolution=resolution)
+            deleted[resolution] = _delete_before(buckets, 'bucket_start', now - RETENTION[resolution], batch_size)
+    return deleted
@@ -0,0 +1,45 @@
+from django import template
+from django.core.cache import cache
+
+from ..fragments import FRAGMENT_CACHE_TIMEOUT, FRAGMENT_SOURCES, fragment_stats
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        keys = context.get('fragment_keys')
+        if keys is None:
+            return self.nodelist.render(context)
+
+        key = keys.key(self.name)
+        content = cache.get(key)
+        fragment_stats.record(self.name, content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, FRAGMENT_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """
+    {% cachedfragment 'dashboard_pumps' %} ... {% endcachedfragment %}
+
+    Caches the enclosed markup under ``fragment_keys.key(name)`` (see
+    service.fragments). Without ``fragment_keys`` in the context it just renders.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument: the fragment name")
+    name = bits[1].strip('\'"')
+    if name not in FRAGMENT_SOURCES:
+        raise template.TemplateSyntaxError(f"Unknown fragment {name!r}; declare it in FRAGMENT_SOURCES")
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(name, nodelist)
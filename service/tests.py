@@ -1,3 +1,1335 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.http import QueryDict
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import *
+from .access import ACCESS_VERSION, StationAccess, access_version
+from .inventory import consume_fuel
+from .pagination import CursorPaginator, InvalidCursor
+from .search import search_transactions
+from . import aio, events, exports, ingest, inventory, jobs, pricing, rollups, routers, search, sessions, telemetry, uptime, versions
+from station.database import database_config, replica_config
+
+from .metrics import view_metrics
+from .fragments import fragment_stats, source_version_key
+
+
+class StationFixtureMixin:
+    """Creates one company with two stations, pumps, inventory, sales and alerts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', full_name='Admin', password='pw', email='admin@example.com', role='admin')
+        cls.owner = User.objects.create(username='owner', full_name='Owner', password='pw', email='owner@example.com', role='owner')
+        cls.manager = User.objects.create(username='manager', full_name='Manager', password='pw', email='manager@example.com', role='manager')
+        cls.company = Company.objects.create(name='Company', owner=cls.owner)
+        cls.stations = [
+            Station.objects.create(company_id=cls.company, manager_id=cls.manager, name=f'Station {i}', location='Kigali')
+            for i in range(2)
+        ]
+        for station in cls.stations:
+            pump = Pump.objects.create(station=station, pump_number=1, fuel_type='petrol')
+            inventory = Inventory.objects.create(station=station, fuel_type='petrol', quantity=500, capacity=1000, min_threshold=100, unit_price=1500)
+            for method in ('cash', 'momo'):
+                Transaction.objects.create(station_id=station, user_id=cls.manager, pump_id=pump, fuel_type='petrol', quantity=10, total_price=15000, payment_method=method, car_plate='RAB123A')
+            Alert.objects.create(station=station, type='inventory', description='Low', inventory_id=inventory)
+
+    def setUp(self):
+        cache.clear()
+        pricing.price_cache.invalidate()
+        access_version.reset()
+
+    def login(self, user):
+        self.client.post('/', {'email': user.email, 'password': user.password})
+
+
+class QueryBudgetMixin:
+    """
+    assertQueryBudget(url, budget) fails when a view runs more than ``budget`` queries.
+
+    The view is requested once to warm the per-process caches (station access,
+    prices), then measured; the failure message lists every query run.
+    """
+
+    def assertQueryBudget(self, url, budget):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        count = len(queries.captured_queries)
+        if count > budget:
+            listing = '\n'.join(f'  {query["sql"]}' for query in queries.captured_queries)
+            self.fail(f'{url} ran {count} queries, budget is {budget}:\n{listing}')
+        return response
+
+
+class StationAccessTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_owner = User.objects.create(username='other', full_name='Other', password='pw', email='other@example.com', role='owner')
+        self.other = Station.objects.create(company_id=Company.objects.create(name='Other', owner=self.other_owner), name='Elsewhere', location='Huye')
+
+    def test_roles_see_their_stations(self):
+        ours = {station.pk for station in self.stations}
+        self.assertEqual(StationAccess(self.admin.pk, 'Admin').station_ids, ours | {self.other.pk})
+        self.assertEqual(StationAccess(self.owner.pk, 'owner').station_ids, ours)
+        self.assertEqual(StationAccess(self.manager.pk, 'manager').station_ids, ours)
+        self.assertEqual(StationAccess(self.other_owner.pk, 'owner').station_ids, {self.other.pk})
+        self.assertEqual(StationAccess(self.manager.pk, 'attendant').station_ids, frozenset())
+        self.assertEqual(StationAccess(None, None).station_ids, frozenset())
+
+        access = StationAccess(self.manager.pk, 'manager')
+        self.assertTrue(access.can_access_station(str(self.stations[0].pk)))
+        self.assertFalse(access.can_access_station(self.other.pk))
+        self.assertFalse(access.can_access_station('x'))
+        self.assertEqual(access.filter(Transaction.objects.all(), 'station_id').count(), 4)
+        self.assertIsNone(StationAccess(self.admin.pk, 'admin').station_scope)
+
+    def test_station_changes_invalidate_the_cache(self):
+        self.assertEqual(StationAccess(self.other_owner.pk, 'owner').station_ids, {self.other.pk})
+        with self.assertNumQueries(0):
+            StationAccess(self.other_owner.pk, 'owner').station_ids
+
+        self.other.manager_id = self.manager
+        self.other.company_id = self.company
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.save()
+        self.assertEqual(StationAccess(self.other_owner.pk, 'owner').station_ids, frozenset())
+        self.assertIn(self.other.pk, StationAccess(self.owner.pk, 'owner').station_ids)
+        self.assertIn(self.other.pk, StationAccess(self.manager.pk, 'manager').station_ids)
+
+    def test_changes_made_by_another_process_show_up_after_the_check_interval(self):
+        self.assertEqual(StationAccess(self.manager.pk, 'manager').station_ids, {station.pk for station in self.stations})
+        # Another process moves a station away and bumps the shared version; this process's cache keeps the old IDs
+        Station.objects.filter(pk=self.stations[0].pk).update(manager_id=None)
+        versions.bump_version(ACCESS_VERSION)
+        self.assertIn(self.stations[0].pk, StationAccess(self.manager.pk, 'manager').station_ids)
+
+        with mock.patch('service.access.ACCESS_CACHE_CHECK_INTERVAL', 0):
+            self.assertEqual(StationAccess(self.manager.pk, 'manager').station_ids, {self.stations[1].pk})
+
+
+class QueryPlanTests(StationFixtureMixin, TestCase):
+    """EXPLAIN QUERY PLAN every hot-table query the main views run."""
+
+    HOT_TABLES = ('service_transaction', 'service_alert', 'service_pump', 'service_inventory')
+    VIEWS = [
+        '/dashboard/',
+        '/transactions/',
+        '/transactions/?duration=week&payment_method=cash',
+        '/transactions/?search=rab12',
+        '/alerts/',
+        '/alerts/?status=all',
+        '/pumps/dashboard/',
+        '/inventory/',
+    ]
+
+    def full_table_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        pattern = re.compile(r'^SCAN (%s)$' % '|'.join(self.HOT_TABLES))
+        return [detail for detail in details if pattern.match(detail.strip())]
+
+    def assert_views_use_indexes(self, user):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific')
+        self.login(user)
+        for url in self.VIEWS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(table in sql for table in self.HOT_TABLES):
+                    continue
+                self.assertEqual(self.full_table_scans(sql), [], f'{url}: {sql}')
+
+    def test_manager_views_use_indexes(self):
+        self.assert_views_use_indexes(self.manager)
+
+    def test_admin_views_use_indexes(self):
+        self.assert_views_use_indexes(self.admin)
+
+
+class SalesRollupTests(StationFixtureMixin, TestCase):
+
+    def totals(self, stations=None):
+        return {fuel: (row['litres'], row['revenue'], row['count']) for fuel, row in rollups.totals_by_fuel(stations, timezone.localdate()).items()}
+
+    def test_sales_are_applied_by_the_signals(self):
+        self.assertEqual(self.totals(), {'petrol': (40, Decimal('60000'), 4)})
+        self.assertEqual(self.totals([self.stations[0].pk]), {'petrol': (20, Decimal('30000'), 2)})
+        self.assertEqual(rollups.transaction_count(None), 4)
+
+        # An edit moves the sale from its old key to the new one
+        sale = Transaction.objects.filter(station_id=self.stations[0]).first()
+        sale.fuel_type = 'Diesel'
+        sale.quantity = 4
+        sale.total_price = 5600
+        sale.save()
+        self.assertEqual(self.totals(), {'petrol': (30, Decimal('45000'), 3), 'diesel': (4, Decimal('5600'), 1)})
+
+        sale.delete()
+        self.assertEqual(self.totals(), {'petrol': (30, Decimal('45000'), 3), 'diesel': (0, Decimal('0'), 0)})
+        self.assertEqual(rollups.transaction_count(None), 3)
+
+    def test_apply_sales_groups_by_key(self):
+        station = self.stations[0]
+        sales = [
+            Transaction(station_id=station, fuel_type='PETROL', quantity=2, total_price=3000, payment_method='cash', transaction_time=timezone.now())
+            for _ in range(3)
+        ]
+        with self.assertNumQueries(3):  # one UPDATE for the three sales, in a savepoint
+            rollups.apply_sales(sales)
+        self.assertEqual(self.totals([station.pk]), {'petrol': (26, Decimal('39000'), 5)})
+
+        # A key without a row yet is created
+        sales[0].payment_method = 'card'
+        rollups.apply_sales(sales[:1])
+        self.assertEqual(DailySalesRollup.objects.get(station=station, payment_method='card').count, 1)
+
+    def test_rebuild_matches_the_transactions(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        sale = Transaction.objects.first()
+        Transaction.objects.filter(pk=sale.pk).update(transaction_time=yesterday)  # no signal
+        DailySalesRollup.objects.update(count=99)
+
+        self.assertEqual(rollups.rebuild(timezone.localdate(yesterday), timezone.localdate()), 4)
+        self.assertEqual(self.totals(), {'petrol': (30, Decimal('45000'), 3)})
+        self.assertEqual(rollups.totals_by_fuel(None, timezone.localdate(yesterday))['petrol']['count'], 1)
+        self.assertEqual(rollups.transaction_count(None), 4)
+
+    def test_migration_backfills_from_the_historical_models(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        Transaction.objects.filter(pk=Transaction.objects.first().pk).update(transaction_time=yesterday)
+        DailySalesRollup.objects.all().delete()
+
+        migration = import_module('service.migrations.0017_backfill_sales_rollup')
+        state = MigrationLoader(connection).project_state(('service', '0017_backfill_sales_rollup'))
+        # The function only reads schema_editor.connection (SQLite cannot open a schema editor inside the test transaction)
+        migration.backfill_sales_rollup(state.apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.totals(), {'petrol': (30, Decimal('45000'), 3)})
+        self.assertEqual(rollups.transaction_count(None), 4)
+
+
+class TransactionSearchTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        station = self.stations[0]
+        pump = station.pumps.get()
+        self.sales = {
+            plate: Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=pump, fuel_type='diesel', quantity=5, total_price=7000, payment_method='card', car_plate=plate)
+            for plate in ('RAC456B', 'RAD789C')
+        }
+
+    def search(self, query):
+        return set(search_transactions(Transaction.objects.all(), query).values_list('car_plate', flat=True))
+
+    def assert_searches(self):
+        # Numeric queries match the transaction ID exactly
+        sale = self.sales['RAD789C']
+        self.assertEqual(set(search_transactions(Transaction.objects.all(), str(sale.pk))), {sale})
+        # Plates match on any substring, ignoring case
+        self.assertEqual(self.search('rac4'), {'RAC456B'})
+        self.assertEqual(self.search('456b'), {'RAC456B'})
+        self.assertEqual(self.search('RA'), {'RAB123A', 'RAC456B', 'RAD789C'})
+        self.assertEqual(self.search('card'), {'RAC456B', 'RAD789C'})
+        self.assertEqual(self.search('zzz'), set())
+        # Unicode digits are not transaction IDs
+        self.assertEqual(self.search('²'), set())
+
+    def test_search(self):
+        self.assert_searches()
+        if search.fts_available():
+            # The index holds plates without spaces, so typed spaces do not matter
+            self.assertEqual(self.search('rac 45'), {'RAC456B'})
+
+    def test_search_without_the_fts_index(self):
+        with mock.patch('service.search.fts_available', return_value=False):
+            self.assert_searches()
+
+    def test_fts_needs_the_table_not_just_a_recent_sqlite(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The FTS index is SQLite only')
+        # A database migrated under SQLite < 3.34 has no search table, whatever SQLite runs now
+        with mock.patch.dict(search._fts_tables, clear=True), \
+                mock.patch.object(connection.introspection, 'table_names', return_value=['service_transaction']):
+            self.assertFalse(search.fts_available())
+            self.assert_searches()
+        with mock.patch.dict(search._fts_tables, clear=True):
+            self.assertEqual(search.fts_available(), connection.Database.sqlite_version_info >= (3, 34, 0))
+            with self.assertNumQueries(0):
+                search.fts_available()
+
+    def test_short_numeric_terms_only_match_ids(self):
+        sale = self.sales['RAC456B']
+        sale.car_plate = f'RAC{sale.pk}'
+        sale.save()
+        # Below MIN_INDEXED_TERM a number is an ID lookup, not a plate substring
+        self.assertLess(len(str(sale.pk)), search.MIN_INDEXED_TERM)
+        self.assertEqual(set(search_transactions(Transaction.objects.all(), str(sale.pk))), {sale})
+
+    def test_list_view_search(self):
+        self.login(self.admin)
+        response = self.client.get('/transactions/', {'search': '²'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/transactions/', {'search': 'rad'})
+        self.assertEqual([sale.car_plate for sale in response.context['transactions']], ['RAD789C'])
+
+
+class TransactionExportTests(StationFixtureMixin, TestCase):
+
+    def export(self, **params):
+        response = self.client.get('/transactions/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content)
+        return gzip.decompress(body) if params.get('gzip') else body
+
+    def test_csv_and_ndjson(self):
+        self.login(self.admin)
+        lines = self.export().decode().splitlines()
+        self.assertEqual(lines[0], ','.join(name for name, _ in exports.EXPORT_COLUMNS))
+        self.assertEqual(len(lines), 5)
+        self.assertIn(',Station 0,1,petrol,10.0,15000.00,cash,RAB123A', lines[1])
+
+        records = [json.loads(line) for line in self.export(format='ndjson').decode().splitlines()]
+        ids = [record['transaction_id'] for record in records]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual((records[0]['station'], records[0]['total_price']), ('Station 0', '15000.00'))
+        self.assertEqual(self.export(format='ndjson', gzip='1').decode().splitlines(), [json.dumps(record) for record in records])
+
+    def test_since_id_and_station_filter(self):
+        self.login(self.admin)
+        ids = list(Transaction.objects.order_by('transaction_id').values_list('transaction_id', flat=True))
+        records = [json.loads(line) for line in self.export(format='ndjson', since_id=ids[1]).decode().splitlines()]
+        self.assertEqual([record['transaction_id'] for record in records], ids[2:])
+
+        station = self.stations[1]
+        records = [json.loads(line) for line in self.export(format='ndjson', station_id=station.pk).decode().splitlines()]
+        self.assertEqual({record['station_id'] for record in records}, {station.pk})
+        self.assertEqual(len(self.export(format='ndjson', station_id='all').splitlines()), 4)
+
+        for params in ({'since_id': 'x'}, {'since_id': '²'}, {'station_id': 'x'}, {'format': 'xml'}):
+            self.assertEqual(self.client.get('/transactions/export/', params).status_code, 400, params)
+
+    def test_rows_are_scoped_to_the_user(self):
+        other_owner = User.objects.create(username='other', full_name='Other', password='pw', email='other@example.com', role='owner')
+        other = Station.objects.create(company_id=Company.objects.create(name='Other', owner=other_owner), name='Elsewhere', location='Huye')
+        pump = Pump.objects.create(station=other, pump_number=1, fuel_type='diesel')
+        Transaction.objects.create(station_id=other, user_id=other_owner, pump_id=pump, fuel_type='diesel', quantity=5, total_price=7000, payment_method='card')
+
+        for user, expected in ((self.admin, 5), (self.owner, 4), (self.manager, 4), (other_owner, 1)):
+            self.client.logout()
+            self.login(user)
+            self.assertEqual(len(self.export(format='ndjson').splitlines()), expected, user.role)
+        # Another company's station is not reachable through the filter either
+        self.login(self.owner)
+        self.assertEqual(self.export(format='ndjson', station_id=other.pk), b'')
+
+        self.client.logout()
+        self.assertRedirects(self.client.get('/transactions/export/'), '/', fetch_redirect_response=False)
+
+
+class TransactionBatchTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        SystemSetting.objects.create(fuel_type='Petrol', price_per_liter=1500)
+        self.login(self.manager)
+        self.pumps = [station.pumps.get() for station in self.stations]
+
+    def row(self, client_ref, station=0, **fields):
+        return {'client_ref': client_ref, 'station_id': self.stations[station].pk, 'pump_id': self.pumps[station].pk,
+                'fuel_type': 'petrol', 'quantity': 2, 'payment_method': 'cash', **fields}
+
+    def post(self, rows):
+        return self.client.post('/transactions/batch/', json.dumps({'transactions': rows}), content_type='application/json')
+
+    def test_rows_are_validated_one_by_one_and_deduplicated(self):
+        rows = [
+            self.row('a'),
+            self.row('b', quantity=0),
+            self.row('c', pump_id=self.pumps[1].pk),
+            self.row('a', station=1),
+            'not a row',
+            self.row('d', station=1),
+        ]
+        body = self.post(rows).json()
+        self.assertEqual((body['created'], body['duplicate'], body['error']), (2, 0, 4))
+        self.assertEqual([r['status'] for r in body['results']], ['created', 'error', 'error', 'error', 'error', 'created'])
+        self.assertIn('quantity', body['results'][1]['errors'])
+        self.assertIn('pump_id', body['results'][2]['errors'])
+        self.assertIn('client_ref', body['results'][3]['errors'])
+        sale = Transaction.objects.get(client_ref='a')
+        self.assertEqual((sale.total_price, sale.user_id_id), (Decimal('3000.00'), self.manager.pk))
+
+        # A resent batch stores nothing twice
+        body = self.post([self.row('a'), self.row('e')]).json()
+        self.assertEqual([r['status'] for r in body['results']], ['duplicate', 'created'])
+        self.assertEqual(body['results'][0]['transaction_id'], sale.pk)
+        self.assertEqual(Transaction.objects.filter(client_ref__isnull=False).count(), 3)
+
+    def test_a_row_the_database_rejects_does_not_fail_the_batch(self):
+        apply_sales = rollups.apply_sales
+
+        def reject_bad(sales):
+            if any(sale.client_ref == 'bad' for sale in sales):
+                raise IntegrityError('CHECK constraint failed')
+            return apply_sales(sales)
+
+        with mock.patch('service.rollups.apply_sales', side_effect=reject_bad):
+            body = self.post([self.row('good'), self.row('bad'), self.row('fine', station=1)]).json()
+        self.assertEqual([r['status'] for r in body['results']], ['created', 'error', 'created'])
+        self.assertIn('CHECK constraint failed', body['results'][1]['errors']['__all__'][0])
+        self.assertEqual(set(Transaction.objects.filter(client_ref__isnull=False).values_list('client_ref', flat=True)), {'good', 'fine'})
+
+    def test_batch_limits(self):
+        with mock.patch.object(ingest, 'MAX_BATCH_SIZE', 2):
+            self.assertEqual(self.post([self.row(str(i)) for i in range(3)]).status_code, 400)
+        self.assertEqual(self.client.post('/transactions/batch/', {'transactions': []}).status_code, 415)
+        self.assertEqual(self.client.post('/transactions/batch/', '[]', content_type='application/json').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.post([self.row('a')]).status_code, 401)
+        self.assertFalse(Transaction.objects.filter(client_ref__isnull=False).exists())
+
+
+class CursorPaginationTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        station = self.stations[0]
+        pump = station.pumps.get()
+        self.when = timezone.now() - timedelta(days=1)
+        # Seven sales in the same instant: only the pk tiebreak orders them
+        self.sales = [
+            Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=pump, fuel_type='petrol', quantity=1,
+                                       total_price=1500, payment_method='card', car_plate='TIE', transaction_time=self.when)
+            for _ in range(7)
+        ]
+        self.paginator = CursorPaginator(Transaction.objects.filter(car_plate='TIE'), 'transaction_time', 'transaction_id', 3)
+
+    def ids(self, page):
+        return [sale.pk for sale in page]
+
+    def test_pages_follow_ties_on_the_time_field(self):
+        newest_first = sorted((sale.pk for sale in self.sales), reverse=True)
+        first = self.paginator.page()
+        self.assertEqual(self.ids(first), newest_first[:3])
+        self.assertFalse(first.has_previous())
+
+        second = self.paginator.page(first.next_token)
+        self.assertEqual(self.ids(second), newest_first[3:6])
+        third = self.paginator.page(second.next_token)
+        self.assertEqual(self.ids(third), newest_first[6:])
+        self.assertFalse(third.has_next())
+
+        # And back again
+        back = self.paginator.page(third.previous_token)
+        self.assertEqual(self.ids(back), newest_first[3:6])
+        self.assertTrue(back.has_next())
+        back = self.paginator.page(back.previous_token)
+        self.assertEqual(self.ids(back), newest_first[:3])
+        self.assertFalse(back.has_previous())
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN and VM step counts are SQLite specific')
+        sale = self.sales[0]
+        Transaction.objects.bulk_create([
+            Transaction(station_id=sale.station_id, user_id=sale.user_id, pump_id=sale.pump_id, fuel_type='petrol', quantity=1,
+                        total_price=1500, payment_method='cash', transaction_time=self.when - timedelta(minutes=i))
+            for i in range(2000)
+        ])
+        paginator = CursorPaginator(Transaction.objects.all(), 'transaction_time', 'transaction_id', 3)
+        deep = Transaction.objects.order_by('-transaction_time', '-transaction_id')[1000]
+
+        def steps(token):
+            # SQLite virtual machine instructions run for the page, in hundreds
+            counted = [0]
+            connection.ensure_connection()
+            connection.connection.set_progress_handler(lambda: counted.__setitem__(0, counted[0] + 1), 100)
+            try:
+                paginator.page(token)
+            finally:
+                connection.connection.set_progress_handler(None, 0)
+            return counted[0]
+
+        first = steps(None)
+        # Seeking reads the rows of the page, not every row past the cursor
+        for token in (paginator.page().next_token, paginator.encode('next', deep), paginator.encode('prev', deep)):
+            self.assertLessEqual(steps(token), first + 2)
+
+        # The time index drives the ORDER BY (at most the pk tiebreak within one instant is sorted)
+        for paginator in (paginator, CursorPaginator(Alert.objects.all(), 'created_at', 'alert_id', 1)):
+            token = paginator.page().next_token
+            with CaptureQueriesContext(connection) as queries:
+                paginator.page(paginator.page(token).previous_token)
+            for query in queries.captured_queries:
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plan = ' / '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, query['sql'])
+                self.assertNotIn('MULTI-INDEX OR', plan, query['sql'])
+
+    def test_invalid_tokens(self):
+        token = self.paginator.page().next_token
+        for bad in ('garbage', token[:-2] + 'xx', signing.dumps(['sideways', self.when.isoformat(), 1], salt=CursorPaginator.salt)):
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(bad)
+
+        # The list page falls back to the first page
+        self.login(self.admin)
+        response = self.client.get('/transactions/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['paginator'])
+        self.assertEqual(len(response.context['cursor_page']), 11)
+
+    def test_pages_past_either_end(self):
+        newest_first = sorted((sale.pk for sale in self.sales), reverse=True)
+        oldest = Transaction.objects.get(pk=newest_first[-1])
+        # Rows older than a link's cursor went away: the oldest page, not a dead end
+        page = self.paginator.page(self.paginator.encode('next', oldest))
+        self.assertEqual(self.ids(page), newest_first[4:])
+        self.assertEqual(self.ids(self.paginator.page(page.previous_token)), newest_first[1:4])
+        self.assertFalse(page.has_next())
+        newest = Transaction.objects.get(pk=newest_first[0])
+        self.assertEqual(self.ids(self.paginator.page(self.paginator.encode('prev', newest))), newest_first[:3])
+
+        self.login(self.admin)
+        sale = self.sales[0]
+        for _ in range(10):
+            sale.pk = None
+            sale.save()
+        token = CursorPaginator(Transaction.objects.all(), 'transaction_time', 'transaction_id', 15).encode('next', oldest)
+        response = self.client.get('/transactions/', {'paging': 'cursor', 'payment_method': 'card', 'cursor': token})
+        page = response.context['cursor_page']
+        self.assertEqual(len(page), 15)
+        self.assertContains(response, f'href="?{escape(page.first_query)}"')
+        self.assertContains(response, f'href="?{escape(page.previous_query)}"')
+
+        # An empty list still gets the keyset controls
+        response = self.client.get('/alerts/', {'paging': 'cursor', 'status': 'ignored'})
+        self.assertEqual(len(response.context['cursor_page']), 0)
+        self.assertContains(response, 'Showing 0 results')
+
+    def test_links_keep_the_filters(self):
+        self.login(self.admin)
+        response = self.client.get('/transactions/', {'paging': 'cursor', 'payment_method': 'card', 'page': 4})
+        page = response.context['cursor_page']
+        self.assertEqual([sale.pk for sale in page], sorted((sale.pk for sale in self.sales), reverse=True))
+        self.assertFalse(page.has_other_pages())
+        self.assertEqual(QueryDict(page.first_query).dict(), {'paging': 'cursor', 'payment_method': 'card'})
+
+        sale = self.sales[0]
+        for _ in range(10):
+            sale.pk = None
+            sale.save()
+        page = self.client.get('/transactions/', {'paging': 'cursor', 'payment_method': 'card'}).context['cursor_page']
+        self.assertEqual(len(page), 15)
+        query = QueryDict(page.next_query)
+        self.assertEqual((query['paging'], query['payment_method']), ('cursor', 'card'))
+        page = self.client.get('/transactions/?' + page.next_query).context['cursor_page']
+        self.assertEqual(len(page), 2)
+        self.assertFalse(page.has_next())
+        self.assertEqual(QueryDict(page.previous_query)['payment_method'], 'card')
+
+
+class LowInventoryAlertTests(StationFixtureMixin, TestCase):
+
+    def sell(self, station, litres):
+        pump = station.pumps.first()
+        Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=pump, fuel_type='petrol', quantity=litres, total_price=0, payment_method='cash')
+
+    def pending_alerts(self, station):
+        return Alert.objects.filter(station=station, type='inventory', status='pending')
+
+    def test_one_alert_per_crossing(self):
+        station = self.stations[0]
+        Alert.objects.filter(station=station).update(status='resolved')
+        self.sell(station, 450)  # 50 L left, below the 100 L minimum
+        self.sell(station, 10)
+        self.assertEqual(self.pending_alerts(station).count(), 1)
+
+        # Still low after the alert was handled: no new alert until refilled
+        self.pending_alerts(station).update(status='resolved')
+        self.assertEqual(inventory.evaluate_thresholds(), (0, 0))
+
+        tank = Inventory.objects.get(station=station)
+        tank.quantity = 900
+        tank.save()
+        self.sell(station, 850)
+        self.assertEqual(self.pending_alerts(station).count(), 1)
+
+
+class AlertFilterTests(StationFixtureMixin, TestCase):
+
+    def alert_stations(self, **params):
+        response = self.client.get('/alerts/', params)
+        self.assertEqual(response.status_code, 200, params)
+        return [alert.station_id for alert in response.context['alerts']]
+
+    def test_non_numeric_ids_leave_the_filter_off(self):
+        self.login(self.admin)
+        everything = sorted(station.pk for station in self.stations)
+        self.assertEqual(sorted(self.alert_stations(station_id='abc')), everything)
+        self.assertEqual(sorted(self.alert_stations(company_id='abc')), everything)
+        self.assertEqual(sorted(self.alert_stations(station_id='all', company_id='all')), everything)
+        station = self.stations[1]
+        self.assertEqual(self.alert_stations(station_id=str(station.pk)), [station.pk])
+        self.assertEqual(self.alert_stations(company_id=str(self.company.pk + 1)), [])
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    """Concurrent sales on one tank must not lose any decrement."""
+
+    PUMPS = 4
+    SALES_PER_PUMP = 25
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner', full_name='Owner', password='pw', email='owner@example.com', role='owner')
+        company = Company.objects.create(name='Company', owner=owner)
+        self.station = Station.objects.create(company_id=company, name='Station', location='Kigali')
+        self.pumps = [Pump.objects.create(station=self.station, pump_number=i, fuel_type='petrol') for i in range(self.PUMPS)]
+        self.tank = Inventory.objects.create(station=self.station, fuel_type='petrol', quantity=10000, capacity=20000, min_threshold=100, unit_price=1500)
+        self.user = owner
+
+    def sell(self, pump, errors):
+        # No retry: with the tuned SQLite settings (BEGIN IMMEDIATE, busy
+        # timeout, WAL) concurrent writers wait for each other instead of
+        # failing with "database is locked"
+        try:
+            for _ in range(self.SALES_PER_PUMP):
+                with transaction.atomic():
+                    Transaction.objects.create(station_id=self.station, user_id=self.user, pump_id=pump, fuel_type='Petrol', quantity=2, total_price=3000, payment_method='cash')
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    def test_concurrent_sales_have_no_lost_updates(self):
+        errors = []
+        threads = [threading.Thread(target=self.sell, args=(pump, errors)) for pump in self.pumps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        sales = self.PUMPS * self.SALES_PER_PUMP
+        self.assertEqual(Transaction.objects.count(), sales)
+        self.tank.refresh_from_db()
+        self.assertEqual(self.tank.quantity, 10000 - 2 * sales)
+
+    def test_batch_issues_one_update_per_tank(self):
+        sales = [Transaction(station_id=self.station, pump_id=pump, fuel_type='petrol', quantity=5) for pump in self.pumps]
+        with CaptureQueriesContext(connection) as queries:
+            consume_fuel(sales)
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "service_inventory"')]
+        self.assertEqual(len(updates), 1)
+        self.tank.refresh_from_db()
+        self.assertEqual(self.tank.quantity, 10000 - 5 * self.PUMPS)
+
+
+class PumpStatusEventTests(StationFixtureMixin, TestCase):
+
+    def collect(self, stations, after, count):
+        async def read():
+            stream = events.broker.stream(stations, after)
+            messages = [await stream.__anext__() for _ in range(count)]
+            await stream.aclose()
+            return messages
+        return async_to_sync(read)()
+
+    def test_status_changes_are_logged_and_streamed_per_station(self):
+        start = events.latest_event_id()
+        self.login(self.manager)
+        own, other = self.stations[0].pumps.get(), self.stations[1].pumps.get()
+        self.client.post(f'/pumps/{own.pk}/status/', {'status': 'offline'})
+        self.client.post(f'/pumps/{own.pk}/status/', {'status': 'offline'})  # unchanged: no event
+        other.status = 'offline'
+        other.save()
+
+        self.assertEqual(PumpStatusEvent.objects.filter(event_id__gt=start).count(), 2)
+        message = self.collect({self.stations[0].pk}, start, 1)[0]
+        self.assertIn('event: pump-status', message)
+        self.assertIn(f'"pump_id": {own.pk}', message)
+        self.assertIn('"previous_status": "active"', message)
+
+    def test_wsgi_fallback_returns_pending_events(self):
+        self.login(self.manager)
+        start = events.latest_event_id()
+        pump = self.stations[0].pumps.get()
+        pump.status = 'offline'
+        pump.save()
+        response = self.client.get(f'/pumps/stream/?after={start}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn(b'retry: 5000', response.content)
+        self.assertIn(b'"status": "offline"', response.content)
+
+
+class PriceCacheTests(StationFixtureMixin, TestCase):
+
+    def test_prices_are_cached_until_changed(self):
+        setting = SystemSetting.objects.create(fuel_type='Petrol', price_per_liter=1500)
+        self.assertEqual(pricing.price_for('petrol'), Decimal('1500'))
+        with self.assertNumQueries(0):
+            pricing.price_for('petrol')
+
+        # Saved in this process: the signal drops the copy at once
+        setting.price_per_liter = 1600
+        setting.save()
+        self.assertEqual(pricing.price_for('petrol'), Decimal('1600'))
+
+    def test_other_processes_are_seen_through_the_version(self):
+        SystemSetting.objects.create(fuel_type='Diesel', price_per_liter=1400)
+        self.assertEqual(pricing.price_for('diesel'), Decimal('1400'))
+
+        # Another worker changed the price: no signal here, only the version row
+        SystemSetting.objects.filter(fuel_type='Diesel').update(price_per_liter=1450)
+        versions.bump_version(pricing.PRICE_VERSION)
+        self.assertEqual(pricing.price_for('diesel'), Decimal('1400'))
+        with mock.patch.object(pricing, 'PRICE_CACHE_CHECK_INTERVAL', 0):
+            self.assertEqual(pricing.price_for('diesel'), Decimal('1450'))
+
+
+class PriceOverrideTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.setting = SystemSetting.objects.create(fuel_type='Petrol', price_per_liter=1500)
+        other_owner = User.objects.create(username='other', full_name='Other', password='pw', email='other@example.com', role='owner')
+        other_company = Company.objects.create(name='Other', owner=other_owner)
+        self.other_station = Station.objects.create(company_id=other_company, name='Other', location='Huye')
+        Inventory.objects.create(station=self.other_station, fuel_type='petrol', quantity=500, capacity=1000, min_threshold=100, unit_price=1500)
+
+    def test_company_price_leaves_global_price_and_other_companies_alone(self):
+        own, other = self.stations[0].pk, self.other_station.pk
+        self.assertEqual(pricing.price_for('petrol', station_id=other), Decimal('1500'))
+
+        self.setting.price_per_liter = 1700
+        self.setting.update_prices('owner', company_id=self.company.pk)
+
+        self.setting.refresh_from_db()
+        self.assertEqual(self.setting.price_per_liter, Decimal('1500'))
+        self.assertEqual(pricing.price_for('petrol', station_id=own), Decimal('1700'))
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.price_for('petrol', station_id=other), Decimal('1500'))
+        self.assertEqual(
+            dict(Inventory.objects.values_list('station_id', 'unit_price')),
+            {self.stations[0].pk: Decimal('1700'), self.stations[1].pk: Decimal('1700'), other: Decimal('1500')},
+        )
+
+    def test_station_override_wins_over_company_and_global(self):
+        station = self.stations[1].pk
+        pricing.set_station_price(station, 'Petrol', 1650)
+        pricing.set_company_price(self.company.pk, 'Petrol', 1700)
+        self.setting.price_per_liter = 1550
+        self.setting.update_prices('admin')
+
+        self.assertEqual(pricing.price_for('petrol', station_id=station), Decimal('1650'))
+        self.assertEqual(pricing.price_for('petrol', station_id=self.stations[0].pk), Decimal('1700'))
+        self.assertEqual(pricing.price_for('petrol', station_id=self.other_station.pk), Decimal('1550'))
+        self.assertEqual(Inventory.objects.get(station_id=station).unit_price, Decimal('1650'))
+        self.assertEqual(Inventory.objects.get(station_id=self.stations[0].pk).unit_price, Decimal('1700'))
+        self.assertEqual(Inventory.objects.get(station_id=self.other_station.pk).unit_price, Decimal('1550'))
+
+
+class QueryBudgetTests(QueryBudgetMixin, StationFixtureMixin, TestCase):
+    """Per-view query budgets; they must hold however many stations a user has."""
+
+    BUDGETS = {
+        '/dashboard/': 6,
+        '/transactions/': 5,
+        '/alerts/': 8,
+        '/pumps/dashboard/': 4,
+        '/pumps/': 4,
+        '/stations/': 4,
+        '/inventory/': 2,
+    }
+
+    def add_stations(self, count):
+        for i in range(count):
+            station = Station.objects.create(company_id=self.company, manager_id=self.manager, name=f'Extra {i}', location='Musanze')
+            pump = Pump.objects.create(station=station, pump_number=1, fuel_type='diesel')
+            tank = Inventory.objects.create(station=station, fuel_type='diesel', quantity=500, capacity=1000, min_threshold=100, unit_price=1400)
+            Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=pump, fuel_type='diesel', quantity=5, total_price=7000, payment_method='cash')
+            Alert.objects.create(station=station, type='inventory', description='Low', inventory_id=tank)
+
+    def test_budgets_do_not_grow_with_station_count(self):
+        for user in (self.manager, self.owner, self.admin):
+            self.login(user)
+            for url, budget in self.BUDGETS.items():
+                self.assertQueryBudget(url, budget)
+        self.add_stations(10)
+        for user in (self.manager, self.owner, self.admin):
+            self.login(user)
+            for url, budget in self.BUDGETS.items():
+                self.assertQueryBudget(url, budget)
+
+    def test_server_timing_and_view_metrics(self):
+        view_metrics.clear()
+        self.login(self.admin)
+        response = self.client.get('/dashboard/')
+        self.assertRegex(response['Server-Timing'], r'db;desc="\d+ queries";dur=[\d.]+, tpl;desc="Templates";dur=[\d.]+, view;desc="View";dur=[\d.]+')
+
+        summary = self.client.get('/metrics/views/').json()['views']
+        self.assertEqual(summary['dashboard']['count'], 1)
+        self.assertLessEqual(summary['dashboard']['queries']['max'], QueryBudgetTests.BUDGETS['/dashboard/'])
+
+
+class AdminChangelistTests(QueryBudgetMixin, StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User as AuthUser
+        self.client.force_login(AuthUser.objects.create_superuser('root', 'root@example.com', 'pw'))
+
+    def test_changelists_do_not_query_per_row(self):
+        urls = [
+            '/admin/service/transaction/',
+            '/admin/service/transaction/?payment_method__exact=cash',
+            '/admin/service/alert/',
+            '/admin/service/inventory/',
+            '/admin/service/pump/',
+        ]
+        budgets = {}
+        for url in urls:
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            budgets[url] = len(queries.captured_queries)
+
+        station = self.stations[0]
+        pump = station.pumps.get()
+        for number in range(2, 22):
+            extra = Pump.objects.create(station=station, pump_number=number, fuel_type='petrol')
+            Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=extra, fuel_type='petrol', quantity=1, total_price=1500, payment_method='cash')
+            Alert.objects.create(station=station, type='maintenance', description='Offline', pump_id=pump)
+        for url, budget in budgets.items():
+            self.assertQueryBudget(url, budget)
+
+    def test_transaction_changelist_estimates_large_counts(self):
+        from .pagination import ESTIMATE_THRESHOLD
+        last = Transaction.objects.order_by('-pk').first()
+        Transaction.objects.filter(pk=last.pk).update(transaction_id=ESTIMATE_THRESHOLD + 5)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/service/transaction/')
+        self.assertEqual(response.context['cl'].result_count, ESTIMATE_THRESHOLD + 5)
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(*)' in q['sql'] and 'service_transaction' in q['sql']])
+
+
+class InventoryLevelTests(StationFixtureMixin, TestCase):
+
+    def test_levels_are_annotated_by_the_database(self):
+        tank = Inventory.objects.get(station=self.stations[0])
+        Inventory.objects.filter(pk=tank.pk).update(quantity=50)
+        Inventory.objects.create(station=self.stations[1], fuel_type='diesel', quantity=800, capacity=1000, min_threshold=100, unit_price=1400)
+        self.login(self.owner)
+        response = self.client.get('/inventory/')
+        levels = {(t.station_id, t.fuel_type): (round(t.percentage), t.fill_status, t.below_threshold) for t in response.context['inventory_list']}
+        self.assertEqual(levels, {
+            (self.stations[0].pk, 'petrol'): (5, 'Low', True),
+            (self.stations[1].pk, 'petrol'): (48, 'Low', False),
+            (self.stations[1].pk, 'diesel'): (80, 'Good', False),
+        })
+        self.assertContains(response, 'Low Stock Alert!', count=1)
+
+    def test_fleet_summary_is_one_query(self):
+        Inventory.objects.create(station=self.stations[1], fuel_type='Diesel', quantity=600, capacity=1000, min_threshold=100, unit_price=1400)
+        with self.assertNumQueries(1):
+            levels = inventory.fleet_levels(Inventory.objects.all())
+        self.assertEqual(levels, [
+            {'company_id': self.company.pk, 'company': 'Company', 'fuel_type': 'diesel', 'tanks': 1, 'quantity': 600.0, 'capacity': 1000.0,
+             'percentage': 60.0, 'good': 0, 'medium': 1, 'low': 0, 'below_threshold': 0},
+            {'company_id': self.company.pk, 'company': 'Company', 'fuel_type': 'petrol', 'tanks': 2, 'quantity': 960.0, 'capacity': 2000.0,
+             'percentage': 48.0, 'good': 0, 'medium': 0, 'low': 2, 'below_threshold': 0},
+        ])
+        self.login(self.manager)
+        self.assertEqual(len(self.client.get('/inventory/summary/').json()['levels']), 2)
+
+
+class FragmentCacheTests(StationFixtureMixin, TestCase):
+
+    def test_unchanged_dashboard_renders_from_cache(self):
+        fragment_stats.clear()
+        self.login(self.manager)
+        self.client.get('/dashboard/')
+        with self.assertNumQueries(1):  # the user only; the session comes from the cache
+            response = self.client.get('/dashboard/')
+        self.assertContains(response, '15000 RWF')
+        self.assertEqual(fragment_stats.summary()['dashboard_pumps'], {'hits': 1, 'misses': 1})
+
+        # A sale at one of the manager's stations refreshes the blocks built from transactions
+        station = self.stations[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(station_id=station, user_id=self.manager, pump_id=station.pumps.get(), fuel_type='petrol', quantity=1, total_price=1234, payment_method='cash')
+        response = self.client.get('/dashboard/')
+        self.assertContains(response, '1234 RWF')
+        summary = fragment_stats.summary()
+        self.assertEqual(summary['dashboard_transactions'], {'hits': 1, 'misses': 2})
+        self.assertEqual(summary['dashboard_pumps'], {'hits': 2, 'misses': 1})
+
+    def test_monitoring_cards_follow_pump_changes(self):
+        self.login(self.admin)
+        self.client.get('/pumps/dashboard/')
+        with self.assertNumQueries(1):
+            self.client.get('/pumps/dashboard/')
+        pump = self.stations[1].pumps.get()
+        pump.status = 'offline'
+        version_key = source_version_key('pumps', pump.station_id)
+        version = cache.get(version_key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            pump.save()
+            # Not before the commit, or the old status could be cached under the new key
+            self.assertEqual(cache.get(version_key), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(version_key), version)
+        response = self.client.get('/pumps/dashboard/')
+        self.assertContains(response, f'data-pump-id="{pump.pk}" data-status="offline"')
+
+
+class DatabaseConfigTests(TestCase):
+
+    def test_sqlite_mode_is_tuned_for_concurrent_writers(self):
+        config = database_config(Path('/srv/station'), {})
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA synchronous=NORMAL', config['OPTIONS']['init_command'])
+        # WAL is set once by migration 0019, not by every connection
+        self.assertNotIn('journal_mode', config['OPTIONS']['init_command'])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_replica_alias_only_when_configured(self):
+        base = Path('/srv/station')
+        self.assertIsNone(replica_config(base, {}))
+        self.assertEqual(replica_config(base, {'SQLITE_REPLICA_PATH': '/srv/replica.sqlite3'})['NAME'], '/srv/replica.sqlite3')
+        self.assertEqual(replica_config(base, {}, testing=True)['TEST']['NAME'], '/srv/station/test_replica.sqlite3')
+        self.assertIsNone(replica_config(base, {'DB_ENGINE': 'postgresql'}))
+        self.assertEqual(replica_config(base, {'DB_ENGINE': 'postgresql', 'DB_REPLICA_HOST': 'replica'})['HOST'], 'replica')
+
+    def test_postgresql_modes(self):
+        persistent = database_config(Path('.'), {'DB_ENGINE': 'postgresql', 'DB_CONN_MAX_AGE': '300'})
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (300, True))
+        pooled = database_config(Path('.'), {'DB_ENGINE': 'postgres', 'DB_POOL_MAX_SIZE': '20'})
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool']['max_size'], 20)
+
+
+@override_settings(REPORTING_DATABASE='replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    """Primary and replica are two SQLite files; the replica is refreshed by copying the primary."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', full_name='Admin', password='pw', email='admin@example.com', role='admin')
+        company = Company.objects.create(name='Company', owner=self.admin)
+        self.station = Station.objects.create(company_id=company, name='Station', location='Kigali')
+        self.pump = Pump.objects.create(station=self.station, pump_number=1, fuel_type='petrol')
+        self.sell()
+        self.replicate()
+
+    def sell(self):
+        Transaction.objects.create(station_id=self.station, user_id=self.admin, pump_id=self.pump, fuel_type='petrol', quantity=10, total_price=15000, payment_method='cash')
+
+    def replicate(self):
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def login(self):
+        self.client.post('/', {'email': self.admin.email, 'password': self.admin.password})
+        # Logging in only wrote the session, which is never read from the replica
+        self.assertNotIn(routers.PRIMARY_PIN_COOKIE, self.client.cookies)
+
+    def test_reporting_reads_use_the_replica(self):
+        self.login()
+        self.sell()  # not replicated yet
+
+        response = self.client.get('/transactions/')
+        self.assertEqual(response.context['total_transactions_count'], 1)
+        self.assertEqual(len(response.context['transactions']), 1)
+        export = b''.join(self.client.get('/transactions/export/').streaming_content)
+        self.assertEqual(export.count(b'\n'), 2)  # header and one sale
+
+        self.replicate()
+        self.assertEqual(self.client.get('/transactions/').context['total_transactions_count'], 2)
+
+    def test_writes_and_read_your_writes_use_the_primary(self):
+        self.login()
+        with routers.reporting_reads():
+            self.assertEqual(Transaction.objects.db, 'replica')
+            pump = Pump.objects.get()
+            pump.status = 'offline'
+            pump.save()
+            with transaction.atomic():
+                self.assertEqual(Transaction.objects.db, 'default')
+        self.assertEqual(Pump.objects.using('default').get().status, 'offline')
+        self.assertEqual(Pump.objects.using('replica').get().status, 'active')
+        self.assertEqual(CacheVersion.objects.db, 'default')
+
+        # A client that just wrote reads its own sale even though the replica lags
+        self.client.post(f'/pumps/{pump.pk}/status/', {'status': 'active'})
+        self.assertIn(routers.PRIMARY_PIN_COOKIE, self.client.cookies)
+        self.sell()
+        self.assertEqual(self.client.get('/transactions/').context['total_transactions_count'], 2)
+
+
+class SessionStoreTests(StationFixtureMixin, TestCase):
+
+    def session_queries(self, queries):
+        return [q['sql'] for q in queries.captured_queries if 'django_session' in q['sql']]
+
+    def test_requests_read_the_session_from_the_cache(self):
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/transactions/')
+            self.client.get('/alerts/')
+        self.assertEqual(self.session_queries(queries), [])
+
+        # Write-through: a cache miss falls back to the session table
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/transactions/').status_code, 200)
+        self.assertEqual(len(self.session_queries(queries)), 1)
+
+    def test_expired_sessions_are_deleted_in_batches(self):
+        store = sessions.SessionStore
+        expired = timezone.now() - timedelta(days=1)
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=expired)
+        Session.objects.create(session_key='live', session_data='', expire_date=timezone.now() + timedelta(days=1))
+
+        self.assertEqual(store.clear_expired(batch_size=2, max_batches=1), 2)
+        self.assertEqual(store.clear_expired(batch_size=2), 3)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_carry_the_role(self):
+        self.login(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/transactions/')
+        self.assertEqual(response.context['user_role'], 'owner')
+        self.assertEqual(self.session_queries(queries), [])
+
+        # A tampered claim fails the signature check
+        value = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = value[:-1] + ('A' if value[-1] != 'A' else 'B')
+        self.assertRedirects(self.client.get('/dashboard/'), '/')
+
+
+class PumpTelemetryTests(StationFixtureMixin, TestCase):
+
+    def post_samples(self, samples):
+        return self.client.post('/pumps/telemetry/', json.dumps({'samples': samples}), content_type='application/json')
+
+    def test_samples_are_downsampled_into_buckets(self):
+        self.login(self.manager)
+        pump = self.stations[0].pumps.get()
+        start = timezone.now().replace(minute=10, second=0, microsecond=0)
+        outsider = Station.objects.create(company_id=Company.objects.create(name='Other', owner=self.admin), name='Other', location='Huye')
+        samples = [
+            {'pump_id': pump.pk, 'recorded_at': (start + timedelta(seconds=20 * i)).isoformat(), 'flow_rate': 30 + i, 'dispensed': 10, 'status': 'active' if i < 5 else 'offline'}
+            for i in range(6)  # two minutes
+        ]
+        samples.append({'pump_id': Pump.objects.create(station=outsider, pump_number=1).pk})
+        samples.append({'pump_id': pump.pk, 'flow_rate': -1})
+        result = self.post_samples(samples).json()
+        self.assertEqual((result['created'], result['error']), (6, 2))
+
+        buckets = {(b.resolution, b.bucket_start.minute): b for b in PumpTelemetryBucket.objects.filter(pump=pump)}
+        self.assertEqual(sorted(buckets), [('day', 0), ('hour', 0), ('minute', 10), ('minute', 11)])
+        hour = buckets[('hour', 0)]
+        self.assertEqual((hour.samples, hour.active_samples, hour.dispensed, hour.flow_max), (6, 5, 60, 35))
+
+        # A later batch for the same minute adds to its bucket
+        self.post_samples([{'pump_id': pump.pk, 'recorded_at': (start + timedelta(seconds=50)).isoformat(), 'flow_rate': 40, 'dispensed': 5}])
+        minute = PumpTelemetryBucket.objects.get(pump=pump, resolution='minute', bucket_start=start)
+        self.assertEqual((minute.samples, minute.dispensed, minute.flow_max), (4, 35, 40))
+
+        with self.assertNumQueries(1):
+            points = telemetry.history(StationAccess(self.manager.pk, 'manager'), '24h', now=start + timedelta(minutes=5))
+        self.assertEqual(list(points), [pump.pk])
+        self.assertEqual(points[pump.pk][0]['dispensed'], 65)
+        response = self.client.get('/pumps/history/?range=1h')
+        self.assertEqual(response.json()['resolution'], 'minute')
+        for bad in ('x', '', '²'):
+            self.assertEqual(self.client.get('/pumps/history/', {'pump_id': bad}).status_code, 400)
+        self.assertEqual(list(self.client.get('/pumps/history/', {'pump_id': pump.pk}).json()['pumps']), [str(pump.pk)])
+
+    def test_retention_prunes_old_samples_and_buckets(self):
+        pump = self.stations[0].pumps.get()
+        old = timezone.now() - timedelta(days=30)
+        sample = PumpSample.objects.create(pump=pump, station=self.stations[0], recorded_at=old, status='active', dispensed=5)
+        telemetry.apply_samples([sample])
+        deleted = telemetry.prune(batch_size=1)
+        self.assertEqual(deleted, {'raw': 1, 'minute': 1, 'hour': 0})
+        self.assertEqual(sorted(PumpTelemetryBucket.objects.values_list('resolution', flat=True)), ['day', 'hour'])
+
+
+class PumpUptimeTests(StationFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Mid-month, so the whole scenario falls inside one month
+        self.start = (timezone.now() - timedelta(days=40)).replace(day=10, hour=6, minute=0, second=0, microsecond=0)
+        self.end = self.start + timedelta(hours=10)
+        self.first = Pump.objects.create(station=self.stations[0], pump_number=2)
+        self.second = Pump.objects.create(station=self.stations[1], pump_number=2)
+        PumpStatusEvent.objects.filter(pump__in=[self.first, self.second]).delete()
+        # First pump: active since the day before, offline from +2h to +5h
+        self.log(self.first, -24, 'active', None)
+        self.log(self.first, 2, 'offline', 'active')
+        self.log(self.first, 5, 'active', 'offline')
+        # Second pump: installed at +4h, offline from +9h
+        self.log(self.second, 4, 'active', None)
+        self.log(self.second, 9, 'offline', 'active')
+        self.pumps = Pump.objects.filter(pk__in=[self.first.pk, self.second.pk])
+
+    def log(self, pump, hours, status, previous):
+        PumpStatusEvent.objects.create(pump=pump, station=pump.station, status=status, previous_status=previous, created_at=self.start + timedelta(hours=hours))
+
+    def test_window_uptime_per_pump_station_and_company(self):
+        with self.assertNumQueries(3):
+            result = uptime.window_report(self.pumps, self.start, self.end)
+        pumps = {row['pump_id']: (row['up_hours'], row['observed_hours'], row['uptime']) for row in result['pumps']}
+        self.assertEqual(pumps, {self.first.pk: (7, 10, 70), self.second.pk: (5, 6, 83.33)})
+        self.assertEqual([row['uptime'] for row in result['stations']], [70, 83.33])
+        self.assertEqual(result['companies'], [
+            {'company_id': self.company.pk, 'up_hours': 12, 'down_hours': 4, 'observed_hours': 16, 'uptime': 75, 'transitions': 4},
+        ])
+
+    def test_monthly_summary_matches_the_transitions(self):
+        month = self.start.date().replace(day=1)
+        uptime.summarize_month(month)
+        uptime.summarize_month(month)  # re-running updates in place
+        self.assertEqual(PumpUptimeMonth.objects.filter(pump=self.first).count(), 1)
+
+        self.login(self.admin)
+        monthly = self.client.get(f'/pumps/uptime/?month={month:%Y-%m}').json()
+        live = uptime.window_report(self.pumps, *uptime.month_bounds(month))
+        row = next(row for row in monthly['pumps'] if row['pump_id'] == self.first.pk)
+        self.assertEqual(row, next(row for row in live['pumps'] if row['pump_id'] == self.first.pk))
+        self.assertEqual(row['down_hours'], 3)
+
+
+class JobQueueTests(TransactionTestCase):
+    """Jobs run on a real thread pool, so the test data must be committed."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', full_name='Admin', password='pw', email='admin@example.com', role='admin')
+        company = Company.objects.create(name='Company', owner=self.admin)
+        self.stations = [Station.objects.create(company_id=company, name=f'Station {i}', location='Kigali') for i in range(3)]
+        for station in self.stations:
+            Inventory.objects.create(station=station, fuel_type='petrol', quantity=500, capacity=1000, min_threshold=100, unit_price=1500)
+        self.setting = SystemSetting.objects.create(fuel_type='Petrol', price_per_liter=1500)
+
+    def run_workers(self):
+        return jobs.Worker(concurrency=2, poll_interval=0.01).run(once=True)
+
+    def test_price_propagation_runs_out_of_band(self):
+        self.setting.price_per_liter = 1650
+        self.setting.update_prices('admin', background=True)
+        self.assertEqual(pricing.price_for('petrol'), Decimal('1650'))
+        self.assertEqual(Inventory.objects.filter(unit_price=1500).count(), 3)
+
+        self.assertEqual(self.run_workers(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result), ('succeeded', {'tanks': 3}))
+        self.assertIsNotNone(job.duration_ms)
+        self.assertEqual(Inventory.objects.filter(unit_price=1650).count(), 3)
+
+    def test_price_propagation_runs_inline_without_workers(self):
+        self.setting.price_per_liter = 1650
+        self.setting.update_prices('admin')
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Inventory.objects.filter(unit_price=1650).count(), 3)
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        with mock.patch.dict(jobs.TASKS):
+            jobs.task(name='test.slow')(lambda: None)
+            job = jobs.enqueue('test.slow')
+        self.assertEqual(jobs.claim('worker-1', 1), [job.pk])
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(started_at=an_hour_ago)
+
+        # Long-running but still beating
+        self.assertEqual(jobs.heartbeat('worker-1'), 1)
+        self.assertEqual(jobs.requeue_stale(), (0, 0))
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=an_hour_ago)
+        self.assertEqual(jobs.requeue_stale(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('queued', None))
+
+    def test_queue_checks_task_kwargs(self):
+        self.client.post('/', {'email': self.admin.email, 'password': self.admin.password})
+
+        def post(payload):
+            return self.client.post('/jobs/', json.dumps(payload), content_type='application/json')
+
+        self.assertEqual(post({'name': 'tasks.sync_global_inventory', 'kwargs': {'name': 'x'}}).status_code, 400)
+        self.assertEqual(post({'name': 'tasks.evaluate_thresholds', 'kwargs': {'bogus': 1}}).status_code, 400)
+        self.assertEqual(post({'name': 'tasks.sync_global_inventory'}).status_code, 400)
+        self.assertEqual(post({'name': ['tasks.evaluate_thresholds']}).status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+        response = post({'name': 'tasks.sync_global_inventory', 'kwargs': {'fuel_type': 'Petrol'}})
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get()
+        self.assertEqual((response['Location'], job.kwargs, job.created_by_id), (f'/jobs/{job.pk}/', {'fuel_type': 'Petrol'}, self.admin.pk))
+
+    def test_queueing_needs_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.get('/')
+        token = client.cookies['csrftoken'].value
+        client.post('/', {'email': self.admin.email, 'password': self.admin.password, 'csrfmiddlewaretoken': token})
+        token = client.cookies['csrftoken'].value  # rotated on login
+        payload = json.dumps({'name': 'tasks.evaluate_thresholds'})
+
+        response = client.post('/jobs/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = client.post('/jobs/', payload, content_type='application/json', headers={'X-CSRFToken': token})
+        self.assertEqual(response.status_code, 202)
+
+    def test_failed_jobs_are_retried_and_can_be_polled(self):
+        calls = []
+
+        with mock.patch.dict(jobs.TASKS), mock.patch.object(jobs, 'RETRY_BACKOFF_SECONDS', 0):
+            @jobs.task(name='test.flaky', max_attempts=2)
+            def flaky():
+                calls.append('flaky')
+                if calls.count('flaky') == 1:
+                    raise RuntimeError('try again')
+                return 'ok'
+
+            @jobs.task(name='test.broken', max_attempts=2)
+            def broken():
+                raise ValueError('always fails')
+
+            flaky_job, broken_job = jobs.enqueue('test.flaky'), jobs.enqueue('test.broken')
+            self.assertEqual(self.run_workers(), 4)
+
+        self.client.post('/', {'email': self.admin.email, 'password': self.admin.password})
+        status = self.client.get(f'/jobs/{flaky_job.pk}/').json()
+        self.assertEqual((status['status'], status['attempts'], status['result']), ('succeeded', 2, 'ok'))
+        status = self.client.get(f'/jobs/{broken_job.pk}/').json()
+        self.assertEqual((status['status'], status['attempts'], status['error']), ('failed', 2, 'ValueError: always fails'))
+        stats = self.client.get('/jobs/').json()['tasks']
+        self.assertEqual((stats['test.flaky']['succeeded'], stats['test.broken']['failed']), (1, 1))
+
+
+class AsyncViewTests(StationFixtureMixin, TransactionTestCase):
+    """Async views read on worker-thread connections, so the test data must be committed."""
+
+    def setUp(self):
+        self.setUpTestData()
+        super().setUp()
+
+    async def alogin(self, user):
+        await self.async_client.post('/', {'email': user.email, 'password': user.password})
+
+    def test_independent_reads_overlap(self):
+        barrier = threading.Barrier(2, timeout=5)  # breaks unless both reads run at once
+
+        def read():
+            barrier.wait()
+            return Transaction.objects.count()
+
+        self.assertEqual(async_to_sync(aio.gather_reads)(read, read), [4, 4])
+
+    async def test_dashboards_match_the_sync_views(self):
+        await self.alogin(self.manager)
+        response = await self.async_client.get('/async/dashboard/')
+        self.assertContains(response, '60000 RWF')
+        queries = int(re.search(r'db;desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreaterEqual(queries, 4)  # counted on the worker-thread connections too
+
+        pump = await Pump.objects.select_related('station').aget(station=self.stations[1])
+        response = await self.async_client.get('/async/pumps/dashboard/')
+        self.assertContains(response, f'data-pump-id="{pump.pk}" data-status="active"')
+
+        self.async_client.cookies.clear()
+        response = await self.async_client.get('/async/dashboard/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    async def test_list_pages(self):
+        station = self.stations[0]
+        pump = await station.pumps.aget()
+        for _ in range(16):
+            await Transaction.objects.acreate(station_id=station, user_id=self.manager, pump_id=pump, fuel_type='petrol', quantity=1, total_price=1500, payment_method='cash')
+        await self.alogin(self.admin)
+
+        response = await self.async_client.get('/async/transactions/', {'page': 2})
+        self.assertEqual(response.context['paginator'].count, 20)
+        self.assertEqual(len(response.context['transactions']), 5)
+        self.assertEqual(response.context['total_transactions_count'], 20)
+        self.assertContains(response, 'Showing 16 to 20 of 20 results')
+        # Past the end: the last page, like the sync view's get_page
+        response = await self.async_client.get('/async/transactions/', {'page': 9})
+        self.assertEqual(response.context['page_obj'].number, 2)
+
+        response = await self.async_client.get('/async/transactions/', {'paging': 'cursor'})
+        self.assertIsNone(response.context['paginator'])
+        self.assertTrue(response.context['cursor_page'].has_next())
+
+        await Alert.objects.filter(station=station).aupdate(status='resolved')
+        response = await self.async_client.get('/async/alerts/', {'status': 'all'})
+        context = response.context
+        self.assertEqual(
+            (len(context['alerts']), context['pending_count'], context['resolved_count'], context['total_alerts']), (2, 1, 1, 2),
+        )
+
+
+class BenchmarkTests(TestCase):
+
+    def test_seed_fleet_and_benchmark(self):
+        call_command('seed_fleet', companies=1, stations=2, pumps=2, transactions=120, alerts=40, batch_size=50, stdout=StringIO())
+        self.assertEqual(Station.objects.count(), 2)
+        self.assertEqual(Transaction.objects.count(), 120)
+        self.assertEqual(rollups.transaction_count(None), 120)  # bulk inserts skip the signals; the rollup is rebuilt
+        with self.assertRaises(CommandError):
+            call_command('seed_fleet', transactions=0, alerts=0, stdout=StringIO())
+
+        output = StringIO()
+        call_command('benchmark', repeat=2, view=['dashboard', 'transaction_list'], stdout=output)
+        result = json.loads(output.getvalue())
+        self.assertEqual(result['scale']['transaction'], 120)
+        self.assertEqual(set(result['views']), {'admin', 'owner', 'manager'})
+        dashboard = result['views']['manager']['dashboard']
+        self.assertEqual(dashboard['status'], [200])
+        self.assertLessEqual(dashboard['p50_ms'], dashboard['p95_ms'])
+        self.assertLessEqual(dashboard['queries'], QueryBudgetTests.BUDGETS['/dashboard/'])
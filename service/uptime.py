@@ -0,0 +1,165 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Pump, PumpStatusEvent, PumpUptimeMonth
+
+
+# PUMP UPTIME
+
+UP_STATUSES = {'active'}
+
+
+def month_bounds(month):
+    """Aware [start, end) datetimes of the month containing ``month`` (a date)."""
+    first = month.replace(day=1)
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return (
+        timezone.make_aware(datetime.combine(first, time.min)),
+        timezone.make_aware(datetime.combine(following, time.min)),
+    )
+
+
+def _percentage(up, observed):
+    return round(100 * up / observed, 2) if observed else None
+
+
+class UptimeTotals:
+    """Up and observed seconds of one pump, station or company."""
+
+    def __init__(self):
+        self.up_seconds = 0.0
+        self.observed_seconds = 0.0
+        self.transitions = 0
+
+    def add(self, other):
+        self.up_seconds += other.up_seconds
+        self.observed_seconds += other.observed_seconds
+        self.transitions += other.transitions
+
+    def as_dict(self, **keys):
+        return {
+            **keys,
+            'up_hours': round(self.up_seconds / 3600, 2),
+            'down_hours': round((self.observed_seconds - self.up_seconds) / 3600, 2),
+            'observed_hours': round(self.observed_seconds / 3600, 2),
+            'uptime': _percentage(self.up_seconds, self.observed_seconds),
+            'transitions': self.transitions,
+        }
+
+
+def pump_totals(pumps, start, end):
+    """
+    Uptime of every pump in ``pumps`` (a Pump queryset) over [start, end).
+
+    Two queries whatever the number of pumps: the pumps, each annotated with
+    its last status before ``start``, and every transition inside the window
+    sorted by pump and time, which is then walked once. A pump whose first
+    logged event is its creation only counts from then on; a pump without
+    any event before or inside the window kept its current status.
+
+    Returns {pump_id: UptimeTotals}.
+    """
+    end = min(end, timezone.now())
+    before = PumpStatusEvent.objects.filter(pump=OuterRef('pk'), created_at__lt=start).order_by('-created_at', '-event_id')
+    pumps = list(pumps.annotate(status_before=Subquery(before.values('status')[:1])).values('pk', 'status', 'status_before'))
+    pump_ids = [pump['pk'] for pump in pumps]
+
+    transitions = defaultdict(list)
+    window = PumpStatusEvent.objects.filter(pump_id__in=pump_ids, created_at__gte=start, created_at__lt=end)
+    for pump_id, created_at, status, previous in window.order_by('pump_id', 'created_at', 'event_id').values_list(
+        'pump_id', 'created_at', 'status', 'previous_status',
+    ):
+        transitions[pump_id].append((created_at, status, previous))
+
+    totals = {}
+    for pump in pumps:
+        events = transitions[pump['pk']]
+        if pump['status_before'] is not None:
+            state = pump['status_before']
+        elif events:
+            state = events[0][2]  # None: created inside the window
+        else:
+            state = pump['status']
+
+        result = UptimeTotals()
+        cursor = start
+        for created_at, status, _ in events + [(end, None, None)]:
+            if state is not None and created_at > cursor:
+                seconds = (created_at - cursor).total_seconds()
+                result.observed_seconds += seconds
+                if state in UP_STATUSES:
+                    result.up_seconds += seconds
+            if status is not None:
+                state, cursor = status, created_at
+        result.transitions = len(events)
+        totals[pump['pk']] = result
+    return totals
+
+
+def report(pumps, totals):
+    """Rolls per-pump UptimeTotals up to stations and companies (no extra query beyond the pump rows)."""
+    stations, companies = defaultdict(UptimeTotals), defaultdict(UptimeTotals)
+    rows = []
+    for pump_id, station_id, station_name, company_id, pump_number in pumps.values_list(
+        'pk', 'station_id', 'station__name', 'station__company_id', 'pump_number',
+    ).order_by('station_id', 'pump_number'):
+        pump = totals.get(pump_id)
+        if pump is None:
+            continue
+        stations[(station_id, station_name, company_id)].add(pump)
+        companies[company_id].add(pump)
+        rows.append(pump.as_dict(pump_id=pump_id, pump_number=pump_number, station_id=station_id))
+    return {
+        'pumps': rows,
+        'stations': [total.as_dict(station_id=key[0], station=key[1], company_id=key[2]) for key, total in stations.items()],
+        'companies': [total.as_dict(company_id=key) for key, total in companies.items()],
+    }
+
+
+def window_report(pumps, start, end):
+    """Uptime per pump, station and company over an arbitrary window, computed from the transitions."""
+    return report(pumps, pump_totals(pumps, start, end))
+
+
+def summarize_month(month):
+    """
+    Stores the uptime of every pump for the month containing ``month``
+    (one upsert per pump, written in one statement). Returns the row count.
+    """
+    first = month.replace(day=1)
+    start, end = month_bounds(first)
+    pumps = Pump.objects.all()
+    stations = dict(pumps.values_list('pk', 'station_id'))
+    rows = [
+        PumpUptimeMonth(
+            pump_id=pump_id, station_id=stations[pump_id], month=first,
+            up_seconds=total.up_seconds, observed_seconds=total.observed_seconds, transitions=total.transitions,
+        )
+        for pump_id, total in pump_totals(pumps, start, end).items()
+    ]
+    PumpUptimeMonth.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['pump', 'month'],
+        update_fields=['station', 'up_seconds', 'observed_seconds', 'transitions', 'updated_at'],
+    )
+    return len(rows)
+
+
+def monthly_report(pumps, first_month, last_month=None):
+    """
+    Uptime per pump, station and company over whole months, read from the
+    PumpUptimeMonth summary (see summarize_month) with one grouped query.
+    """
+    last_month = (last_month or first_month).replace(day=1)
+    months = PumpUptimeMonth.objects.filter(pump__in=pumps, month__gte=first_month.replace(day=1), month__lte=last_month)
+    totals = {}
+    for pump_id, up, observed, transitions in months.values('pump_id').annotate(
+        up=Sum('up_seconds'), observed=Sum('observed_seconds'), changes=Sum('transitions'),
+    ).values_list('pump_id', 'up', 'observed', 'changes'):
+        total = totals[pump_id] = UptimeTotals()
+        total.up_seconds, total.observed_seconds, total.transitions = up, observed, transitions
+    return report(pumps, totals)
@@ -1,12 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASYNC_VIEWS serves the async variants of the read-heavy pages at their main
+# URLs (run under ASGI, see station/asgi.py); they are always under async/ too
+ASYNC_VIEWS = getattr(settings, 'ASYNC_VIEWS', False)
+
 urlpatterns = [
     # Authentication (function-based)
     path('', views.landing_page, name='landing_page'),
     path('signup/', views.signup_page, name='signup'),
     path('forgot-password/', views.forgot_password, name='forgot_password'),
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/', views.dashboard_async if ASYNC_VIEWS else views.dashboard, name='dashboard'),
     path('logout/', views.user_logout, name='logout'),
     
     # User CRUD (class-based)
@@ -34,7 +39,11 @@ urlpatterns = [
     path('pumps/<int:pump_id>/status/', views.pump_status_update, name='pump_status_update'),
     path('pumps/<int:pump_id>/delete/', views.PumpDeleteView.as_view(), name='pump_delete'),
     
-    path('pumps/dashboard/', views.pump_monitoring, name='pump_monitoring'), 
+    path('pumps/dashboard/', views.pump_monitoring_async if ASYNC_VIEWS else views.pump_monitoring, name='pump_monitoring'),
+    path('pumps/stream/', views.pump_status_stream, name='pump_status_stream'),
+    path('pumps/telemetry/', views.pump_telemetry, name='pump_telemetry'),
+    path('pumps/history/', views.pump_history, name='pump_history'),
+    path('pumps/uptime/', views.pump_uptime, name='pump_uptime'),
 
     # Existing CRUD views (These are for the Admin tools/full list)
     path('pumps/', views.PumpListView.as_view(), name='pump_list'),
@@ -46,16 +55,32 @@ urlpatterns = [
     path('pumps/<int:pump_id>/status/', views.pump_status_update, name='pump_status_update'),
     # Inventory CRUD
     path('inventory/', views.InventoryListView.as_view(), name='inventory_list'),
+    path('inventory/summary/', views.inventory_summary, name='inventory_summary'),
     path('inventory/<int:inventory_id>/update/', views.InventoryUpdateView.as_view(), name='inventory_update'),
     
     # Transaction CRUD
-    path('transactions/', views.TransactionListView.as_view(), name='transaction_list'),
+    path('transactions/', views.transaction_list_async if ASYNC_VIEWS else views.TransactionListView.as_view(), name='transaction_list'),
     path('transactions/create/', views.TransactionCreateView.as_view(), name='transaction_create'),
+    path('transactions/export/', views.transaction_export, name='transaction_export'),
+    path('transactions/batch/', views.transaction_batch, name='transaction_batch'),
     
     # Alert CRUD
-    path('alerts/', views.AlertListView.as_view(), name='alert_list'),
+    path('alerts/', views.alert_list_async if ASYNC_VIEWS else views.AlertListView.as_view(), name='alert_list'),
     path('alerts/<int:alert_id>/update/', views.AlertUpdateView.as_view(), name='alert_update'),
     
+    # Background jobs (list/enqueue: admin; detail: for polling)
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+
+    # Async variants (concurrent reads; for ASGI)
+    path('async/dashboard/', views.dashboard_async, name='dashboard_async'),
+    path('async/pumps/dashboard/', views.pump_monitoring_async, name='pump_monitoring_async'),
+    path('async/transactions/', views.transaction_list_async, name='transaction_list_async'),
+    path('async/alerts/', views.alert_list_async, name='alert_list_async'),
+
+    # Request metrics (admin)
+    path('metrics/views/', views.request_metrics, name='request_metrics'),
+
     # Settings CRUD
     path('settings/', views.SystemSettingListView.as_view(), name='settings_list'),
     path('settings/create/', views.SystemSettingCreateView.as_view(), name='settings_create'),
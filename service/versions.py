@@ -0,0 +1,32 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CacheVersion
+
+
+# CROSS-PROCESS CACHE VERSIONS
+
+def current_version(name):
+    """The stored version of ``name`` (0 until it is first bumped); one primary key lookup."""
+    return CacheVersion.objects.filter(pk=name).values_list('version', flat=True).first() or 0
+
+
+def bump_version(name):
+    """
+    Increments the version of ``name`` so every process drops its copy.
+
+    The increment is an F() UPDATE; the row is created on first use.
+    """
+    if CacheVersion.objects.filter(pk=name).update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            CacheVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        CacheVersion.objects.filter(pk=name).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def versions_with_prefix(prefix):
+    """{name: version} of every counter whose name starts with ``prefix``, in one query."""
+    return dict(CacheVersion.objects.filter(name__startswith=prefix).values_list('name', 'version'))
@@ -1,15 +1,31 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView,TemplateView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.shortcuts import render, redirect,get_object_or_404
 from django.contrib import messages
-from django.db.models import Q, Sum
+from django.db import transaction
+from django.db.models import Count, Q, Sum
 from django.contrib.auth.mixins import UserPassesTestMixin,LoginRequiredMixin
 from django.utils import timezone
-from datetime import timedelta
+from django.conf import settings
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+import json
 from .models import *
-from django.http import HttpResponseForbidden,JsonResponse
+from django.http import HttpResponse,HttpResponseForbidden,JsonResponse,HttpResponseBadRequest,StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import user_passes_test
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
+from .dashboard import DashboardSummary, PumpMonitoringSummary, stale_blocks
+from .fragments import FragmentKeys, fragment_stats
+from .pagination import CursorPaginationMixin, cursor_page, use_cursor_pagination
+from .search import search_transactions
+from . import aio, events, exports, ingest, inventory, jobs, pricing, rollups, telemetry, uptime
+from .metrics import view_metrics
+from .routers import ReportingReadsMixin, reporting_db, reporting_view
 
 # AUTHENTICATION VIEWS 
 def landing_page(request):
@@ -113,6 +129,7 @@ def user_logout(request):
     messages.success(request, 'You have been logged out successfully')
     return redirect('landing_page')
 
+@reporting_view
 def dashboard(request):
     """Main dashboard after login"""
     user_id = request.session.get('user_id')
@@ -121,61 +138,24 @@ def dashboard(request):
     if not user_id:
         return redirect('landing_page')
     
-    try:
-        user = User.objects.get(user_id=user_id)
-        stations = get_user_stations(user_id, user_role)
-        
-        # Get dashboard data
-        pumps = Pump.objects.filter(station__in=stations)
-        active_pumps = pumps.filter(status='active').count()
-        offline_pumps = pumps.filter(status='offline').count()
-        
-        # Today's revenue and fuel dispensed
-        today = timezone.now().date()
-        today_data = Transaction.objects.filter(
-            station_id__in=stations,
-            transaction_time__date=today
-        ).aggregate(
-            total_revenue=Sum('total_price'),
-            petrol_dispensed=Sum('quantity', filter=Q(fuel_type='Petrol')),
-            diesel_dispensed=Sum('quantity', filter=Q(fuel_type='Diesel'))
-        )
-        
-        today_revenue = today_data['total_revenue'] or 0
-        petrol_dispensed = today_data['petrol_dispensed'] or 0
-        diesel_dispensed = today_data['diesel_dispensed'] or 0
-        
-        # Recent transactions
-        recent_transactions = Transaction.objects.filter(
-            station_id__in=stations
-        ).order_by('-transaction_time')[:5]
-        
-        # Alerts
-        alerts = Alert.objects.filter(station__in=stations, status='pending')
-        
-        context = {
-            'user': user,
-            'stations': stations,
-            'pumps': pumps,
-            'active_pumps_count': active_pumps,
-            'offline_pumps_count': offline_pumps,
-            'today_revenue': today_revenue,
-            'petrol_dispensed': petrol_dispensed,
-            'diesel_dispensed': diesel_dispensed,
-            'recent_transactions': recent_transactions,
-            'alerts': alerts,
-        }
-        
-        return render(request, 'dashboard.html', context)
-        
-    except User.DoesNotExist:
+    user = request.access.user
+    if user is None:
         messages.error(request, 'User not found')
         return redirect('landing_page')
 
+    # All dashboard data is loaded in a fixed number of grouped queries
+    summary = DashboardSummary(request.access)
+
+    context = summary.as_context()
+    context['user'] = user
+
+    return render(request, 'dashboard.html', context)
+
 #  HELPER FUNCTIONS 
 def get_user_stations(user_id, user_role):
     """
     Returns a QuerySet of Station objects the user has access to.
+    Views should prefer the per-request ``request.access`` resolver.
     """
     if not user_id:
         return Station.objects.none()
@@ -185,15 +165,25 @@ def get_user_stations(user_id, user_role):
     except User.DoesNotExist:
         return Station.objects.none()
 
-    if user_role == 'Admin':
+    return stations_for_user(user, user_role)
+
+
+def stations_for_user(user, user_role):
+    """
+    Same as get_user_stations, for callers that already loaded the User.
+    Roles are compared case-insensitively ('admin' is stored in the session).
+    """
+    user_role = (user_role or '').lower()
+
+    if user_role == 'admin':
         # Admin sees all stations across all companies
         return Station.objects.all()
 
-    elif user_role == 'Owner':
+    elif user_role == 'owner':
         # Owner sees stations associated with companies they own
         return Station.objects.filter(company_id__owner=user)
 
-    elif user_role == 'Manager':
+    elif user_role == 'manager':
         # Manager sees stations they are assigned to manage
         return Station.objects.filter(manager_id=user)
 
@@ -208,47 +198,77 @@ def pump_monitoring(request):
     filtered by user role access.
     """
     user_id = request.session.get('user_id')
-    user_role = request.session.get('role')
 
     if not user_id:
         messages.error(request, "Please log in to view the pump dashboard.")
         return redirect('landing_page') # Assume 'landing_page' is the login page
 
-    try:
-        user = User.objects.get(user_id=user_id)
-    except User.DoesNotExist:
+    user = request.access.user
+    if user is None:
         messages.error(request, "User not found.")
         return redirect('landing_page')
 
-    # Get authorized stations using the existing helper function
-    stations = get_user_stations(user_id, user_role)
-    
-    # 1. Fetch Pumps: Filter by authorized stations
-    pumps = Pump.objects.filter(station__in=stations).select_related('station').order_by('pump_number')
+    # Pumps and status counts are loaded only when their cached fragments are stale
+    summary = PumpMonitoringSummary(request.access)
+    context = pump_monitoring_context(request, summary, FragmentKeys(request.access))
     
-    # 2. Status Counts (for the cards)
-    active_count = pumps.filter(status='active').count()
-    offline_count = pumps.filter(status='offline').count()
-    
-    # The image shows "Maintenance". Assuming your model has another choice for maintenance,
-    # or you use 'offline' for both. Based on your model:
-    # STATUS_CHOICES = [('active', 'Active'), ('offline', 'Offline')]
-    # We will use 'offline' for now and add a placeholder for 'maintenance'.
-    maintenance_count = pumps.filter(status='maintenance').count() if 'maintenance' in dict(Pump.STATUS_CHOICES) else 0
+    return render(request, 'pumps/monitoring_dashboard.html', context)
 
-    context = {
-        'pumps': pumps,
-        'active_count': active_count,
-        'offline_count': offline_count,
-        'maintenance_count': maintenance_count, # Adjust if your model has a 'maintenance' status
+
+def pump_monitoring_context(request, summary, fragment_keys):
+    """Template context of the pump monitoring page (shared with the async variant)."""
+    user_role = request.session.get('role')
+    user = request.access.user
+
+    # Get authorized stations from the per-request access resolver
+    stations = request.access.stations
+
+    return {
+        'summary': summary,
+        'fragment_keys': fragment_keys,
         'user': user,
         'user_role': user_role,
         # We need these for the Admin/Owner filtering dropdowns
         'filterable_companies': Company.objects.all().order_by('name') if user_role == 'Admin' else Company.objects.filter(owner=user).order_by('name'),
         'filterable_stations': stations.order_by('name'), # All stations the user has access to
+        'history_ranges': list(telemetry.HISTORY_RANGES),
     }
-    
-    return render(request, 'pumps/monitoring_dashboard.html', context)
+
+
+def _stream_scope(request):
+    access = request.access
+    return access.is_authenticated, access.station_scope
+
+
+async def pump_status_stream(request):
+    """
+    Server-sent events with pump status changes for the monitoring dashboard.
+
+    Served as a long-lived stream under ASGI (station/asgi.py). Under WSGI,
+    where a worker cannot be held open, it answers once with the pending
+    events and a retry hint, so EventSource falls back to short polling.
+    """
+    authenticated, stations = await sync_to_async(_stream_scope)(request)
+    if not authenticated:
+        return HttpResponseForbidden()
+
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    try:
+        after = int(after) if after else None
+    except ValueError:
+        after = None
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(events.broker.stream(stations, after), content_type='text/event-stream')
+    else:
+        if after is None:
+            after = await sync_to_async(events.latest_event_id)()
+        payloads = await sync_to_async(events.events_after)(after, stations)
+        body = 'retry: 5000\n\n' + ''.join(events.format_event(payload) for payload in payloads)
+        response = HttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 # USER CRUD (Class-Based Views) 
 class UserListView(ListView):
     model = User
@@ -388,9 +408,8 @@ class StationListView(ListView):
     context_object_name = "stations"
     
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        return get_user_stations(user_id, user_role)
+        # Company, manager and pump count come with the stations (no per-row queries)
+        return self.request.access.stations.select_related('company_id', 'manager_id').annotate(pump_count=Count('pumps'))
 
 class StationCreateView(CreateView):
     model = Station
@@ -430,10 +449,7 @@ class PumpListView(ListView):
     context_object_name = "pumps"
     
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        stations = get_user_stations(user_id, user_role)
-        return Pump.objects.filter(station__in=stations)
+        return self.request.access.filter(Pump.objects.all()).select_related('station')
 
 class PumpCreateView(CreateView):
     model = Pump
@@ -478,29 +494,6 @@ def pump_status_update(request, pump_id):
     return render(request, 'pumps/status_update.html', {'pump': pump})
 
 # ========== INVENTORY CRUD ==========
-class InventoryListView(ListView):
-    model = Inventory
-    template_name = "inventory/list.html"
-    context_object_name = "inventory"
-    
-    def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        stations = get_user_stations(user_id, user_role)
-        inventory = Inventory.objects.filter(station_id__in=stations)
-        
-        # Calculate percentages
-        for item in inventory:
-            item.percentage = (item.quantity / item.capacity) * 100
-            if item.percentage >= 75:
-                item.status = 'Good'
-            elif item.percentage >= 50:
-                item.status = 'Medium'
-            else:
-                item.status = 'Low'
-        
-        return inventory
-
 class InventoryUpdateView(UpdateView):
     model = Inventory
     template_name = "inventory/form.html"
@@ -530,33 +523,30 @@ class InventoryListView(InventoryAccessMixin, ListView):
     context_object_name = "inventory_list"
 
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        stations = get_user_stations(user_id, user_role)
-        inventory = Inventory.objects.filter(station_id__in=stations)
-        
-        # Calculate percentages and status for display
-        for item in inventory:
-            if item.capacity and item.capacity > 0:
-                # *** THIS IS THE KEY CALCULATION ***
-                item.percentage = (item.quantity / item.capacity) * 100 
-            else:
-                item.percentage = 0
-            
-            # ... status calculation ...
-            
-        return inventory
+        # percentage, fill_status and below_threshold are computed by the database
+        tanks = self.request.access.filter(Inventory.objects.all()).select_related('station')
+        return inventory.with_fill_levels(tanks).order_by('station', 'fuel_type')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user_role = self.request.session.get('role')
         
         # Pass a flag to control the visibility of the "Edit" button in the template
         # Only Admin and Owner can edit, Managers can only view.
-        context['can_edit'] = user_role in ['Admin', 'Owner']
+        context['can_edit'] = (user_role or '').lower() in ['admin', 'owner']
         context['user_role'] = user_role
         return context
 
 
+@reporting_view
+def inventory_summary(request):
+    """Fleet-wide tank levels of the user's stations, grouped by company and fuel type (one query)."""
+    if not request.access.is_authenticated:
+        return HttpResponseForbidden()
+    tanks = request.access.filter(Inventory.objects.all())
+    return JsonResponse({'levels': inventory.fleet_levels(tanks)})
+
+
 class InventoryUpdateView(InventoryAccessMixin, UpdateView):
     model = Inventory
     template_name = "inventory/inventory_update.html" # Renamed to match my previous suggestion
@@ -583,11 +573,11 @@ class InventoryUpdateView(InventoryAccessMixin, UpdateView):
         
         # Owner check: Must own the company associated with the station
         if user_role == 'Owner':
-            inventory = self.get_object() # Fetches the Inventory item being updated
+            tank = self.get_object() # Fetches the Inventory item being updated
             try:
                 current_user = User.objects.get(pk=user_id)
                 # Check if the current user is the owner of the company associated with the station
-                return inventory.station_id.company_id.owner == current_user
+                return tank.station.company_id.owner == current_user
             except User.DoesNotExist:
                 return False
         
@@ -599,98 +589,316 @@ class InventoryUpdateView(InventoryAccessMixin, UpdateView):
 
 # ========== TRANSACTION CRUD ==========
 
-class TransactionListView(ListView):
+def _id_param(value):
+    """The ID in a GET parameter as an int, or None when it is missing or not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_transactions(request):
+    """
+    Transactions the user may see, narrowed by the list page's GET filters
+    (duration, payment_method, station_id, search). Shared by the list view
+    and the export endpoint.
+    """
+    user_role = (request.session.get('role') or '').lower()
+    
+    # 1. Base Queryset (Role-Based Filtering)
+    # Filters on the precomputed station ID set of the request
+    queryset = request.access.filter(Transaction.objects.all(), 'station_id')
+
+    # 2. Applying Advanced Filters from GET parameters
+    
+    # --- Time Filter (duration) ---
+    duration = request.GET.get('duration', 'all')
+    if duration == '24hrs':
+        time_cutoff = timezone.now() - timedelta(hours=24)
+        queryset = queryset.filter(transaction_time__gte=time_cutoff)
+    elif duration == 'week':
+        time_cutoff = timezone.now() - timedelta(weeks=1)
+        queryset = queryset.filter(transaction_time__gte=time_cutoff)
+    elif duration == 'month':
+        time_cutoff = timezone.now() - timedelta(days=30)
+        queryset = queryset.filter(transaction_time__gte=time_cutoff)
+    # 'all' (default) needs no filter
+    
+    # --- Payment Method Filter ---
+    payment_method = request.GET.get('payment_method')
+    if payment_method and payment_method != 'all':
+        queryset = queryset.filter(payment_method=payment_method)
+
+    # --- Station Filter (Admin/Owner Specific) ---
+    # Note: Manager is already restricted by 'request.access'
+    # Anything but a station ID ('all', junk) means every station in scope
+    selected_station_id = _id_param(request.GET.get('station_id'))
+    if user_role in ['admin', 'owner'] and selected_station_id is not None:
+        # This filter is already somewhat redundant if request.access is used, 
+        # but it is necessary if the user explicitly filters down the list.
+        queryset = queryset.filter(station_id=selected_station_id)
+
+    # --- Search Filter (Car Plate, Fuel Type, Payment Method, exact ID) ---
+    # Served by the transaction search index (see service/search.py)
+    search_query = request.GET.get('search', '')
+    if search_query:
+        queryset = search_transactions(queryset, search_query)
+
+    return queryset
+
+
+class TransactionListView(ReportingReadsMixin, CursorPaginationMixin, ListView):
     model = Transaction
     template_name = "transactions/list.html"
     context_object_name = "transactions"
     paginate_by = 15  # Set default pagination
+    cursor_ordering = ('transaction_time', 'transaction_id')  # ?paging=cursor
 
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        
-        # 1. Base Queryset (Role-Based Filtering)
-        # Reusing the existing user station logic for filtering
-        authorized_stations = get_user_stations(user_id, user_role)
-        queryset = Transaction.objects.filter(station_id__in=authorized_stations).select_related('station_id', 'pump_id')
-
-        # 2. Applying Advanced Filters from GET parameters
-        
-        # --- Time Filter (duration) ---
-        duration = self.request.GET.get('duration', 'all')
-        if duration == '24hrs':
-            time_cutoff = timezone.now() - timedelta(hours=24)
-            queryset = queryset.filter(transaction_time__gte=time_cutoff)
-        elif duration == 'week':
-            time_cutoff = timezone.now() - timedelta(weeks=1)
-            queryset = queryset.filter(transaction_time__gte=time_cutoff)
-        elif duration == 'month':
-            time_cutoff = timezone.now() - timedelta(days=30)
-            queryset = queryset.filter(transaction_time__gte=time_cutoff)
-        # 'all' (default) needs no filter
-        
-        # --- Payment Method Filter ---
-        payment_method = self.request.GET.get('payment_method')
-        if payment_method and payment_method != 'all':
-            queryset = queryset.filter(payment_method=payment_method)
-
-        # --- Station Filter (Admin/Owner Specific) ---
-        # Note: Manager is already restricted by 'authorized_stations'
-        selected_station_id = self.request.GET.get('station_id')
-        if user_role in ['Admin', 'Owner'] and selected_station_id and selected_station_id != 'all':
-            # This filter is already somewhat redundant if authorized_stations is used, 
-            # but it is necessary if the user explicitly filters down the list.
-            queryset = queryset.filter(station_id=selected_station_id)
-
-        # --- Search Filter (Car Plate, Fuel Type, Payment Method ID) ---
-        search_query = self.request.GET.get('search', '')
-        if search_query:
-            queryset = queryset.filter(
-                Q(fuel_type__icontains=search_query) |
-                Q(payment_method__icontains=search_query) |
-                Q(car_plate__icontains=search_query) |
-                Q(transaction_id__icontains=search_query) # Search by ID
-            )
+        # Role-based access plus the GET filters (shared with the export)
+        queryset = filter_transactions(self.request).select_related('station_id', 'pump_id')
         
         # Default ordering: most recent first
         return queryset.order_by('-transaction_time')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        stations_for_stats = get_user_stations(user_id, user_role)
-        
-        # 1. Pass Filter Options and Current Selections
-        context['user_role'] = user_role
-        context['duration_options'] = [('all', 'All Time'), ('24hrs', 'Last 24 Hours'), ('week', 'Last Week'), ('month', 'Last Month')]
-        context['payment_methods'] = Transaction.PAYMENT_METHODS
-        
+        context.update(transaction_list_context(self.request))
+        context.update(transaction_totals(self.request.access.station_scope))
+        return context
+
+
+def transaction_list_context(request):
+    """Filter options and current selections of the transaction list (no queries until rendered)."""
+    return {
+        'user_role': request.session.get('role'),
+        'duration_options': [('all', 'All Time'), ('24hrs', 'Last 24 Hours'), ('week', 'Last Week'), ('month', 'Last Month')],
+        'payment_methods': Transaction.PAYMENT_METHODS,
+
         # Stations available for filtering (Only applicable for Admin/Owner in the template)
-        context['filterable_stations'] = Station.objects.filter(pk__in=[s.pk for s in stations_for_stats]).order_by('name')
-        
+        'filterable_stations': request.access.stations.order_by('name'),
+
         # Current filter values for dropdown persistence
-        context['current_duration'] = self.request.GET.get('duration', 'all')
-        context['current_payment_method'] = self.request.GET.get('payment_method', 'all')
-        context['current_station_id'] = self.request.GET.get('station_id', 'all')
-        context['search_query'] = self.request.GET.get('search', '')
+        'current_duration': request.GET.get('duration', 'all'),
+        'current_payment_method': request.GET.get('payment_method', 'all'),
+        'current_station_id': request.GET.get('station_id', 'all'),
+        'search_query': request.GET.get('search', ''),
+    }
+
+
+def transaction_totals(stations):
+    """Summary cards of the transaction list, read from the daily sales rollup (AFTER role-based filtering)."""
+    today_totals = rollups.totals_by_fuel(stations, timezone.localdate())
+    return {
+        'today_revenue': sum((row['revenue'] or 0 for row in today_totals.values()), 0),
+        'total_petrol_dispensed': (today_totals.get('petrol') or {}).get('litres') or 0,
+        'total_diesel_dispensed': (today_totals.get('diesel') or {}).get('litres') or 0,
+        'total_transactions_count': rollups.transaction_count(stations), # Count of all available transactions (pre-filter)
+    }
+
+
+def transaction_export(request):
+    """
+    Streams the filtered transactions as CSV (default) or NDJSON.
+    Accepts the list page's filters plus ?format=csv|ndjson, ?gzip=1 and
+    ?since_id=<transaction_id> for incremental pulls.
+    """
+    if not request.session.get('user_id'):
+        return redirect('landing_page')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return HttpResponseBadRequest('format must be csv or ndjson')
+
+    # Checked before streaming starts: a bad filter cannot fail half-way through the file
+    station_id = request.GET.get('station_id')
+    if station_id not in (None, '', 'all') and _id_param(station_id) is None:
+        return HttpResponseBadRequest('station_id must be a station id or all')
+    since_id = request.GET.get('since_id') or None
+    if since_id is not None:
+        since_id = _id_param(since_id)
+        if since_id is None:
+            return HttpResponseBadRequest('since_id must be a transaction id')
+
+    # The rows are read while streaming, after the view returned, so the
+    # reporting database is bound to the queryset here
+    rows = exports.export_rows(filter_transactions(request).using(reporting_db()), since_id)
+    if export_format == 'csv':
+        content, content_type = exports.csv_lines(rows), 'text/csv'
+    else:
+        content, content_type = exports.ndjson_lines(rows), 'application/x-ndjson'
+
+    filename = f'transactions.{export_format}'
+    if request.GET.get('gzip') in ('1', 'true'):
+        content, content_type, filename = exports.gzip_stream(content), 'application/gzip', filename + '.gz'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@csrf_exempt
+@require_POST
+def transaction_batch(request):
+    """
+    JSON batch upload for pump controllers that buffered sales offline.
+    Body: {"transactions": [{"client_ref", "station_id", "pump_id", "fuel_type",
+    "quantity", "payment_method", "car_plate"?, "transaction_time"?}, ...]}
+
+    CSRF is not checked; the session-authenticated request must be sent as
+    application/json, which browsers cannot do cross-site without CORS.
+    """
+    if not request.session.get('user_id'):
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json.'}, status=415)
+
+    try:
+        payload = json.loads(request.body)
+        rows = payload['transactions']
+        if not isinstance(rows, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"transactions": [...]}.'}, status=400)
+
+    if len(rows) > ingest.MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {ingest.MAX_BATCH_SIZE} transactions per batch.'}, status=400)
+
+    results = ingest.ingest_batch(rows, request.access, request.session['user_id'])
+    summary = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'duplicate', 'error')}
+    return JsonResponse({**summary, 'results': results})
+
+
+@csrf_exempt
+@require_POST
+def pump_telemetry(request):
+    """
+    JSON batch upload of pump telemetry samples.
+    Body: {"samples": [{"pump_id", "recorded_at"?, "status"?, "flow_rate"?, "dispensed"?}, ...]}
+    Same authentication and CSRF rules as transaction_batch.
+    """
+    if not request.session.get('user_id'):
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json.'}, status=415)
+
+    try:
+        payload = json.loads(request.body)
+        rows = payload['samples']
+        if not isinstance(rows, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"samples": [...]}.'}, status=400)
+
+    if len(rows) > telemetry.MAX_SAMPLE_BATCH:
+        return JsonResponse({'error': f'At most {telemetry.MAX_SAMPLE_BATCH} samples per batch.'}, status=400)
+
+    results = telemetry.ingest_samples(rows, request.access)
+    errors = [r for r in results if r['status'] == 'error']
+    return JsonResponse({'created': len(results) - len(errors), 'error': len(errors), 'errors': errors})
+
+
+@reporting_view
+def pump_history(request):
+    """
+    Downsampled history of the user's pumps for the monitoring page:
+    ?range=1h|6h|24h|7d|30d (default 24h) and an optional ?pump_id.
+    """
+    if not request.access.is_authenticated:
+        return HttpResponseForbidden()
+    range_name = request.GET.get('range', '24h')
+    if range_name not in telemetry.HISTORY_RANGES:
+        return HttpResponseBadRequest(f'range must be one of {", ".join(telemetry.HISTORY_RANGES)}')
+    pump_id = request.GET.get('pump_id')
+    if pump_id is not None:
+        try:
+            pump_id = int(pump_id)
+        except ValueError:
+            return HttpResponseBadRequest('pump_id must be a pump id')
+
+    points = telemetry.history(request.access, range_name, pump_id=pump_id)
+    resolution = telemetry.HISTORY_RANGES[range_name][1]
+    return JsonResponse({'range': range_name, 'resolution': resolution, 'pumps': {str(k): v for k, v in points.items()}})
+
+
+@reporting_view
+def pump_uptime(request):
+    """
+    Uptime per pump, station and company of the user's pumps, as JSON.
+    ?month=YYYY-MM[&to=YYYY-MM] reads the monthly summary (summarize_uptime);
+    ?start=YYYY-MM-DD[&end=YYYY-MM-DD] computes any window of whole days from
+    the transition log. Defaults to the current month so far.
+    """
+    if not request.access.is_authenticated:
+        return HttpResponseForbidden()
+    pumps = request.access.filter(Pump.objects.all())
+
+    try:
+        if request.GET.get('month'):
+            first = date.fromisoformat(request.GET['month'] + '-01')
+            last = date.fromisoformat(request.GET['to'] + '-01') if request.GET.get('to') else first
+            return JsonResponse({'source': 'monthly', **uptime.monthly_report(pumps, first, last)})
+        first_day = date.fromisoformat(request.GET['start']) if request.GET.get('start') else timezone.localdate().replace(day=1)
+        last_day = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+    except ValueError:
+        return HttpResponseBadRequest('month/to must be YYYY-MM and start/end YYYY-MM-DD')
+    if last_day < first_day:
+        return HttpResponseBadRequest('end must not be before start')
+
+    start, end = rollups.day_bounds(first_day, last_day)
+    return JsonResponse({'source': 'transitions', **uptime.window_report(pumps, start, end)})
+
+
+def job_list(request):
+    """
+    Admins only. GET: per-task counts and timings plus the latest jobs.
+    POST (JSON {"name", "kwargs"?}): queues a registered task; answers 202
+    with the job's status URL. The POST rides on the admin's session, so it
+    must carry the csrftoken cookie's value in an X-CSRFToken header.
+    """
+    if not request.access.all_stations:
+        return HttpResponseForbidden()
+
+    if request.method == 'POST':
+        if request.content_type != 'application/json':
+            return JsonResponse({'error': 'Content-Type must be application/json.'}, status=415)
+        try:
+            payload = json.loads(request.body)
+            name, kwargs = payload['name'], payload.get('kwargs') or {}
+            if not isinstance(name, str) or not isinstance(kwargs, dict):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"name": ..., "kwargs": {...}}.'}, status=400)
+        if name not in jobs.TASKS:
+            return JsonResponse({'error': f'Unknown task. Available: {", ".join(sorted(jobs.TASKS))}.'}, status=400)
+        try:
+            job = jobs.enqueue(name, kwargs, created_by=request.access.user_id)
+        except TypeError as exc:
+            # Checked now rather than failing every attempt in the worker
+            return JsonResponse({'error': f'Invalid kwargs for {name}: {exc}.'}, status=400)
+        response = JsonResponse(jobs.job_payload(job), status=202)
+        response['Location'] = reverse('job_detail', args=[job.job_id])
+        return response
+
+    latest = Job.objects.order_by('-job_id')[:50]
+    return JsonResponse({'tasks': jobs.job_stats(), 'jobs': [jobs.job_payload(job) for job in latest]})
+
+
+def job_detail(request, job_id):
+    """Status of one job, for polling; visible to admins and to the user who queued it."""
+    if not request.access.is_authenticated:
+        return HttpResponseForbidden()
+    job = get_object_or_404(Job, job_id=job_id)
+    if not request.access.all_stations and job.created_by_id != request.access.user_id:
+        return HttpResponseForbidden()
+    return JsonResponse(jobs.job_payload(job))
+
+
+def request_metrics(request):
+    """Per-URL-name latency and query statistics and fragment cache hit/miss counts of this process (admins only)."""
+    if not request.access.all_stations:
+        return HttpResponseForbidden()
+    return JsonResponse({'views': view_metrics.summary(), 'fragments': fragment_stats.summary()})
 
-        # 2. Summary Totals (Totals are calculated BEFORE pagination, but AFTER role-based filtering)
-        all_transactions_for_role = self.model.objects.filter(station_id__in=stations_for_stats)
-        
-        today = timezone.now().date()
-        today_totals = all_transactions_for_role.filter(transaction_time__date=today).aggregate(
-            total_revenue=Sum('total_price'),
-            total_petrol_dispensed=Sum('quantity', filter=Q(fuel_type='Petrol')),
-            total_diesel_dispensed=Sum('quantity', filter=Q(fuel_type='Diesel')),
-        )
-        
-        context['today_revenue'] = today_totals['total_revenue'] or 0
-        context['total_petrol_dispensed'] = today_totals['total_petrol_dispensed'] or 0
-        context['total_diesel_dispensed'] = today_totals['total_diesel_dispensed'] or 0
-        context['total_transactions_count'] = all_transactions_for_role.count() # Count of all available transactions (pre-filter)
-        
-        return context
 class TransactionCreateView(CreateView):
     model = Transaction
     template_name = "transactions/form.html"
@@ -705,112 +913,115 @@ class TransactionCreateView(CreateView):
         fuel_type = form.cleaned_data['fuel_type']
         quantity = form.cleaned_data['quantity']
         
-        try:
-            price_setting = SystemSetting.objects.get(fuel_type=fuel_type)
-            form.instance.total_price = quantity * price_setting.price_per_liter
-        except SystemSetting.DoesNotExist:
+        price = pricing.price_for(fuel_type, station_id=form.cleaned_data['station_id'].pk)
+        if price is not None:
+            form.instance.total_price = (price * Decimal(str(quantity))).quantize(ingest.CENTS)
+        else:
             form.instance.total_price = 0
         
         messages.success(self.request, 'Transaction recorded successfully!')
-        return super().form_valid(form)
+        # The sale, its rollup totals and the tank decrement commit together
+        with transaction.atomic():
+            return super().form_valid(form)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        context['stations'] = get_user_stations(user_id, user_role)
-        context['pumps'] = Pump.objects.filter(station__in=context['stations'])
+        context['stations'] = self.request.access.stations
+        context['pumps'] = self.request.access.filter(Pump.objects.all())
         return context
 
 # ========== ALERT CRUD ==========
 
 
-class AlertListView(ListView):
+class AlertListView(ReportingReadsMixin, CursorPaginationMixin, ListView):
     model = Alert
     template_name = "alerts/list.html"
     context_object_name = "alerts"
     paginate_by = 20 # Standard pagination size
+    cursor_ordering = ('created_at', 'alert_id')  # ?paging=cursor
 
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        
-        # 1. Base Queryset (Role-Based Access)
-        # Filters alerts down to stations the user is authorized to see
-        authorized_stations = get_user_stations(user_id, user_role)
-        queryset = Alert.objects.filter(station__in=authorized_stations).select_related('station', 'pump_id', 'inventory_id')
-
-        # 2. Applying Filters from GET parameters
-        
-        # --- Status Filter ---
-        status_filter = self.request.GET.get('status', 'pending') # Default to pending
-        if status_filter != 'all':
-            queryset = queryset.filter(status=status_filter)
-        
-        # --- Type Filter ---
-        type_filter = self.request.GET.get('type')
-        if type_filter and type_filter != 'all':
-            queryset = queryset.filter(type=type_filter)
-            
-        # --- Company Filter (Admin only) ---
-        selected_company_id = self.request.GET.get('company_id')
-        if user_role == 'admin' and selected_company_id and selected_company_id != 'all':
-            queryset = queryset.filter(station__company_id=selected_company_id)
-            
-        # --- Station Filter (Admin/Owner control) ---
-        selected_station_id = self.request.GET.get('station_id')
-        if user_role in ['admin', 'owner'] and selected_station_id and selected_station_id != 'all':
-            queryset = queryset.filter(station__pk=selected_station_id)
-
-        # Default ordering: most recent first
-        return queryset.order_by('-created_at')
+        return filter_alerts(self.request)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_id = self.request.session.get('user_id')
-        user_role = self.request.session.get('role')
-        
-        # Determine all stations the user *could* filter by (used for summary stats and dropdowns)
-        authorized_stations = get_user_stations(user_id, user_role)
-        
-        context['user_role'] = user_role
-        
-        # Filter Options
-        context['status_options'] = Alert.status_choices
-        context['type_options'] = Alert.type_choices
-        
-        # Get companies/stations for dropdown filtering
-        if user_role == 'admin':
-             # Admin sees all companies
-            context['filterable_companies'] = Company.objects.all().order_by('name')
-            context['filterable_stations'] = Station.objects.all().order_by('name')
-        elif user_role == 'owner':
-            # Owner sees their companies' stations
-            try:
-                owner_user = get_object_or_404(User, user_id=user_id)
-                owner_companies = Company.objects.filter(owner=owner_user)
-                context['filterable_companies'] = owner_companies
-                context['filterable_stations'] = Station.objects.filter(company_id__in=owner_companies).order_by('name')
-            except:
-                context['filterable_companies'] = Company.objects.none()
-                context['filterable_stations'] = Station.objects.none()
-        else: # Manager sees only their assigned stations (covered by base queryset filtering)
-             context['filterable_stations'] = Station.objects.filter(pk__in=[s.pk for s in authorized_stations]).order_by('name')
-        
-        # Current Filter Values for dropdown persistence
-        context['current_status'] = self.request.GET.get('status', 'pending')
-        context['current_type'] = self.request.GET.get('type', 'all')
-        context['current_company_id'] = self.request.GET.get('company_id', 'all')
-        context['current_station_id'] = self.request.GET.get('station_id', 'all')
+        context.update(alert_list_context(self.request))
         
         # Counts for status cards (calculated over all authorized alerts)
-        all_alerts_for_role = Alert.objects.filter(station__in=authorized_stations)
+        all_alerts_for_role = self.request.access.filter(Alert.objects.all())
         context['pending_count'] = all_alerts_for_role.filter(status='pending').count()
         context['resolved_count'] = all_alerts_for_role.filter(status='resolved').count()
         context['total_alerts'] = all_alerts_for_role.count()
 
         return context
 
+
+def filter_alerts(request):
+    """Alerts the user may see, narrowed by the list page's GET filters (status, type, company_id, station_id)."""
+    user_role = request.session.get('role')
+    
+    # 1. Base Queryset (Role-Based Access)
+    # Filters alerts down to stations the user is authorized to see
+    queryset = request.access.filter(Alert.objects.all()).select_related('station', 'pump_id', 'inventory_id')
+
+    # 2. Applying Filters from GET parameters
+    
+    # --- Status Filter ---
+    status_filter = request.GET.get('status', 'pending') # Default to pending
+    if status_filter != 'all':
+        queryset = queryset.filter(status=status_filter)
+    
+    # --- Type Filter ---
+    type_filter = request.GET.get('type')
+    if type_filter and type_filter != 'all':
+        queryset = queryset.filter(type=type_filter)
+        
+    # --- Company Filter (Admin only) ---
+    # Anything but an ID ('all', junk) leaves the filter off, as in filter_transactions
+    selected_company_id = _id_param(request.GET.get('company_id'))
+    if user_role == 'admin' and selected_company_id is not None:
+        queryset = queryset.filter(station__company_id=selected_company_id)
+
+    # --- Station Filter (Admin/Owner control) ---
+    selected_station_id = _id_param(request.GET.get('station_id'))
+    if user_role in ['admin', 'owner'] and selected_station_id is not None:
+        queryset = queryset.filter(station__pk=selected_station_id)
+
+    # Default ordering: most recent first
+    return queryset.order_by('-created_at')
+
+
+def alert_list_context(request):
+    """Filter options and current selections of the alert list (no queries until rendered)."""
+    user_id = request.session.get('user_id')
+    user_role = request.session.get('role')
+    
+    # Stations the user *could* filter by come from the per-request access resolver
+    context = {'user_role': user_role}
+    
+    # Filter Options
+    context['status_options'] = Alert.status_choices
+    context['type_options'] = Alert.type_choices
+    
+    # Get companies/stations for dropdown filtering
+    if user_role == 'admin':
+         # Admin sees all companies
+        context['filterable_companies'] = Company.objects.all().order_by('name')
+        context['filterable_stations'] = Station.objects.all().order_by('name')
+    elif user_role == 'owner':
+        # Owner sees their companies' stations
+        context['filterable_companies'] = Company.objects.filter(owner_id=user_id)
+        context['filterable_stations'] = request.access.stations.order_by('name')
+    else: # Manager sees only their assigned stations (covered by base queryset filtering)
+         context['filterable_stations'] = request.access.stations.order_by('name')
+    
+    # Current Filter Values for dropdown persistence
+    context['current_status'] = request.GET.get('status', 'pending')
+    context['current_type'] = request.GET.get('type', 'all')
+    context['current_company_id'] = request.GET.get('company_id', 'all')
+    context['current_station_id'] = request.GET.get('station_id', 'all')
+    return context
+
 class AlertUpdateView(UpdateView):
     model = Alert
     template_name = "alerts/form.html"
@@ -828,6 +1039,9 @@ class SystemSettingListView(ListView):
     template_name = "settings/list.html"
     context_object_name = "settings"
 
+    def get_queryset(self):
+        return pricing.fuel_settings()
+
 class SystemSettingCreateView(CreateView):
     model = SystemSetting
     template_name = "settings/form.html"
@@ -888,7 +1102,7 @@ class SettingsView(TemplateView):
         user, user_role = self.get_user_data()
 
         context['user_role'] = user_role
-        context['fuel_settings'] = SystemSetting.objects.all().order_by('fuel_type')
+        context['fuel_settings'] = pricing.fuel_settings()
         
         # Filtering for Admin/Owner access panels
         if user_role == 'admin':
@@ -896,6 +1110,7 @@ class SettingsView(TemplateView):
         elif user_role == 'owner':
             # Get the company(ies) owned by this user
             context['owner_companies'] = Company.objects.filter(owner=user).order_by('name')
+            context['owner_stations'] = Station.objects.filter(company_id__owner=user).order_by('name')
 
         return context
 
@@ -914,20 +1129,31 @@ class SettingsView(TemplateView):
                 try:
                     setting = SystemSetting.objects.get(fuel_type=fuel_type)
                     setting.price_per_liter = new_price
-                    setting.update_prices(user_role) # Global update
-                    messages.success(request, f'Global price for {fuel_type} updated to {new_price} RWF.')
+                    setting.update_prices(user_role, background=settings.JOB_WORKERS) # Global update; with workers the tanks are repriced by a job
+                    if settings.JOB_WORKERS:
+                        messages.success(request, f'Global price for {fuel_type} updated to {new_price} RWF. Station tanks are being updated.')
+                    else:
+                        messages.success(request, f'Global price for {fuel_type} updated to {new_price} RWF.')
                 except SystemSetting.DoesNotExist:
                     messages.error(request, 'Fuel type not found.')
                     
             elif user_role == 'owner':
                 # Owner can set price for their specific company/stations
                 company_id = request.POST.get('company_id')
+                station_id = request.POST.get('station_id') or None
+                owned = Company.objects.filter(pk=company_id, owner=user).exists()
+                if station_id and not Station.objects.filter(pk=station_id, company_id=company_id).exists():
+                    owned = False
                 try:
-                    # 1. Update the SystemSetting price (acts as the master price)
-                    setting = SystemSetting.objects.get(fuel_type=fuel_type)
-                    setting.price_per_liter = new_price
-                    setting.update_prices(user_role, company_id) # Company-specific Inventory update
-                    messages.success(request, f'Company price for {fuel_type} updated to {new_price} RWF.')
+                    if not owned:
+                        messages.error(request, 'You can only set prices for your own companies and stations.')
+                    else:
+                        # Stored as a company/station override; the global SystemSetting is not rewritten
+                        setting = SystemSetting.objects.get(fuel_type=fuel_type)
+                        setting.price_per_liter = new_price
+                        setting.update_prices(user_role, company_id, station_id)
+                        scope = 'Station' if station_id else 'Company'
+                        messages.success(request, f'{scope} price for {fuel_type} updated to {new_price} RWF.')
                 except SystemSetting.DoesNotExist:
                     messages.error(request, 'Fuel type not found.')
                     
@@ -936,4 +1162,101 @@ class SettingsView(TemplateView):
 
         # Future actions like 'add_company', 'add_manager', 'add_station' would go here...
 
-        return redirect(reverse_lazy('settings_list')) # Redirect back to the settings page
\ No newline at end of file
+        return redirect(reverse_lazy('settings_list')) # Redirect back to the settings page
+
+# ========== ASYNC VIEWS (ASGI) ==========
+# Variants of the read-heavy pages whose independent queries run concurrently
+# on separate connections (see service/aio.py). Served under async/, and at
+# the main URLs when ASYNC_VIEWS is on (see service/urls.py).
+
+@reporting_view
+async def dashboard_async(request):
+    """Async variant of dashboard: the blocks of the stale fragments load concurrently."""
+    access = await aio.resolve_access(request)
+    if not access.user_id:
+        return redirect('landing_page')
+    if access.user is None:
+        messages.error(request, 'User not found')
+        return redirect('landing_page')
+
+    summary = DashboardSummary(access)
+    fragment_keys = FragmentKeys(access)
+    await aio.preload(summary, *await sync_to_async(stale_blocks)(summary, fragment_keys))
+
+    context = summary.as_context(fragment_keys)
+    context['user'] = access.user
+    return await sync_to_async(render)(request, 'dashboard.html', context)
+
+
+async def pump_monitoring_async(request):
+    """Async variant of pump_monitoring: pumps and the last event ID load concurrently."""
+    access = await aio.resolve_access(request)
+    if not access.user_id:
+        messages.error(request, "Please log in to view the pump dashboard.")
+        return redirect('landing_page')
+    if access.user is None:
+        messages.error(request, "User not found.")
+        return redirect('landing_page')
+
+    summary = PumpMonitoringSummary(access)
+    fragment_keys = FragmentKeys(access)
+    await aio.preload(summary, *await sync_to_async(stale_blocks)(summary, fragment_keys))
+
+    context = pump_monitoring_context(request, summary, fragment_keys)
+    return await sync_to_async(render)(request, 'pumps/monitoring_dashboard.html', context)
+
+
+async def _list_page(request, queryset, view_class, *calls):
+    """
+    The ListView pagination context of ``view_class`` for ``queryset`` (page
+    numbers, or keyset pages with ?paging=cursor), read concurrently with the
+    extra ``calls``. Returns (context, [results of calls]).
+    """
+    if use_cursor_pagination(request):
+        page, *results = await aio.gather_reads(
+            partial(cursor_page, request, queryset, view_class.cursor_ordering, view_class.paginate_by), *calls,
+        )
+        paginator = None
+    else:
+        paginator, page, results = await aio.paginate(queryset, view_class.paginate_by, request.GET.get('page'), *calls)
+    context = {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'cursor_page': page if paginator is None else None,
+        'object_list': page.object_list,
+        view_class.context_object_name: page.object_list,
+    }
+    return context, results
+
+
+@reporting_view
+async def transaction_list_async(request):
+    """Async variant of TransactionListView: the page, its count and the summary totals load concurrently."""
+    access = await aio.resolve_access(request)
+    queryset = filter_transactions(request).select_related('station_id', 'pump_id').order_by('-transaction_time')
+
+    context, (totals,) = await _list_page(
+        request, queryset, TransactionListView, partial(transaction_totals, access.station_scope),
+    )
+    context.update(transaction_list_context(request))
+    context.update(totals)
+    return await sync_to_async(render)(request, TransactionListView.template_name, context)
+
+
+@reporting_view
+async def alert_list_async(request):
+    """Async variant of AlertListView: the page, its count and the status counts load concurrently."""
+    access = await aio.resolve_access(request)
+
+    # Counts for status cards (calculated over all authorized alerts)
+    all_alerts_for_role = access.filter(Alert.objects.all())
+    context, (pending_count, resolved_count, total_alerts) = await _list_page(
+        request, filter_alerts(request), AlertListView,
+        all_alerts_for_role.filter(status='pending').count,
+        all_alerts_for_role.filter(status='resolved').count,
+        all_alerts_for_role.count,
+    )
+    context.update(alert_list_context(request))
+    context.update(pending_count=pending_count, resolved_count=resolved_count, total_alerts=total_alerts)
+    return await sync_to_async(render)(request, AlertListView.template_name, context)
@@ -3,6 +3,10 @@ ASGI config for station project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn station.asgi:application``) so
+the live pump status stream (``pumps/stream/``) can hold connections open
+without tying up a worker thread per monitoring screen.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,141 @@
+"""
+Environment-driven database configuration for station.settings.
+
+DB_ENGINE selects the mode:
+
+- ``sqlite`` (default): a file database tuned for concurrent writers. WAL
+  journaling lets readers run alongside the writer, ``synchronous=NORMAL``
+  is durable in WAL mode, writers wait (busy timeout) instead of failing and
+  transactions take the write lock up front (``BEGIN IMMEDIATE``), so two
+  writers never deadlock upgrading a read lock into "database is locked".
+  WAL is stored in the database file, so it is switched on once by a
+  migration (service 0019) rather than by every connection.
+- ``postgresql``: persistent connections with health checks, or a psycopg
+  connection pool with DB_POOL_MAX_SIZE (needs ``psycopg[pool]``). Point the
+  DB_* variables at a local server to run the test suite against PostgreSQL.
+
+A 'replica' alias takes reporting reads (see service/routers.py) when
+SQLITE_REPLICA_PATH or DB_REPLICA_HOST is set.
+"""
+
+import copy
+import os
+
+
+def env_int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def env_bool(env, name, default=False):
+    value = env.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_config(env, base_dir, name=None, test_name=None):
+    busy_timeout = env_int(env, 'SQLITE_BUSY_TIMEOUT', 20)  # seconds
+    mmap_size = env_int(env, 'SQLITE_MMAP_SIZE', 128 * 1024 * 1024)  # bytes
+    pragmas = [
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={mmap_size}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name or env.get('SQLITE_PATH') or base_dir / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': busy_timeout,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(pragmas),
+        },
+        'TEST': {
+            # A file (not the default in-memory database) so tests exercise WAL
+            # and real locking between connections
+            'NAME': test_name or env.get('SQLITE_TEST_PATH') or str(base_dir / 'test_db.sqlite3'),
+        },
+    }
+
+
+def postgresql_config(env):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'station'),
+        'USER': env.get('DB_USER', 'station'),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', 'localhost'),
+        'PORT': env.get('DB_PORT', '5432'),
+        'OPTIONS': {
+            'connect_timeout': env_int(env, 'DB_CONNECT_TIMEOUT', 5),
+        },
+        'TEST': {
+            'NAME': env.get('DB_TEST_NAME') or None,
+        },
+    }
+
+    pool_max_size = env_int(env, 'DB_POOL_MAX_SIZE', 0)
+    if pool_max_size:
+        # psycopg pool; Django requires CONN_MAX_AGE = 0 with it
+        config['OPTIONS']['pool'] = {
+            'min_size': env_int(env, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': pool_max_size,
+            'timeout': env_int(env, 'DB_POOL_TIMEOUT', 10),
+        }
+        config['CONN_MAX_AGE'] = 0
+    else:
+        config['CONN_MAX_AGE'] = env_int(env, 'DB_CONN_MAX_AGE', 60)
+        config['CONN_HEALTH_CHECKS'] = True
+
+    # Behind a transaction-pooling proxy (e.g. PgBouncer) streaming exports
+    # cannot use server-side cursors
+    if env_bool(env, 'DB_DISABLE_SERVER_SIDE_CURSORS'):
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
+def _engine(env):
+    engine = env.get('DB_ENGINE', 'sqlite').strip().lower()
+    if engine in ('postgres', 'postgresql'):
+        return 'postgresql'
+    if engine in ('sqlite', 'sqlite3'):
+        return 'sqlite'
+    raise ValueError(f'Unsupported DB_ENGINE {engine!r}; use sqlite or postgresql')
+
+
+def database_config(base_dir, env=None):
+    """The 'default' DATABASES entry for the DB_ENGINE of ``env`` (os.environ by default)."""
+    env = os.environ if env is None else env
+    if _engine(env) == 'postgresql':
+        return postgresql_config(env)
+    return sqlite_config(env, base_dir)
+
+
+def replica_config(base_dir, env=None, testing=False):
+    """
+    The 'replica' DATABASES entry, or None when no replica is configured:
+    SQLite gets one when SQLITE_REPLICA_PATH is set, PostgreSQL when
+    DB_REPLICA_HOST is (it mirrors the primary in tests). ``testing`` adds
+    the SQLite alias for the test run anyway, on its own test database, so
+    the router can be tested against two files.
+    """
+    env = os.environ if env is None else env
+    if _engine(env) == 'sqlite':
+        if not (env.get('SQLITE_REPLICA_PATH') or testing):
+            return None
+        test_name = env.get('SQLITE_REPLICA_TEST_PATH') or str(base_dir / 'test_replica.sqlite3')
+        return sqlite_config(env, base_dir, name=env.get('SQLITE_REPLICA_PATH'), test_name=test_name)
+
+    if not env.get('DB_REPLICA_HOST'):
+        return None
+    config = copy.deepcopy(postgresql_config(env))
+    config['HOST'] = env['DB_REPLICA_HOST']
+    config['PORT'] = env.get('DB_REPLICA_PORT', config['PORT'])
+    config['TEST'] = {'MIRROR': 'default'}
+    return config
+
+
+def has_replica(env=None):
+    """True when a separate replica server or file is configured."""
+    env = os.environ if env is None else env
+    return bool(env.get('SQLITE_REPLICA_PATH') or env.get('DB_REPLICA_HOST'))
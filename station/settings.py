@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from .database import database_config, env_bool, has_replica, replica_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,11 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "service.middleware.RequestMetricsMiddleware",
+    "service.middleware.ReadYourWritesMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "service.middleware.StationAccessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -75,12 +82,56 @@ WSGI_APPLICATION = "station.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Selected with DB_ENGINE=sqlite|postgresql and the DB_*/SQLITE_* variables,
+# see station/database.py
+
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_config(BASE_DIR),
+}
+# Without SQLITE_REPLICA_PATH/DB_REPLICA_HOST there is no 'replica' alias and
+# reporting reads use the primary's connection; `manage.py test` always gets
+# one so the routing tests have a second database
+REPLICA_DATABASE = replica_config(BASE_DIR, testing=sys.argv[1:2] == ["test"])
+if REPLICA_DATABASE:
+    DATABASES["replica"] = REPLICA_DATABASE
+
+# Reporting reads (totals, counts, dashboard aggregates, exports) go to this
+# alias, see service/routers.py; the primary unless a replica is configured
+REPORTING_DATABASE = os.environ.get("REPORTING_DATABASE") or ("replica" if has_replica() else "default")
+
+DATABASE_ROUTERS = ["service.routers.ReportingRouter"]
+
+
+# Sessions
+# SESSION_BACKEND=cached_db (default): cached reads, write-through to the
+# session table, incremental cleanup (service/sessions.py).
+# SESSION_BACKEND=signed_cookies: the login claims (user_id, role, ...) live
+# in a signed cookie and no session storage is touched at all; such a
+# session cannot be revoked server-side, logout only clears the cookie.
+
+SESSION_ENGINES = {
+    "cached_db": "service.sessions",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
 }
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get("SESSION_BACKEND", "cached_db")]
+
+
+# Async views
+# ASYNC_VIEWS=1 serves the async variants of the dashboards and list pages
+# (concurrent reads, service/aio.py) at their main URLs. Use it with an ASGI
+# server (station/asgi.py); the variants are always available under async/.
+
+ASYNC_VIEWS = env_bool(os.environ, "ASYNC_VIEWS")
+
+
+# Background jobs
+# JOB_WORKERS=1 when `manage.py run_workers` runs alongside the web processes:
+# slow work started from the pages (fleet-wide tank repricing) is then queued
+# as a job (service/jobs.py). Without workers it runs inside the request, as
+# nothing would ever pick the job up.
+
+JOB_WORKERS = env_bool(os.environ, "JOB_WORKERS")
 
 
 # Password validation